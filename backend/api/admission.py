@@ -0,0 +1,118 @@
+"""
+Admission control for the expensive request paths.
+
+Each endpoint class in settings.API_ADMISSION ('analysis', 'reports', ...)
+gets a gate: at most `max_concurrent` requests do the expensive work at
+once, up to `max_waiting` more wait for a slot (for at most `wait_timeout`
+seconds), and anything beyond that is turned away with 429 and a
+Retry-After header. Cheap endpoints such as /history/ are never gated, so
+they keep answering while uploads pile up.
+
+Gates are per process; with N workers the effective limits are N times
+the configured ones.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+_gates = {}
+_lock = threading.Lock()
+
+
+class AdmissionRejected(Throttled):
+    """
+    The gate's wait queue is full, or the wait timed out. A Throttled
+    subclass, so DRF answers 429 with Retry-After set from `wait`.
+    """
+    default_detail = "Server busy, try again shortly."
+    default_code = "busy"
+
+    def __init__(self, gate_name, retry_after):
+        self.gate_name = gate_name
+        super().__init__(wait=retry_after, detail=f"Server busy ({gate_name}), try again shortly.")
+
+
+class AdmissionGate:
+
+    def __init__(self, name, max_concurrent, max_waiting, wait_timeout, retry_after):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self._running = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def waiting(self):
+        return self._waiting
+
+    def acquire(self):
+        """Take a slot, waiting in the bounded queue if needed."""
+        with self._cond:
+            if self._running >= self.max_concurrent:
+                if self._waiting >= self.max_waiting:
+                    raise AdmissionRejected(self.name, self.retry_after)
+                self._waiting += 1
+                try:
+                    admitted = self._cond.wait_for(
+                        lambda: self._running < self.max_concurrent, self.wait_timeout)
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    raise AdmissionRejected(self.name, self.retry_after)
+            self._running += 1
+
+    def release(self):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def get_gate(name):
+    """Return the gate called `name` from settings.API_ADMISSION."""
+    gate = _gates.get(name)
+    if gate is not None:
+        return gate
+
+    with _lock:
+        if name not in _gates:
+            config = settings.API_ADMISSION[name]
+            _gates[name] = AdmissionGate(
+                name,
+                max_concurrent=config.get('max_concurrent', 1),
+                max_waiting=config.get('max_waiting', 0),
+                wait_timeout=config.get('wait_timeout', 10),
+                retry_after=config.get('retry_after', 5),
+            )
+        return _gates[name]
+
+
+def admit(name):
+    """`with admit('analysis'): ...` runs the block under that gate."""
+    return get_gate(name).admit()
+
+
+def runs_inline(upload_size):
+    """
+    Cost estimate for an upload: analysis time grows with file size, so
+    anything above UPLOAD_INLINE_MAX_BYTES is analysed in the background
+    instead of holding the request open.
+    """
+    limit = settings.UPLOAD_INLINE_MAX_BYTES
+    return limit is None or upload_size <= limit
@@ -0,0 +1,153 @@
+"""
+Async variants of the upload, history and report endpoints, served under
+/async/ when the project runs on an ASGI server (see README).
+
+Under ASGI, Django receives the request body before the view runs, so a
+slow client no longer ties up a worker thread. pandas and ReportLab work
+runs on the 'analysis' and 'render' pools from settings.API_EXECUTORS;
+short blocking calls (DB, storage) go through sync_to_async. A full pool
+answers 429 with Retry-After, like the admission gates of the sync views.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from . import timing
+from .admission import AdmissionRejected, runs_inline
+from .authentication import read_authentication_classes
+from .executors import ExecutorSaturated, run_async
+from .ingest import (
+    check_analysis_capacity, defer_ingest, discard_upload, exceeds_quota, finish_ingest, save_upload,
+    user_datasets,
+)
+from .models import EquipmentDataset
+from .reports import REPORT_MODES, get_or_build_report, report_etag
+from .responses import file_response
+from .serializers import EquipmentDatasetSerializer
+from .utils import analyze_csv
+from .views import _not_ready
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+async def _authenticate(request, classes):
+    """
+    Run DRF authentication classes against a plain Django request.
+    Returns (user, None) or (None, error response).
+    """
+    for auth_class in classes:
+        try:
+            result = await sync_to_async(auth_class().authenticate)(request)
+        except APIException as exc:
+            return None, JsonResponse({"detail": exc.detail}, status=401)
+        if result is not None:
+            return result[0], None
+    return None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+def _serialize(instance, many=False):
+    with timing.phase('serialize'):
+        return EquipmentDatasetSerializer(instance, many=many).data
+
+
+def _busy(gate):
+    response = _error(f"Server busy ({gate}), try again shortly", 429)
+    response['Retry-After'] = str(settings.API_ADMISSION[gate].get('retry_after', 5))
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def upload_csv(request):
+    user, error = await _authenticate(request, api_settings.DEFAULT_AUTHENTICATION_CLASSES)
+    if error:
+        return error
+
+    files = await sync_to_async(lambda: request.FILES)()
+    if 'file' not in files:
+        return _error("CSV file not provided", 400)
+    csv_file = files['file']
+
+    if await sync_to_async(exceeds_quota)(user, csv_file.size):
+        return _error("Storage quota exceeded", 413)
+
+    # Turn the upload away before storing it if the pool is full
+    try:
+        check_analysis_capacity()
+    except AdmissionRejected as exc:
+        return _busy(exc.gate_name)
+
+    saved_name, content_hash = await sync_to_async(save_upload)(csv_file)
+
+    if not runs_inline(csv_file.size):
+        try:
+            dataset = await sync_to_async(defer_ingest)(user, csv_file, saved_name, content_hash)
+        except AdmissionRejected as exc:
+            return _busy(exc.gate_name)
+        data = await sync_to_async(_serialize)(dataset)
+        return JsonResponse(data, status=202)
+
+    try:
+        result = await run_async('analysis', analyze_csv, saved_name)
+    except BaseException as exc:
+        await sync_to_async(discard_upload)(saved_name)
+        if isinstance(exc, ExecutorSaturated):
+            return _busy('analysis')
+        raise
+
+    dataset = await sync_to_async(finish_ingest)(user, csv_file, saved_name, content_hash, result)
+    data = await sync_to_async(_serialize)(dataset)
+    return JsonResponse(data, status=201)
+
+
+@require_GET
+async def history(request):
+    user, error = await _authenticate(request, read_authentication_classes())
+    if error:
+        return error
+
+    def load():
+        datasets = user_datasets(user)[:settings.DATASET_RETENTION_PER_USER]
+        return _serialize(datasets, many=True)
+
+    return JsonResponse(await sync_to_async(load)(), safe=False)
+
+
+@require_GET
+async def dataset_report_pdf(request, pk):
+    user, error = await _authenticate(request, read_authentication_classes())
+    if error:
+        return error
+
+    mode = request.GET.get('mode', 'summary')
+    if mode not in REPORT_MODES:
+        return _error(f"mode must be one of {', '.join(REPORT_MODES)}", 400)
+
+    try:
+        dataset = await user_datasets(user).aget(pk=pk)
+    except EquipmentDataset.DoesNotExist:
+        return _error("Dataset not found", 404)
+    if dataset.status != EquipmentDataset.STATUS_READY:
+        return _not_ready([dataset])
+
+    # Same path as the sync view: cache lookup, waiting on a pending
+    # pre-generation, then the 'reports' gate around an actual render
+    try:
+        path = await run_async('render', get_or_build_report, dataset, mode)
+    except ExecutorSaturated:
+        return _busy('reports')
+    except AdmissionRejected as exc:
+        return _busy(exc.gate_name)
+
+    if mode == 'summary':
+        filename = f"dataset_{dataset.id}_report.pdf"
+    else:
+        filename = f"dataset_{dataset.id}_{mode}_report.pdf"
+    etag = await sync_to_async(report_etag)(dataset, mode)
+    return file_response(request, path, filename, etag, asynchronous=True)
@@ -0,0 +1,105 @@
+"""
+JWT authentication without a user query on every request.
+
+CachedJWTAuthentication keeps resolved users in a small per-process LRU for
+AUTH_USER_CACHE['TTL'] seconds. Entries are dropped when the user is saved
+(password change, deactivation, ...) or deleted; other worker processes
+pick the change up when their entry expires.
+
+For read-only endpoints, AUTH_STATELESS_READS switches to simplejwt's
+stateless TokenUser, which never touches the database.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import timing
+
+
+class TTLCache:
+    """Thread-safe LRU with a per-entry time to live."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = TTLCache(settings.AUTH_USER_CACHE['MAX_SIZE'], settings.AUTH_USER_CACHE['TTL'])
+
+
+class TimedAuthenticationMixin:
+    """Report authentication time as the 'auth' phase (api/timing.py)."""
+
+    def authenticate(self, request):
+        with timing.phase('auth'):
+            return super().authenticate(request)
+
+
+class StatelessJWTAuthentication(TimedAuthenticationMixin, JWTStatelessUserAuthentication):
+    pass
+
+
+class CachedJWTAuthentication(TimedAuthenticationMixin, JWTAuthentication):
+
+    def get_user(self, validated_token):
+        # Keyed by str() so token claims and user pks always agree
+        key = str(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = user_cache.get(key)
+        if user is None:
+            # Raises for unknown or inactive users, which are not cached
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        # Each request gets its own instance so attributes set on
+        # request.user do not leak between threads
+        return copy.copy(user)
+
+
+def read_authentication_classes():
+    """Authentication for read-only endpoints, see AUTH_STATELESS_READS."""
+    if settings.AUTH_STATELESS_READS:
+        return [StatelessJWTAuthentication]
+    return [CachedJWTAuthentication]
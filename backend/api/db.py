@@ -0,0 +1,69 @@
+"""
+Write helpers for running on SQLite with several worker processes.
+
+SQLite allows one writer at a time. In WAL mode readers never block on the
+writer, but concurrent writers still race for the lock and can fail with
+"database is locked" once the busy timeout runs out. Ingest writes therefore
+go through `write_transaction`, which serializes writers across threads and
+processes (via a lock file) and retries if the database is still busy.
+"""
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows: only serialize within the process
+    fcntl = None
+
+_thread_lock = threading.Lock()
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and 'locked' in str(exc).lower()
+
+
+@contextmanager
+def serialized_writer():
+    """
+    Hold the single-writer lock. A no-op for databases other than SQLite,
+    which handle concurrent writers themselves.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(settings.SQLITE_WRITER_LOCK_FILE, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_transaction(func):
+    """
+    Run `func` in an atomic block under the single-writer lock, retrying
+    with exponential backoff and jitter while SQLite reports it is locked.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = settings.SQLITE_WRITE_RETRIES
+        for attempt in range(retries + 1):
+            try:
+                with serialized_writer(), transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not is_locked_error(exc) or attempt == retries:
+                    raise
+                time.sleep(settings.SQLITE_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+    return wrapper
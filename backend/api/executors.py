@@ -0,0 +1,119 @@
+"""
+Shared background worker pools.
+
+Pools are configured in settings.API_EXECUTORS and created on first use.
+Each pool caps both running and queued work so background jobs cannot
+pile up behind (or starve) the request path.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+_executors = {}
+_lock = threading.Lock()
+
+
+class ExecutorSaturated(Exception):
+    """Raised by run_async when a pool has no room for another job."""
+
+
+class BoundedExecutor:
+    """
+    Wrap an executor with a limit on pending (running + queued) jobs.
+    `submit` returns None instead of queueing when the pool is full.
+    """
+
+    def __init__(self, executor, max_pending):
+        self.executor = executor
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._count_lock:
+            self._pending += 1
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda f: self._release())
+        return future
+
+    def _release(self):
+        with self._count_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+def _setup_django():
+    # Process pool initializer: spawned workers (non-fork platforms) need
+    # settings and apps loaded before touching storage or models
+    import django
+    django.setup()
+
+
+def _close_connections_after(fn):
+    def run(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # Worker threads get their own DB connections; do not leak them
+            connections.close_all()
+    return run
+
+
+class ThreadExecutor(BoundedExecutor):
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(_close_connections_after(fn), *args, **kwargs)
+
+
+def get_executor(name):
+    """Return the pool called `name` from settings.API_EXECUTORS."""
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+
+    with _lock:
+        if name not in _executors:
+            config = settings.API_EXECUTORS[name]
+            max_workers = config.get('max_workers', 1)
+            max_pending = config.get('max_pending', max_workers)
+            if config.get('kind', 'thread') == 'process':
+                _executors[name] = BoundedExecutor(
+                    ProcessPoolExecutor(max_workers=max_workers, initializer=_setup_django),
+                    max_pending)
+            else:
+                _executors[name] = ThreadExecutor(
+                    ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'api-{name}'),
+                    max_pending)
+        return _executors[name]
+
+
+async def run_async(name, fn, *args):
+    """
+    Await `fn(*args)` on the named pool without blocking the event loop.
+    Raises ExecutorSaturated when the pool is full.
+    """
+    executor = get_executor(name)
+    if isinstance(executor, ThreadExecutor):
+        # Carry the caller's context over, e.g. the request's timing collector
+        fn, args = contextvars.copy_context().run, (fn, *args)
+    future = executor.submit(fn, *args)
+    if future is None:
+        raise ExecutorSaturated(name)
+    return await asyncio.wrap_future(future)
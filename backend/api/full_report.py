@@ -0,0 +1,240 @@
+"""
+Full-data PDF report: summary, charts, per-type sections and the complete
+row table.
+
+Rows are read from the stored CSV in batches of REPORT_BATCH_ROWS and pages
+are written out as soon as they fill up (see pdfstream.py), so memory stays
+flat however many rows the dataset has. Charts are drawn once per report as
+vector form XObjects.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .pdfstream import A4, Graphics, StreamingPDFWriter, mm
+
+METRICS = ["Flowrate", "Pressure", "Temperature"]
+COLUMNS = ["Equipment Name", "Type", "Flowrate", "Pressure", "Temperature"]
+CHART_COLORS = ['#667eea', '#f093fb', '#4facfe', '#fa709a', '#30cfd0',
+                '#f5576c', '#43e97b', '#fee140']
+# Charts show the largest types individually and fold the rest into "Other"
+CHART_MAX_BARS = 12
+
+WIDTH, HEIGHT = A4
+LEFT = 20 * mm
+RIGHT = WIDTH - 20 * mm
+TOP = HEIGHT - 20 * mm
+BOTTOM = 20 * mm
+LINE_H = 8 * mm
+ROW_H = 5.5 * mm
+
+
+def _iter_batches(source, **kwargs):
+    import pandas as pd  # Heavy; only report renders need it
+
+    yield from pd.read_csv(
+        default_storage.path(source), memory_map=True,
+        chunksize=settings.REPORT_BATCH_ROWS, **kwargs)
+
+
+def type_statistics(source):
+    """
+    Per-type count and min/avg/max of each metric, aggregated batch by
+    batch. Memory is proportional to the number of types, not rows.
+    """
+    stats = {}
+    for batch in _iter_batches(source, usecols=["Type"] + METRICS):
+        batch["Type"] = batch["Type"].astype(str)
+        grouped = batch.groupby("Type", sort=False)[METRICS].agg(["count", "sum", "min", "max"])
+        sizes = batch.groupby("Type", sort=False).size()
+        for tp, row in grouped.iterrows():
+            entry = stats.setdefault(tp, {"count": 0, **{
+                metric: {"n": 0, "sum": 0.0, "min": None, "max": None} for metric in METRICS}})
+            entry["count"] += int(sizes[tp])
+            for metric in METRICS:
+                n = int(row[(metric, "count")])
+                if not n:
+                    continue
+                m = entry[metric]
+                m["n"] += n
+                m["sum"] += float(row[(metric, "sum")])
+                lo, hi = float(row[(metric, "min")]), float(row[(metric, "max")])
+                m["min"] = lo if m["min"] is None else min(m["min"], lo)
+                m["max"] = hi if m["max"] is None else max(m["max"], hi)
+    return stats
+
+
+# No Helvetica glyph is wider than this (in 1/1000 em)
+MAX_GLYPH_WIDTH = 1015
+
+
+def _fit(text, width, font="Helvetica", size=9):
+    """Truncate `text` with an ellipsis so it fits in `width` points."""
+    text = str(text)
+    # Most cells are short: skip measuring when even the widest glyphs fit
+    if len(text) * size * MAX_GLYPH_WIDTH / 1000 <= width:
+        return text
+
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + "...", font, size) > width:
+        text = text[:-1]
+    return text + "..."
+
+
+def _bar_chart(title, values, width, height):
+    """Horizontal bar chart of (label, value) pairs as a Graphics object."""
+    g = Graphics()
+    g.fill_color('#2c3e50')
+    g.text(0, height - 12, title, font="F2", size=11)
+
+    if not values:
+        g.fill_color('#6c757d')
+        g.text(0, height - 32, "No data available", size=9)
+        return g
+
+    label_w = 45 * mm
+    bar_area = width - label_w - 20 * mm
+    bar_h = min(14, (height - 24) / len(values) - 4)
+    peak = max(value for _, value in values) or 1
+    y = height - 24 - bar_h
+    for i, (label, value) in enumerate(values):
+        g.fill_color('#495057')
+        g.text(0, y + bar_h / 2 - 3, _fit(label, label_w - 4, size=8), size=8)
+        g.fill_color(CHART_COLORS[i % len(CHART_COLORS)])
+        g.rect(label_w, y, max(bar_area * value / peak, 0.5), bar_h)
+        g.fill_color('#495057')
+        g.text(label_w + bar_area * value / peak + 4, y + bar_h / 2 - 3, f"{value:g}", size=8)
+        y -= bar_h + 4
+    return g
+
+
+def _top_types(stats, key):
+    items = sorted(((tp, key(entry)) for tp, entry in stats.items()), key=lambda kv: -kv[1])
+    if len(items) <= CHART_MAX_BARS:
+        return items
+    head = items[:CHART_MAX_BARS - 1]
+    return head + [("Other", sum(value for _, value in items[CHART_MAX_BARS - 1:]))]
+
+
+class _PageFlow:
+    """Tracks the current page and starts a new one when it fills up."""
+
+    def __init__(self, writer, title):
+        self.writer = writer
+        self.title = title
+        self.g = None
+        self.y = None
+        self.new_page()
+
+    def new_page(self):
+        if self.g is not None:
+            self.finish_page()
+        self.g = Graphics()
+        self.y = TOP
+
+    def finish_page(self):
+        self.g.fill_color('#6c757d')
+        self.g.text(LEFT, BOTTOM - 8 * mm, f"{self.title} — page {self.writer.page_count + 1}", size=8)
+        self.writer.add_page(self.g)
+        self.g = None
+
+    def ensure(self, height):
+        if self.y - height < BOTTOM:
+            self.new_page()
+
+
+def render_full_report(data, source, fileobj):
+    """
+    Write the full-data report for the dataset summarised by `data` (see
+    reports.report_data) whose CSV is stored as `source`.
+    """
+    stats = type_statistics(source)
+    writer = StreamingPDFWriter(fileobj, A4)
+    flow = _PageFlow(writer, f"Dataset {data['id']} full report")
+
+    chart_w, chart_h = RIGHT - LEFT, 75 * mm
+    writer.add_form("Chart1", _bar_chart(
+        "Type Distribution", _top_types(stats, lambda e: e["count"]), chart_w, chart_h),
+        chart_w, chart_h)
+    writer.add_form("Chart2", _bar_chart(
+        "Average Flowrate by Type",
+        _top_types(stats, lambda e: round(e["Flowrate"]["sum"] / e["Flowrate"]["n"], 2)
+                   if e["Flowrate"]["n"] else 0),
+        chart_w, chart_h),
+        chart_w, chart_h)
+
+    # Summary page
+    g = flow.g
+    g.fill_color('#000000')
+    g.text(LEFT, flow.y, f"Dataset Report (full) — ID {data['id']}", font="F2", size=16)
+    flow.y -= 1.2 * LINE_H
+    g.text(LEFT, flow.y, f"Uploaded: {data['uploaded_at']}", size=10)
+    flow.y -= 1.4 * LINE_H
+    g.text(LEFT, flow.y, "Summary", font="F2", size=12)
+    flow.y -= 1.1 * LINE_H
+    for label, key in [("Total count", "total_count"), ("Avg Flowrate", "avg_flowrate"),
+                       ("Avg Pressure", "avg_pressure"), ("Avg Temperature", "avg_temperature")]:
+        g.text(LEFT, flow.y, f"{label}: {data[key]}", size=10)
+        flow.y -= 0.9 * LINE_H
+    flow.y -= chart_h
+    g.form("Chart1", LEFT, flow.y)
+    flow.y -= chart_h + 0.5 * LINE_H
+    g.form("Chart2", LEFT, flow.y)
+
+    # Per-type sections
+    flow.new_page()
+    flow.g.fill_color('#000000')
+    flow.g.text(LEFT, flow.y, "Per-Type Statistics", font="F2", size=14)
+    flow.y -= 1.4 * LINE_H
+    for tp in sorted(stats, key=lambda t: -stats[t]["count"]):
+        entry = stats[tp]
+        flow.ensure((len(METRICS) + 2) * ROW_H + LINE_H)
+        g = flow.g
+        g.fill_color('#667eea')
+        g.text(LEFT, flow.y, _fit(tp, RIGHT - LEFT - 60 * mm, "Helvetica-Bold", 12), font="F2", size=12)
+        g.fill_color('#000000')
+        g.text(RIGHT - 55 * mm, flow.y, f"{entry['count']} rows", size=10)
+        flow.y -= ROW_H * 1.3
+        for x, label in [(0, "Metric"), (45, "Min"), (80, "Avg"), (115, "Max")]:
+            g.text(LEFT + x * mm, flow.y, label, font="F2", size=9)
+        flow.y -= ROW_H
+        for metric in METRICS:
+            m = entry[metric]
+            avg = round(m["sum"] / m["n"], 2) if m["n"] else "N/A"
+            for x, value in [(0, metric), (45, m["min"]), (80, avg), (115, m["max"])]:
+                g.text(LEFT + x * mm, flow.y, "N/A" if value is None else value, size=9)
+            flow.y -= ROW_H
+        g.stroke_color('#e9ecef')
+        g.line(LEFT, flow.y + ROW_H / 2, RIGHT, flow.y + ROW_H / 2)
+        flow.y -= 0.5 * LINE_H
+
+    # Complete row table, one batch at a time
+    offsets = [0, 55, 95, 125, 150]
+    col_widths = [(b - a) * mm - 3 for a, b in zip(offsets, offsets[1:] + [(RIGHT - LEFT) / mm])]
+
+    def table_header():
+        flow.g.fill_color('#667eea')
+        flow.g.rect(LEFT, flow.y - 1.5, RIGHT - LEFT, ROW_H)
+        flow.g.fill_color('#ffffff')
+        for offset, name in zip(offsets, COLUMNS):
+            flow.g.text(LEFT + offset * mm + 2, flow.y, name, font="F2", size=9)
+        flow.g.fill_color('#000000')
+        flow.y -= ROW_H
+
+    flow.new_page()
+    flow.g.text(LEFT, flow.y, "Equipment Data", font="F2", size=14)
+    flow.y -= 1.4 * LINE_H
+    table_header()
+    for batch in _iter_batches(source, dtype=str, keep_default_na=False):
+        for row in batch.reindex(columns=COLUMNS, fill_value="").itertuples(index=False):
+            if flow.y - ROW_H < BOTTOM:
+                flow.new_page()
+                table_header()
+            flow.g.text_row(LEFT + 2, flow.y, [
+                (offset * mm, _fit(value, width)) for offset, width, value in zip(offsets, col_widths, row)
+            ], size=9)
+            flow.y -= ROW_H
+
+    flow.finish_page()
+    writer.close()
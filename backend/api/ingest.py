@@ -0,0 +1,198 @@
+"""
+Upload ingest steps shared by the sync (DRF) and async views.
+"""
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from . import metrics, timing
+from .admission import AdmissionRejected
+from .db import write_transaction
+from .executors import get_executor
+from .models import EquipmentDataset
+from .reports import file_content_hash, schedule_report
+from .utils import analyze_csv
+
+logger = logging.getLogger(__name__)
+
+
+def user_datasets(user):
+    """A user's datasets, newest first (served by the owner/uploaded_at index)."""
+    return EquipmentDataset.objects.filter(owner_id=user.id).order_by('-uploaded_at')
+
+
+def exceeds_quota(user, incoming_size):
+    """
+    Would storing `incoming_size` more bytes put `user` over quota? Only the
+    datasets that survive retention after this upload are counted.
+    """
+    quota = settings.USER_STORAGE_QUOTA_BYTES
+    if quota is None:
+        return False
+    keep = settings.DATASET_RETENTION_PER_USER - 1
+    used = sum(user_datasets(user).values_list('file_size', flat=True)[:keep])
+    return used + incoming_size > quota
+
+
+def _result_fields(result):
+    return dict(
+        total_count=result["total_count"],
+
+        avg_flowrate=result["avg_flowrate"],
+        avg_pressure=result["avg_pressure"],
+        avg_temperature=result["avg_temperature"],
+        type_distribution=result["type_distribution"],
+
+        min_flowrate=result["min_flowrate"],
+        min_pressure=result["min_pressure"],
+        min_temperature=result["min_temperature"],
+
+        max_flowrate=result["max_flowrate"],
+        max_pressure=result["max_pressure"],
+        max_temperature=result["max_temperature"],
+
+        rows=result['rows'],
+    )
+
+
+@write_transaction
+def store_dataset(owner, saved_name, original_name, file_size, content_hash, result):
+    """
+    Insert the analysed dataset and apply the owner's retention limit as one
+    serialized write. A `result` of None stores a pending dataset whose
+    statistics are filled in later by analyze_dataset.
+    """
+    if result is None:
+        fields = {"status": EquipmentDataset.STATUS_PENDING}
+    else:
+        fields = _result_fields(result)
+
+    with metrics.timer('api_ingest_phase_seconds', phase='db_insert'):
+        dataset = EquipmentDataset.objects.create(
+            owner=owner,
+            file=saved_name,
+            original_name=original_name,
+            file_size=file_size,
+            content_hash=content_hash,
+            **fields,
+        )
+
+    # Keep only the owner's last N entries
+    retention = settings.DATASET_RETENTION_PER_USER
+    with metrics.timer('api_ingest_phase_seconds', phase='retention'):
+        for old in user_datasets(owner)[retention:]:
+            old.delete()
+
+    return dataset
+
+
+@write_transaction
+def complete_dataset(dataset_id, result):
+    """Fill in a pending dataset's statistics. False if it no longer exists."""
+    # queryset update so the post_save report purge does not fire
+    return EquipmentDataset.objects.filter(
+        pk=dataset_id, status=EquipmentDataset.STATUS_PENDING,
+    ).update(status=EquipmentDataset.STATUS_READY, **_result_fields(result)) > 0
+
+
+@write_transaction
+def fail_dataset(dataset_id):
+    """Mark a pending dataset whose analysis raised as failed."""
+    EquipmentDataset.objects.filter(
+        pk=dataset_id, status=EquipmentDataset.STATUS_PENDING,
+    ).update(status=EquipmentDataset.STATUS_FAILED)
+
+
+@write_transaction
+def drop_dataset(dataset):
+    """Delete a dataset; its post_delete signal releases the upload."""
+    dataset.delete()
+
+
+def save_upload(csv_file):
+    """
+    Store the uploaded file; returns (stored name, content hash). The
+    caller holds a reference to the stored blob until a dataset takes it
+    over (finish_ingest, defer_ingest) or discard_upload drops it.
+    """
+    with metrics.timer('api_ingest_phase_seconds', phase='save'), timing.phase('save'):
+        saved_name = default_storage.save(f"uploads/{csv_file.name}", csv_file)
+        try:
+            return saved_name, file_content_hash(saved_name)
+        except BaseException:
+            discard_upload(saved_name)
+            raise
+
+
+def discard_upload(saved_name):
+    """Drop the reference save_upload took, for uploads that fail before a dataset holds it."""
+    default_storage.delete(saved_name)
+
+
+def _store_or_discard(owner, csv_file, saved_name, content_hash, result):
+    try:
+        return store_dataset(
+            owner, saved_name, csv_file.name[:255], csv_file.size, content_hash, result)
+    except BaseException:
+        discard_upload(saved_name)
+        raise
+
+
+def finish_ingest(owner, csv_file, saved_name, content_hash, result):
+    """
+    Save the analysis result in the DB and run post-ingest stages. The
+    dataset takes over the upload's reference (dropped if storing fails).
+    """
+    dataset = _store_or_discard(owner, csv_file, saved_name, content_hash, result)
+
+    # Optional post-ingest stage: render the report in the background so
+    # the first download is served from cache
+    if settings.REPORT_PREGENERATE:
+        schedule_report(dataset)
+
+    return dataset
+
+
+def check_analysis_capacity():
+    """
+    Raise AdmissionRejected (429) if the 'analysis' pool's queue is full.
+    Views call this before save_upload so a rejected upload is not stored.
+    """
+    executor = get_executor('analysis')
+    if executor.pending >= executor.max_pending:
+        raise AdmissionRejected('analysis', settings.API_ADMISSION['analysis'].get('retry_after', 5))
+
+
+def defer_ingest(owner, csv_file, saved_name, content_hash):
+    """
+    Store a pending dataset and analyse it on the 'analysis' pool. Raises
+    AdmissionRejected (429) if the pool filled up since
+    check_analysis_capacity. Like finish_ingest, it takes over the
+    upload's reference either way.
+    """
+    executor = get_executor('analysis')
+    retry_after = settings.API_ADMISSION['analysis'].get('retry_after', 5)
+    dataset = _store_or_discard(owner, csv_file, saved_name, content_hash, None)
+    if executor.submit(analyze_dataset, dataset.pk) is None:
+        drop_dataset(dataset)
+        raise AdmissionRejected('analysis', retry_after)
+    return dataset
+
+
+def analyze_dataset(dataset_id):
+    """Background half of defer_ingest."""
+    try:
+        dataset = EquipmentDataset.objects.get(pk=dataset_id)
+    except EquipmentDataset.DoesNotExist:
+        return  # Dropped by retention before the job ran
+
+    try:
+        result = analyze_csv(dataset.file.name)
+    except Exception:
+        logger.exception("Analysis of dataset %s failed", dataset_id)
+        fail_dataset(dataset_id)
+        return
+
+    if complete_dataset(dataset_id, result) and settings.REPORT_PREGENERATE:
+        schedule_report(EquipmentDataset.objects.get(pk=dataset_id))
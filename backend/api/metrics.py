@@ -0,0 +1,385 @@
+"""
+In-process metrics, exposed at /metrics in the Prometheus text format.
+
+Each worker process keeps its own counters and histograms and writes a
+snapshot to METRICS_DIR/<pid>-<random id>.json (at most every
+METRICS_FLUSH_INTERVAL seconds, from the request path); the random part
+keeps a new worker that reuses a pid from overwriting its predecessor's
+file. /metrics sums the snapshots of all workers, so any worker can answer
+a scrape. Snapshots of exited workers are folded into retired.json under a
+file lock, so their counters keep counting towards the totals while the
+directory stays small; gauges (queue depths) only come from live processes.
+
+Set METRICS_DIR to None to report the answering process only.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: only lock within the process
+    fcntl = None
+
+RETIRED_NAME = 'retired.json'
+LOCK_NAME = '.lock'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help)
+METRICS = {
+    'api_request_duration_seconds': ('histogram', 'Request latency by view, up to the response headers'),
+    'api_requests_total': ('counter', 'Requests by view and status code'),
+    'api_ingest_phase_seconds': ('histogram', 'Upload ingest time by phase'),
+    'api_ingest_rows_total': ('counter', 'CSV rows analysed'),
+    'api_ingest_bytes_total': ('counter', 'CSV bytes analysed'),
+    'api_ingest_seconds_total': ('counter', 'Time spent parsing and aggregating CSVs'),
+    'api_cache_hits_total': ('counter', 'Cache hits by cache'),
+    'api_cache_misses_total': ('counter', 'Cache misses by cache'),
+    'api_executor_pending': ('gauge', 'Running plus queued jobs by worker pool'),
+    'api_admission_running': ('gauge', 'Requests holding an admission slot by gate'),
+    'api_admission_waiting': ('gauge', 'Requests waiting for an admission slot by gate'),
+}
+
+# Computed at exposition time from the summed counters
+DERIVED = {
+    'api_ingest_rows_per_second': ('gauge', 'CSV rows analysed per second of analysis time'),
+    'api_ingest_bytes_per_second': ('gauge', 'CSV bytes analysed per second of analysis time'),
+    'api_cache_hit_ratio': ('gauge', 'Cache hits over lookups by cache'),
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Counters and histograms of this process."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        # key -> [count per bucket..., sum, count]
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._pid = None
+        self._instance = None
+
+    @property
+    def instance(self):
+        """'<pid>-<random id>', new in each process (also after a fork)."""
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._instance = f'{pid}-{uuid.uuid4().hex[:12]}'
+        return self._instance
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """JSON-serialisable state of this process, gauges included."""
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, dict(labels), list(values)]
+                          for (name, labels), values in self._histograms.items()]
+        counters += _live_counters()
+        return {
+            'pid': os.getpid(),
+            'instance': self.instance,
+            'buckets': list(self.buckets),
+            'counters': counters,
+            'histograms': histograms,
+            'gauges': _gauges(),
+        }
+
+    def flush_due(self):
+        """Whether flush() would write now."""
+        return (settings.METRICS_DIR is not None
+                and time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL)
+
+    def flush(self, force=False):
+        """Write this process's snapshot to METRICS_DIR."""
+        directory = settings.METRICS_DIR
+        if directory is None:
+            return
+        if not force and not self.flush_due():
+            return
+        self._last_flush = time.monotonic()
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{self.instance}.json'
+        first = not path.exists()
+        _write_json(path, self.snapshot())
+        if first:
+            # A predecessor with the same pid stops counting as live now
+            retire_stale_snapshots(directory)
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
+
+
+def _live_counters():
+    # Counters kept elsewhere, read when the snapshot is taken
+    from .authentication import user_cache
+    return [
+        ['api_cache_hits_total', {'cache': 'auth_user'}, user_cache.hits],
+        ['api_cache_misses_total', {'cache': 'auth_user'}, user_cache.misses],
+    ]
+
+
+def _gauges():
+    from . import admission, executors
+    gauges = []
+    for name, executor in list(executors._executors.items()):
+        gauges.append(['api_executor_pending', {'pool': name}, executor.pending])
+    for name, gate in list(admission._gates.items()):
+        gauges.append(['api_admission_running', {'gate': name}, gate.running])
+        gauges.append(['api_admission_waiting', {'gate': name}, gate.waiting])
+    return gauges
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_retire_lock = threading.Lock()
+
+
+@contextmanager
+def _directory_lock(directory):
+    with _retire_lock, open(directory / LOCK_NAME, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _read_snapshot(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None  # Being replaced or removed right now
+
+
+def retire_stale_snapshots(directory):
+    """
+    Fold the snapshots of exited workers into RETIRED_NAME and remove them.
+    A file is stale when its process is gone, or when its pid now belongs
+    to another live instance (the pid was reused).
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return
+    with _directory_lock(directory):
+        live = {}
+        stale = []
+        for path in directory.glob('*.json'):
+            if path.name == RETIRED_NAME:
+                continue
+            snapshot = _read_snapshot(path)
+            if snapshot is None:
+                continue
+            if not _pid_alive(snapshot['pid']):
+                stale.append((path, snapshot))
+            else:
+                live.setdefault(snapshot['pid'], []).append((path, snapshot))
+        own = registry.instance
+        for entries in live.values():
+            if len(entries) > 1:
+                # Pid reuse: the newest file belongs to the running process
+                entries.sort(key=lambda entry: (entry[1].get('instance') == own, _mtime(entry[0])))
+                stale += entries[:-1]
+        if not stale:
+            return
+
+        retired = _read_snapshot(directory / RETIRED_NAME)
+        merged = combine([snapshot for _, snapshot in stale] + ([retired] if retired else []))
+        _write_json(directory / RETIRED_NAME, merged)
+        for path, _ in stale:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def combine(snapshots):
+    """One snapshot with the summed counters and histograms of `snapshots`, no gauges."""
+    totals, bucket_bounds = aggregate([{**snapshot, 'gauges': []} for snapshot in snapshots])
+    counters = []
+    histograms = []
+    for name, series in totals.items():
+        target = histograms if name in bucket_bounds else counters
+        for key, value in series.items():
+            target.append([name, dict(key), value])
+    buckets = next(iter(bucket_bounds.values()), list(registry.buckets))
+    return {
+        'pid': None,
+        'instance': 'retired',
+        'buckets': buckets,
+        'counters': counters,
+        'histograms': histograms,
+        'gauges': [],
+    }
+
+
+def collect_snapshots():
+    """Snapshots of every worker, this one fresh."""
+    own = registry.snapshot()
+    directory = settings.METRICS_DIR
+    if directory is None:
+        return [own]
+
+    registry.flush(force=True)
+    retire_stale_snapshots(directory)
+    snapshots = [own]
+    for path in Path(directory).glob('*.json'):
+        if path.stem == own['instance']:
+            continue
+        snapshot = _read_snapshot(path)
+        if snapshot is None:
+            continue
+        if snapshot['pid'] is not None and not _pid_alive(snapshot['pid']):
+            snapshot['gauges'] = []
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def aggregate(snapshots):
+    """Sum snapshots into {name: {labels tuple: value}}."""
+    totals = {}
+    bucket_bounds = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters'] + snapshot['gauges']:
+            series = totals.setdefault(name, {})
+            key = tuple(sorted(labels.items()))
+            series[key] = series.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            bounds = bucket_bounds.setdefault(name, snapshot['buckets'])
+            if bounds != snapshot['buckets']:
+                continue  # Worker running with different buckets
+            series = totals.setdefault(name, {})
+            key = tuple(sorted(labels.items()))
+            current = series.get(key)
+            series[key] = values if current is None else [a + b for a, b in zip(current, values)]
+    return totals, bucket_bounds
+
+
+def _derived(totals):
+    derived = {}
+    seconds = sum(totals.get('api_ingest_seconds_total', {}).values())
+    if seconds:
+        derived['api_ingest_rows_per_second'] = {
+            (): sum(totals.get('api_ingest_rows_total', {}).values()) / seconds}
+        derived['api_ingest_bytes_per_second'] = {
+            (): sum(totals.get('api_ingest_bytes_total', {}).values()) / seconds}
+
+    ratios = {}
+    hits = totals.get('api_cache_hits_total', {})
+    misses = totals.get('api_cache_misses_total', {})
+    for key in set(hits) | set(misses):
+        lookups = hits.get(key, 0) + misses.get(key, 0)
+        if lookups:
+            ratios[key] = hits.get(key, 0) / lookups
+    if ratios:
+        derived['api_cache_hit_ratio'] = ratios
+    return derived
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshots):
+    """Prometheus text exposition (format 0.0.4) of the summed snapshots."""
+    totals, bucket_bounds = aggregate(snapshots)
+    totals.update(_derived(totals))
+    lines = []
+    for name, (kind, help_text) in {**METRICS, **DERIVED}.items():
+        series = totals.get(name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key in sorted(series):
+            value = series[key]
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(key)} {_number(value)}')
+                continue
+            bounds = bucket_bounds[name]
+            for bound, count in zip(bounds, value):
+                lines.append(f'{name}_bucket{_labels(key + (("le", _number(float(bound))),))} {count}')
+            lines.append(f'{name}_bucket{_labels(key + (("le", "+Inf"),))} {value[-1]}')
+            lines.append(f'{name}_sum{_labels(key)} {_number(float(value[-2]))}')
+            lines.append(f'{name}_count{_labels(key)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
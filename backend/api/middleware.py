@@ -0,0 +1,228 @@
+import cProfile
+import hmac
+import json
+import logging
+import random
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from . import metrics, timing
+from .profiling import new_profile_id, save_profile
+
+request_logger = logging.getLogger('api.requests')
+
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for middleware that runs in the handler's own mode: under ASGI the
+    async views stay on the event loop instead of Django adapting the
+    chain to a thread per request. Subclasses implement both __call__
+    paths, sync in `handle` and async in `ahandle`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class TimingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Server-Timing header and one JSON log line (logger 'api.requests') per
+    request, with the phases collected in api/timing.py. The request id is
+    taken from an incoming X-Request-ID header or generated, and echoed in
+    the response.
+    """
+
+    def handle(self, request):
+        token, start = self._begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            phases = timing.stop(token)
+        return self._finish(request, response, phases, start)
+
+    async def ahandle(self, request):
+        token, start = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            phases = timing.stop(token)
+        return self._finish(request, response, phases, start)
+
+    def _begin(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return timing.start(), time.perf_counter()
+
+    def _finish(self, request, response, phases, start):
+        total = time.perf_counter() - start
+        request_id = request.request_id
+
+        response['Server-Timing'] = timing.server_timing_header(phases, total)
+        response['X-Request-ID'] = request_id
+
+        if request_logger.isEnabledFor(logging.INFO):
+            match = request.resolver_match
+            user = getattr(request, 'user', None)
+            request_logger.info(json.dumps({
+                'request_id': request_id,
+                'method': request.method,
+                'path': request.path,
+                'view': match.url_name if match is not None else None,
+                'status': response.status_code,
+                'user_id': getattr(user, 'id', None),
+                'duration_ms': round(total * 1000, 1),
+                'phases': {
+                    name: {'ms': round(seconds * 1000, 1), 'count': count}
+                    for name, (seconds, count) in phases.items()
+                },
+            }))
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware limited to buffered responses of COMPRESS_CONTENT_TYPES
+    (JSON, the metrics text). Streamed PDFs and CSV downloads are left
+    alone: they barely compress and keep their Content-Length.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if response.streaming or content_type not in settings.COMPRESS_CONTENT_TYPES:
+            return response
+        return super().process_response(request, response)
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """Request latency and status counts per view, see api/metrics.py."""
+
+    def handle(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, start)
+        metrics.registry.flush()
+        return response
+
+    async def ahandle(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, start)
+        if metrics.registry.flush_due():
+            # File write; keep it off the event loop
+            await sync_to_async(metrics.registry.flush, thread_sensitive=False)()
+        return response
+
+    def _record(self, request, response, start):
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        metrics.observe('api_request_duration_seconds', elapsed, view=view)
+        metrics.inc('api_requests_total', view=view, status=str(response.status_code))
+
+
+class ProfilingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Run cProfile around requests flagged with `X-Profile: 1` or `?profile=1`,
+    or sampled at PROFILING_SAMPLE_RATE; see api/profiling.py.
+
+    The flag only counts together with an `X-Profile-Token` header matching
+    PROFILING_TOKEN, checked before the profiler starts, so clients cannot
+    slow their own requests down at will. Flagged requests are then only
+    saved for staff users. That check happens after the view because JWT
+    authentication runs inside DRF, which sets request.user on the way.
+
+    Under ASGI the profiler sees the event loop thread, so a profile of an
+    async request also includes other coroutines that ran meanwhile.
+    """
+
+    def handle(self, request):
+        trigger = self._trigger(request)
+        profiler = self._start_profiler(trigger)
+        if profiler is None:
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        return self._save(request, response, profiler, trigger, start)
+
+    async def ahandle(self, request):
+        trigger = self._trigger(request)
+        profiler = self._start_profiler(trigger)
+        if profiler is None:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+        return await sync_to_async(self._save, thread_sensitive=False)(
+            request, response, profiler, trigger, start)
+
+    def _trigger(self, request):
+        """'requested', 'sampled' or None"""
+        if not settings.PROFILING_ENABLED:
+            return None
+        if request.headers.get('X-Profile') == '1' or request.GET.get('profile') == '1':
+            if self._token_valid(request):
+                return 'requested'
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            return 'sampled'
+        return None
+
+    @staticmethod
+    def _token_valid(request):
+        token = settings.PROFILING_TOKEN
+        return bool(token) and hmac.compare_digest(
+            request.headers.get('X-Profile-Token', ''), token)
+
+    @staticmethod
+    def _start_profiler(trigger):
+        if trigger is None:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process
+            return None
+        return profiler
+
+    def _save(self, request, response, profiler, trigger, start):
+        elapsed = time.perf_counter() - start
+        user = getattr(request, 'user', None)
+        if trigger == 'requested' and not getattr(user, 'is_staff', False):
+            return response
+
+        profile_id = new_profile_id()
+        save_profile(profiler, profile_id, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 1),
+            'user': getattr(user, 'username', '') or '',
+            'trigger': trigger,
+            'created': time.time(),
+        })
+        response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_existing_datasets(apps, schema_editor):
+    """
+    Hand datasets uploaded before ownership existed to the first superuser
+    so they stay visible, and record their file sizes for quotas.
+    """
+    EquipmentDataset = apps.get_model('api', 'EquipmentDataset')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    admin = User.objects.filter(is_superuser=True).order_by('pk').first()
+
+    for dataset in EquipmentDataset.objects.filter(owner__isnull=True):
+        dataset.owner = admin
+        try:
+            dataset.file_size = dataset.file.size
+        except (OSError, ValueError):
+            pass
+        dataset.save(update_fields=['owner', 'file_size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_equipmentdataset_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='file_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='datasets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentdataset',
+            index=models.Index(fields=['owner', '-uploaded_at'], name='dataset_owner_uploaded_idx'),
+        ),
+        migrations.RunPython(assign_existing_datasets, migrations.RunPython.noop),
+    ]
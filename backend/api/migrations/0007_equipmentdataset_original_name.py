@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_equipmentdataset_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='original_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -1,8 +1,31 @@
+from django.conf import settings
 from django.db import models
 
 class EquipmentDataset(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_READY, "Ready"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    # Null only for datasets uploaded before ownership existed
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        null=True, blank=True, related_name="datasets")
     file = models.FileField(upload_to="uploads/")
+    # Client-side file name; `file` is a content-addressed blob path
+    original_name = models.CharField(max_length=255, blank=True, default="")
+    # Bytes on disk, counted against the owner's storage quota
+    file_size = models.BigIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # SHA-256 of the uploaded file, used to key cached reports
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    # Large uploads are analysed in the background; their statistics are
+    # filled in when the status moves from pending to ready
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_READY)
 
     total_count = models.IntegerField(default=0)
     avg_flowrate = models.FloatField(default=0.0)
@@ -22,5 +45,11 @@ class EquipmentDataset(models.Model):
 
     rows = models.JSONField(default=list)
 
+    class Meta:
+        indexes = [
+            # Every read is "this user's datasets, newest first"
+            models.Index(fields=["owner", "-uploaded_at"], name="dataset_owner_uploaded_idx"),
+        ]
+
     def __str__(self):
         return f"Dataset {self.id} - {self.uploaded_at}"
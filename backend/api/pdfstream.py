@@ -0,0 +1,200 @@
+"""
+Minimal incremental PDF writer.
+
+ReportLab's canvas keeps every finished page in memory until save(), which
+is fine for the one-page summary report but not for full-data reports that
+run to thousands of pages. This writer sends each page to the output file as
+soon as it is finished and only keeps object offsets until the end.
+
+It supports only what the full report needs: the standard Helvetica fonts,
+text, lines, filled rectangles and reusable form XObjects (used for charts).
+"""
+import unicodedata
+import zlib
+
+# Page geometry in points, defined exactly as reportlab.lib.units.mm and
+# reportlab.lib.pagesizes.A4 so layout code does not have to import ReportLab
+mm = 72 / 2.54 * 0.1
+A4 = (210 * mm, 297 * mm)
+
+FONTS = {
+    "F1": "Helvetica",
+    "F2": "Helvetica-Bold",
+}
+
+
+def hex_color(value):
+    """'#667eea' -> (r, g, b) floats."""
+    value = value.lstrip('#')
+    return tuple(int(value[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _winansi(text):
+    """
+    Encode for the fonts' WinAnsiEncoding (cp1252). Characters outside it
+    fall back to their unaccented form ('ť' -> 't') or '?', since the
+    standard fonts have no glyphs for them.
+    """
+    text = str(text)
+    try:
+        return text.encode('cp1252')
+    except UnicodeEncodeError:
+        pass
+    out = bytearray()
+    for char in text:
+        try:
+            out += char.encode('cp1252')
+        except UnicodeEncodeError:
+            out += unicodedata.normalize('NFKD', char).encode('cp1252', errors='ignore') or b'?'
+    return bytes(out)
+
+
+def _escape(text):
+    raw = _winansi(text)
+    # A bare line break inside a literal string would be read back as \n
+    for char, escaped in ((b'\\', b'\\\\'), (b'(', b'\\('), (b')', b'\\)'),
+                          (b'\r', b'\\r'), (b'\n', b'\\n')):
+        raw = raw.replace(char, escaped)
+    return raw
+
+
+def _n(value):
+    return f"{value:.2f}".encode()
+
+
+class Graphics:
+    """Drawing operations for one page or form, collected as a content stream."""
+
+    def __init__(self):
+        self._ops = []
+
+    def fill_color(self, color):
+        r, g, b = hex_color(color)
+        self._ops.append(b"%s %s %s rg" % (_n(r), _n(g), _n(b)))
+
+    def stroke_color(self, color):
+        r, g, b = hex_color(color)
+        self._ops.append(b"%s %s %s RG" % (_n(r), _n(g), _n(b)))
+
+    def text(self, x, y, text, font="F1", size=10):
+        self._ops.append(b"BT /%s %s Tf %s %s Td (%s) Tj ET" % (
+            font.encode(), _n(size), _n(x), _n(y), _escape(text)))
+
+    def text_row(self, x, y, cells, font="F1", size=10):
+        """
+        Draw several strings on one baseline in a single text object.
+        `cells` is a list of (offset from x, text) pairs.
+        """
+        parts = [b"BT /%s %s Tf %s %s Td" % (font.encode(), _n(size), _n(x), _n(y))]
+        previous = 0
+        for offset, text in cells:
+            if offset != previous:
+                parts.append(b"%s 0 Td" % _n(offset - previous))
+                previous = offset
+            parts.append(b"(%s) Tj" % _escape(text))
+        parts.append(b"ET")
+        self._ops.append(b" ".join(parts))
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self._ops.append(b"%s w %s %s m %s %s l S" % (_n(width), _n(x1), _n(y1), _n(x2), _n(y2)))
+
+    def rect(self, x, y, w, h):
+        self._ops.append(b"%s %s %s %s re f" % (_n(x), _n(y), _n(w), _n(h)))
+
+    def form(self, name, x, y):
+        self._ops.append(b"q 1 0 0 1 %s %s cm /%s Do Q" % (_n(x), _n(y), name.encode()))
+
+    def data(self):
+        return b"\n".join(self._ops)
+
+
+class StreamingPDFWriter:
+    """
+    Write a PDF to the binary file object `fileobj` page by page. Call
+    add_page() for each finished page and close() once at the end.
+    """
+
+    def __init__(self, fileobj, pagesize):
+        self._f = fileobj
+        self._pos = 0
+        self._offsets = {}
+        self._next_id = 1
+        self._page_ids = []
+        self._forms = {}
+        self.width, self.height = pagesize
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        # Written last, but referenced by every page and form
+        self._catalog_id = self._reserve()
+        self._pages_id = self._reserve()
+        self._resources_id = self._reserve()
+        self._font_ids = {name: self._reserve() for name in FONTS}
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    def _reserve(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write(self, data):
+        self._f.write(data)
+        self._pos += len(data)
+
+    def _write_object(self, obj_id, body):
+        self._offsets[obj_id] = self._pos
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, body.encode() if isinstance(body, str) else body))
+
+    def _write_stream(self, obj_id, entries, data):
+        data = zlib.compress(data)
+        self._offsets[obj_id] = self._pos
+        self._write(b"%d 0 obj\n<< %s /Filter /FlateDecode /Length %d >>\nstream\n" % (
+            obj_id, entries.encode(), len(data)))
+        self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+
+    def add_form(self, name, graphics, width, height):
+        """Write `graphics` once as a form XObject that pages can place by `name`."""
+        obj_id = self._reserve()
+        self._write_stream(
+            obj_id,
+            f"/Type /XObject /Subtype /Form /BBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Resources {self._resources_id} 0 R",
+            graphics.data())
+        self._forms[name] = obj_id
+
+    def add_page(self, graphics):
+        content_id = self._reserve()
+        page_id = self._reserve()
+        self._write_stream(content_id, "", graphics.data())
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent {self._pages_id} 0 R "
+            f"/MediaBox [0 0 {self.width:.2f} {self.height:.2f}] "
+            f"/Resources {self._resources_id} 0 R /Contents {content_id} 0 R >>")
+        self._page_ids.append(page_id)
+
+    def close(self):
+        for name, font_id in self._font_ids.items():
+            self._write_object(
+                font_id,
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{FONTS[name]} /Encoding /WinAnsiEncoding >>")
+
+        fonts = " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in self._font_ids.items())
+        forms = " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in self._forms.items())
+        self._write_object(self._resources_id, f"<< /Font << {fonts} >> /XObject << {forms} >> >>")
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(
+            self._pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_object(self._catalog_id, f"<< /Type /Catalog /Pages {self._pages_id} 0 R >>")
+
+        xref_pos = self._pos
+        size = self._next_id
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for obj_id in range(1, size):
+            self._write(b"%010d 00000 n \n" % self._offsets[obj_id])
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            size, self._catalog_id, xref_pos))
@@ -0,0 +1,83 @@
+"""
+On-demand request profiles.
+
+ProfilingMiddleware (api/middleware.py) runs cProfile around a request when
+a staff user asks for it with an `X-Profile: 1` header or `?profile=1` plus
+an `X-Profile-Token: <PROFILING_TOKEN>` header, or for a random
+PROFILING_SAMPLE_RATE fraction of all requests. Profiles are
+written to PROFILING_DIR as <id>.prof (load with pstats or snakeviz) and
+listed in PROFILING_DIR/index.jsonl; /profiles/ shows the most recent.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: only lock within the process
+    fcntl = None
+
+INDEX_NAME = "index.jsonl"
+
+_index_lock = threading.Lock()
+
+
+def profile_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def profile_path(profile_id):
+    return profile_dir() / f"{profile_id}.prof"
+
+
+def new_profile_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def save_profile(profiler, profile_id, entry):
+    """Dump `profiler` and add `entry` (path, duration, ...) to the index."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(profile_path(profile_id))
+
+    line = json.dumps({"id": profile_id, **entry}) + "\n"
+    with _index_lock, open(directory / INDEX_NAME, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(line)
+        f.flush()
+        f.seek(0)
+        lines = f.readlines()
+        keep = settings.PROFILING_KEEP
+        if len(lines) > keep:
+            # Drop the oldest profiles along with their index lines
+            for stale in lines[:-keep]:
+                try:
+                    os.remove(profile_path(json.loads(stale)["id"]))
+                except (OSError, ValueError, KeyError):
+                    pass
+            f.seek(0)
+            f.truncate()
+            f.writelines(lines[-keep:])
+
+
+def recent_profiles(limit=50):
+    """Newest first."""
+    try:
+        with open(profile_dir() / INDEX_NAME) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+
+    entries = []
+    for line in reversed(lines[-limit:]):
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue  # Partially written line
+    return entries
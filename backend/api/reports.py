@@ -0,0 +1,441 @@
+"""
+PDF report rendering and the on-disk report cache.
+
+A dataset never changes after upload, so its report is rendered once and
+kept under REPORT_CACHE_DIR, keyed by (dataset id, content hash, template
+version). Bump REPORT_TEMPLATE_VERSION whenever the layout below changes so
+old files stop matching.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import metrics, timing
+from .admission import admit
+from .db import write_transaction
+from .executors import get_executor
+from .full_report import render_full_report
+from .pdfstream import A4, mm
+from .storage import blob_hash
+
+REPORT_TEMPLATE_VERSION = 2
+
+# "summary" is the one-page report; "full" adds per-type sections and every
+# row (see full_report.py)
+REPORT_MODES = ("summary", "full")
+
+logger = logging.getLogger(__name__)
+
+# Background renders in flight, keyed by cache path
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def file_content_hash(name):
+    """SHA-256 of a stored file."""
+    # Content-addressed blobs carry their hash in the name
+    content_hash = blob_hash(name)
+    if content_hash:
+        return content_hash
+    if hasattr(default_storage, 'open_mmap'):
+        with default_storage.open_mmap(name) as data:
+            return hashlib.sha256(data).hexdigest()
+
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@write_transaction
+def _save_content_hash(model, pk, content_hash):
+    # queryset update so the post_save purge does not fire
+    model.objects.filter(pk=pk).update(content_hash=content_hash)
+
+
+def dataset_content_hash(dataset):
+    """Return the dataset's content hash, computing it for older rows."""
+    if not dataset.content_hash:
+        content_hash = file_content_hash(dataset.file.name)
+        _save_content_hash(type(dataset), dataset.pk, content_hash)
+        dataset.content_hash = content_hash
+    return dataset.content_hash
+
+
+def report_cache_dir(dataset_id):
+    return Path(settings.REPORT_CACHE_DIR) / str(dataset_id)
+
+
+def _mode_suffix(mode):
+    return "" if mode == "summary" else f"-{mode}"
+
+
+def report_cache_path(dataset, mode="summary"):
+    content_hash = dataset_content_hash(dataset)
+    return report_cache_dir(dataset.pk) / f"{content_hash}-v{REPORT_TEMPLATE_VERSION}{_mode_suffix(mode)}.pdf"
+
+
+def report_etag(dataset, mode="summary"):
+    return f'"{dataset.pk}-{dataset_content_hash(dataset)[:16]}-v{REPORT_TEMPLATE_VERSION}{_mode_suffix(mode)}"'
+
+
+def get_or_build_report(dataset, mode="summary"):
+    """
+    Return the path of the cached report for `dataset`, rendering it first
+    if needed. The file is written to a temp name and renamed into place so
+    readers never see a partial PDF.
+    """
+    path = report_cache_path(dataset, mode)
+    if path.exists():
+        metrics.inc('api_cache_hits_total', cache='report')
+        return path
+    metrics.inc('api_cache_misses_total', cache='report')
+
+    # Pre-generation already running for this report: wait for it instead
+    # of rendering a second copy
+    if _wait_pending(path):
+        return path
+
+    # Only actual renders count against the 'reports' gate, cache hits don't
+    with admit('reports'), timing.phase('report'):
+        return _build_report(dataset, path, mode)
+
+
+def _wait_pending(path):
+    """Wait for a pre-generation of `path` in flight; True if it produced the file."""
+    with _pending_lock:
+        future = _pending.get(path)
+    if future is None:
+        return False
+    try:
+        future.result()
+    except Exception:
+        pass
+    return path.exists()
+
+
+def _build_report(dataset, path, mode="summary"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    build_report_file(report_data(dataset), dataset.file.name, path, mode)
+    return path
+
+
+def build_reports(datasets):
+    """
+    Return cached report paths for several datasets, in order. Missing
+    reports are rendered under the 'reports' gate, in parallel on the
+    'bulk_reports' process pool, or inline when that pool is saturated.
+    """
+    paths = [report_cache_path(dataset) for dataset in datasets]
+    missing = []
+    for dataset, path in zip(datasets, paths):
+        if path.exists():
+            metrics.inc('api_cache_hits_total', cache='report')
+            continue
+        metrics.inc('api_cache_misses_total', cache='report')
+        if not _wait_pending(path):
+            missing.append((dataset, path))
+    if not missing:
+        return paths
+
+    with admit('reports'), timing.phase('report'):
+        futures = []
+        for dataset, path in missing:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            future = get_executor('bulk_reports').submit(
+                render_report_file, report_data(dataset), str(path))
+            if future is None:
+                render_report_file(report_data(dataset), path)
+            else:
+                futures.append(future)
+
+        for future in futures:
+            future.result()
+    return paths
+
+
+def build_combined_report(datasets, path):
+    """
+    Write one PDF with a shared summary page followed by each dataset's
+    cached report. Only missing reports are rendered; the rest are copied
+    page by page from the report cache.
+    """
+    paths = build_reports(datasets)
+    datas = [report_data(dataset) for dataset in datasets]
+    with timing.phase('report'):
+        _write_atomic(path, lambda f: merge_reports(datas, paths, f))
+    return path
+
+
+def pregenerate_report(dataset_id):
+    """Render and cache a dataset's report; run on the 'reports' pool."""
+    from .models import EquipmentDataset
+
+    try:
+        dataset = EquipmentDataset.objects.get(pk=dataset_id)
+    except EquipmentDataset.DoesNotExist:
+        # Removed by retention before we got to it
+        return None
+    path = report_cache_path(dataset)
+    if path.exists():
+        return path
+    return _build_report(dataset, path)
+
+
+def schedule_report(dataset):
+    """
+    Queue report pre-generation once the current transaction commits.
+    Dropped silently when the pool is saturated; the download view will
+    render on demand instead.
+    """
+    def submit():
+        path = report_cache_path(dataset)
+        future = get_executor('reports').submit(pregenerate_report, dataset.pk)
+        if future is None:
+            logger.info("Report pool full, skipping pre-generation for dataset %s", dataset.pk)
+            return
+        with _pending_lock:
+            _pending[path] = future
+        future.add_done_callback(lambda f: _forget_pending(path, f))
+
+    transaction.on_commit(submit)
+
+
+def _forget_pending(path, future):
+    with _pending_lock:
+        if _pending.get(path) is future:
+            del _pending[path]
+    if future.exception() is not None:
+        logger.error("Report pre-generation failed for %s", path, exc_info=future.exception())
+
+
+def purge_report_cache(dataset_id):
+    """Remove every cached report for a dataset."""
+    shutil.rmtree(report_cache_dir(dataset_id), ignore_errors=True)
+
+
+def report_data(dataset):
+    """
+    Plain, picklable snapshot of everything the report shows, so rendering
+    can run in another process.
+    """
+    # dataset.type_distribution assumed to be dict or JSONField
+    td = dataset.type_distribution or {}
+    # If stored as string, try parse
+    if isinstance(td, str):
+        try:
+            td = json.loads(td)
+        except Exception:
+            td = {}
+
+    return {
+        "id": dataset.id,
+        "uploaded_at": dataset.uploaded_at.isoformat(),
+        "total_count": dataset.total_count,
+        "avg_flowrate": dataset.avg_flowrate,
+        "avg_pressure": dataset.avg_pressure,
+        "avg_temperature": dataset.avg_temperature,
+        "min_flowrate": dataset.min_flowrate,
+        "max_flowrate": dataset.max_flowrate,
+        "min_pressure": dataset.min_pressure,
+        "max_pressure": dataset.max_pressure,
+        "min_temperature": dataset.min_temperature,
+        "max_temperature": dataset.max_temperature,
+        "type_distribution": td,
+        "source": _source_label(dataset),
+    }
+
+
+def _source_label(dataset):
+    if not dataset.file:
+        return "N/A"
+    if dataset.original_name:
+        return f"{dataset.original_name} {dataset.file.name}"
+    return dataset.file.name
+
+
+def _write_atomic(path, render):
+    """Call render(fileobj) on a temp file next to `path`, then rename it in."""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            render(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def render_report(data, fileobj):
+    """Write the PDF report described by `data` into `fileobj`."""
+    from reportlab.pdfgen import canvas  # Heavy; loaded on first render
+
+    p = canvas.Canvas(fileobj, pagesize=A4)
+    draw_report(p, data)
+    p.save()
+
+
+def render_report_file(data, path):
+    # Module level so process pools can pickle it
+    _write_atomic(path, lambda f: render_report(data, f))
+
+
+def build_report_file(data, source, path, mode="summary"):
+    """Render a report of any mode to `path`; safe to run in a worker process."""
+    if mode == "full":
+        _write_atomic(path, lambda f: render_full_report(data, source, f))
+    else:
+        render_report_file(data, path)
+
+
+def merge_reports(datas, paths, fileobj):
+    """Write the combined summary page for `datas`, then the PDFs at `paths`, into `fileobj`."""
+    from pypdf import PdfWriter  # Loaded on first combined report
+    from reportlab.pdfgen import canvas
+
+    summary = io.BytesIO()
+    p = canvas.Canvas(summary, pagesize=A4)
+    draw_combined_summary(p, datas)
+    p.save()
+
+    writer = PdfWriter()
+    writer.append(summary)
+    for path in paths:
+        writer.append(str(path))
+    writer.write(fileobj)
+
+
+def draw_combined_summary(p, datas):
+    """Cover page for a combined report: one line per dataset plus totals."""
+    width, height = A4
+    left = 20 * mm
+    top = height - 20 * mm
+    line_h = 8 * mm
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(left, top, f"Combined Report — {len(datas)} datasets")
+
+    y = top - 1.8 * line_h
+    p.setFont("Helvetica-Bold", 10)
+    columns = [("ID", 0), ("Uploaded", 15), ("Count", 75), ("Avg Flow", 95),
+               ("Avg Press", 120), ("Avg Temp", 145)]
+    for label, offset in columns:
+        p.drawString(left + offset * mm, y, label)
+    y -= 0.9 * line_h
+    p.setFont("Helvetica", 10)
+
+    for data in datas:
+        if y < 40 * mm:
+            p.showPage()
+            y = top
+            p.setFont("Helvetica", 10)
+        values = [data["id"], data["uploaded_at"][:16].replace("T", " "), data["total_count"],
+                  data["avg_flowrate"], data["avg_pressure"], data["avg_temperature"]]
+        for (label, offset), value in zip(columns, values):
+            p.drawString(left + offset * mm, y, str(value))
+        y -= 0.8 * line_h
+
+    total = sum(data["total_count"] for data in datas)
+    y -= 0.5 * line_h
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(left, y, f"Total equipment across datasets: {total}")
+    p.showPage()
+
+
+def draw_report(p, data):
+    """
+    Draw the report pages for one dataset onto the ReportLab canvas `p`.
+    """
+    width, height = A4
+
+    # Margins
+    left = 20 * mm
+    top = height - 20 * mm
+    line_h = 8 * mm
+
+    # Header
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(left, top, f"Dataset Report — ID {data['id']}")
+
+    p.setFont("Helvetica", 10)
+    p.drawString(left, top - 1.2 * line_h, f"Uploaded: {data['uploaded_at']}")
+
+    # Summary box
+    y = top - 2.6 * line_h
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(left, y, "Summary")
+    y -= 1.1 * line_h
+    p.setFont("Helvetica", 10)
+
+    def draw_kv(key, value, indent=0):
+        nonlocal y
+        p.drawString(left + indent, y, f"{key}: {value}")
+        y -= 0.9 * line_h
+
+    draw_kv("Total count", data.get("total_count", "N/A"))
+    draw_kv("Avg Flowrate", data.get("avg_flowrate", "N/A"))
+    draw_kv("Avg Pressure", data.get("avg_pressure", "N/A"))
+    draw_kv("Avg Temperature", data.get("avg_temperature", "N/A"))
+    draw_kv("Min Flowrate", data.get("min_flowrate", "N/A"))
+    draw_kv("Max Flowrate", data.get("max_flowrate", "N/A"))
+    draw_kv("Min Pressure", data.get("min_pressure", "N/A"))
+    draw_kv("Max Pressure", data.get("max_pressure", "N/A"))
+    draw_kv("Min Temperature", data.get("min_temperature", "N/A"))
+    draw_kv("Max Temperature", data.get("max_temperature", "N/A"))
+
+    # Leave a bit of space before distribution
+    y -= 0.5 * line_h
+
+    # Type distribution
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(left, y, "Type Distribution")
+    y -= 1.1 * line_h
+    p.setFont("Helvetica", 10)
+
+    td = data["type_distribution"]
+
+    # Draw as simple two-column table
+    p.drawString(left, y, "Type")
+    p.drawString(left + 80 * mm, y, "Count")
+    y -= 0.9 * line_h
+
+    for tp, cnt in td.items():
+        # If out of space, add a new page
+        if y < 40 * mm:
+            p.showPage()
+            y = top - 20 * mm
+            p.setFont("Helvetica", 10)
+
+        p.drawString(left, y, str(tp))
+        p.drawString(left + 80 * mm, y, str(cnt))
+        y -= 0.8 * line_h
+
+    # Optionally include original CSV path (local path). We include it as text:
+    y -= 1.1 * line_h
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(left, y, "Source file (local path):")
+    y -= 0.9 * line_h
+    p.setFont("Helvetica", 9)
+    src = data["source"]
+    # Draw multi-line if long
+    text_obj = p.beginText(left, y)
+    text_obj.setFont("Helvetica", 9)
+    # naive wrap: split at spaces
+    for part in str(src).split():
+        text_obj.textLine(part)
+    p.drawText(text_obj)
+
+    # Finalize
+    p.showPage()
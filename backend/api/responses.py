@@ -0,0 +1,165 @@
+"""
+File responses with ETag and single-range (HTTP Range) support, plus a
+streamed ZIP archive of several files.
+"""
+import io
+import os
+import re
+import zipfile
+
+from asgiref.sync import sync_to_async
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in [tag.strip() for tag in header.split(',')]
+
+
+def _parse_range(header, size):
+    """
+    Parse a single `bytes=start-end` range. Returns (start, end) inclusive,
+    None if the header should be ignored, or False if it is unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: serve the whole file
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # suffix range: last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _aiter_file_range(path, start, length):
+    # Django would buffer a sync iterator whole under ASGI; read each chunk
+    # in a thread instead
+    f = await sync_to_async(open)(path, 'rb')
+    try:
+        await sync_to_async(f.seek)(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await sync_to_async(f.read)(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(f.close)()
+
+
+def file_response(request, path, filename, etag, content_type='application/pdf', asynchronous=False):
+    """
+    Serve `path` as an attachment with Content-Length and ETag. Honors
+    If-None-Match (304), Range (206/416) and If-Range. Pass
+    asynchronous=True from async views to stream with an async iterator.
+    """
+    iter_range = _aiter_file_range if asynchronous else _iter_file_range
+    etag = quote_etag(etag)
+    size = os.path.getsize(path)
+
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header:
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range.strip() == etag:
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_range(path, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    elif asynchronous:
+        response = StreamingHttpResponse(iter_range(path, 0, size), content_type=content_type)
+        response['Content-Length'] = str(size)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        response = FileResponse(
+            open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+        response['Content-Length'] = str(size)
+
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable stream that buffers whatever zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def iter_zip(entries):
+    """
+    Yield a ZIP archive of `entries` ((arcname, path) pairs) chunk by chunk.
+    Files are stored uncompressed; PDFs are already compressed.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in entries:
+            with open(path, 'rb') as src, archive.open(arcname, 'w') as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dst.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def zip_response(entries, filename):
+    response = StreamingHttpResponse(iter_zip(entries), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import timing
+from .authentication import user_cache
+from .models import EquipmentDataset
+from .reports import purge_report_cache
+from .storage import blob_hash
+
+
+@receiver(post_save, sender=EquipmentDataset)
+def purge_report_on_change(sender, instance, created, **kwargs):
+    # A new dataset has nothing cached yet
+    if not created:
+        purge_report_cache(instance.pk)
+
+
+@receiver(post_delete, sender=EquipmentDataset)
+def purge_report_on_delete(sender, instance, **kwargs):
+    purge_report_cache(instance.pk)
+
+    # Drop this dataset's reference to its blob once the delete is committed.
+    # Files saved before content-addressed storage are left alone.
+    if blob_hash(instance.file.name):
+        storage, name = instance.file.storage, instance.file.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(sender, instance, **kwargs):
+    # Covers deactivation and password changes
+    user_cache.pop(str(instance.pk))
+
+
+connection_created.connect(timing.install_query_timer, dispatch_uid='api_query_timer')
@@ -0,0 +1,144 @@
+"""
+Content-addressed storage for uploaded CSVs.
+
+Blobs are stored under blobs/ab/cd/<sha256>, so no directory ever holds
+more than a slice of the uploads and identical files are stored once. The
+name passed to save() is ignored; the returned name is the blob path.
+Each save() of the same content adds a reference, and delete() drops one;
+the blob is removed with its last reference.
+
+Names that are not blob paths (files saved before this backend) are read
+and deleted like a plain FileSystemStorage.
+"""
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import fcntl
+except ImportError:  # Windows: only lock within the process
+    fcntl = None
+
+BLOB_PREFIX = "blobs"
+BLOB_NAME_RE = re.compile(rf"^{BLOB_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})$")
+
+_refs_lock = threading.Lock()
+
+
+def blob_hash(name):
+    """The content hash encoded in a blob name, or None for other names."""
+    match = BLOB_NAME_RE.match(name or "")
+    return match.group(1) if match else None
+
+
+@deconstructible(path="api.storage.ContentAddressedStorage")
+class ContentAddressedStorage(FileSystemStorage):
+
+    def blob_name(self, content_hash):
+        return f"{BLOB_PREFIX}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+    def get_available_name(self, name, max_length=None):
+        # Collisions cannot happen: the final name comes from the content
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = os.path.join(self.location, BLOB_PREFIX, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        # Hash while writing to a temp file, then rename into place
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            name = self.blob_name(digest.hexdigest())
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._locked_refs(path) as refs:
+                if os.path.exists(path):
+                    os.unlink(tmp_path)
+                else:
+                    if self.file_permissions_mode is not None:
+                        os.chmod(tmp_path, self.file_permissions_mode)
+                    os.replace(tmp_path, path)
+                refs.write(refs.read() + 1)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+    def delete(self, name):
+        if blob_hash(name) is None:
+            return super().delete(name)
+
+        path = self.path(name)
+        with self._locked_refs(path) as refs:
+            count = refs.read() - 1
+            if count > 0:
+                refs.write(count)
+                return
+            for leftover in (path, path + ".refs"):
+                try:
+                    os.remove(leftover)
+                except FileNotFoundError:
+                    pass
+
+    def references(self, name):
+        """Current reference count of a blob (0 if it does not exist)."""
+        with self._locked_refs(self.path(name)) as refs:
+            return refs.read()
+
+    @contextmanager
+    def _locked_refs(self, path):
+        """Exclusive access to a blob's reference count file."""
+        with _refs_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".refs", "a+") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield _RefCount(f)
+
+    @contextmanager
+    def open_mmap(self, name):
+        """
+        Map a stored file read-only, so hashing and parsing work on the page
+        cache directly instead of copying through Python buffers.
+        """
+        with open(self.path(name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+
+class _RefCount:
+    def __init__(self, f):
+        self._f = f
+
+    def read(self):
+        self._f.seek(0)
+        value = self._f.read().strip()
+        return int(value) if value else 0
+
+    def write(self, value):
+        self._f.seek(0)
+        self._f.truncate()
+        self._f.write(str(value))
+        self._f.flush()
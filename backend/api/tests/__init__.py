@@ -0,0 +1,34 @@
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import TransactionTestCase, override_settings
+
+# One JSON line per request (api.requests) would drown the test output
+logging.getLogger('api.requests').setLevel(logging.WARNING)
+
+SAMPLE_CSV = (Path(__file__).resolve().parents[2] / 'uploads' / 'sample_equipment_data.csv').read_bytes()
+
+
+class IsolatedStorageTestCase(TransactionTestCase):
+    """
+    Points uploads, the report cache and the SQLite writer lock at a per-test
+    temporary directory (`self.tmp`), so tests never read or write the
+    project's own data. Metrics snapshots and report pre-generation are
+    off; tests that need them turn them back on.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=str(self.tmp / 'media'),
+            REPORT_CACHE_DIR=self.tmp / 'report_cache',
+            SQLITE_WRITER_LOCK_FILE=self.tmp / 'writer.lock',
+            METRICS_DIR=None,
+            REPORT_PREGENERATE=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
@@ -0,0 +1,96 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import admission
+from api.admission import AdmissionGate, AdmissionRejected
+
+from . import SAMPLE_CSV, IsolatedStorageTestCase
+
+GATES = {
+    'analysis': {'max_concurrent': 1, 'max_waiting': 0, 'wait_timeout': 0.1, 'retry_after': 7},
+    'reports': {'max_concurrent': 1, 'max_waiting': 0, 'wait_timeout': 0.1, 'retry_after': 9},
+}
+
+
+class AdmissionGateTests(TestCase):
+
+    def test_waiter_gets_released_slot(self):
+        gate = AdmissionGate('test', max_concurrent=1, max_waiting=1, wait_timeout=5, retry_after=1)
+        gate.acquire()
+        admitted = threading.Event()
+
+        def wait():
+            with gate.admit():
+                admitted.set()
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        self.assertFalse(admitted.wait(0.1))
+        gate.release()
+        waiter.join(5)
+        self.assertTrue(admitted.is_set())
+        self.assertEqual((gate.running, gate.waiting), (0, 0))
+
+    def test_full_queue_and_timeout_are_rejected(self):
+        gate = AdmissionGate('test', max_concurrent=1, max_waiting=0, wait_timeout=5, retry_after=3)
+        gate.acquire()
+        with self.assertRaises(AdmissionRejected) as caught:
+            gate.acquire()
+        self.assertEqual(caught.exception.wait, 3)
+
+        gate.max_waiting = 1
+        gate.wait_timeout = 0.05
+        with self.assertRaises(AdmissionRejected):
+            gate.acquire()
+        self.assertEqual((gate.running, gate.waiting), (1, 0))
+
+
+@override_settings(API_ADMISSION=GATES, UPLOAD_INLINE_MAX_BYTES=None)
+class AdmissionViewTests(IsolatedStorageTestCase):
+    """A full gate answers 429 with Retry-After; ungated endpoints keep working."""
+
+    def setUp(self):
+        super().setUp()
+        # Gates are built from settings on first use
+        saved_gates = dict(admission._gates)
+        admission._gates.clear()
+        self.addCleanup(admission._gates.update, saved_gates)
+        self.addCleanup(admission._gates.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('operator', password='secret'))
+
+    def _upload(self):
+        f = SimpleUploadedFile('equipment.csv', SAMPLE_CSV, content_type='text/csv')
+        return self.client.post('/upload/', {'file': f}, format='multipart')
+
+    def test_busy_upload_gets_retry_after(self):
+        gate = admission.get_gate('analysis')
+        gate.acquire()
+        try:
+            response = self._upload()
+            history = self.client.get('/history/')
+        finally:
+            gate.release()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(history.status_code, 200)
+        # Turned away before the upload was stored
+        self.assertEqual(list((self.tmp / 'media').glob('blobs/??/??/*')), [])
+
+        self.assertEqual(self._upload().status_code, 201)
+
+    def test_busy_report_gets_retry_after(self):
+        dataset_id = self._upload().json()['id']
+        gate = admission.get_gate('reports')
+        gate.acquire()
+        try:
+            response = self.client.get(f'/datasets/{dataset_id}/report.pdf')
+        finally:
+            gate.release()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '9')
+        self.assertEqual(self.client.get(f'/datasets/{dataset_id}/report.pdf').status_code, 200)
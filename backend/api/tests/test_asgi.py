@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import SAMPLE_CSV, IsolatedStorageTestCase
+
+
+class AsyncViewTests(IsolatedStorageTestCase):
+    """The /async/ views, driven through Django's ASGI test client."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('operator', password='secret')
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def _upload(self, content=SAMPLE_CSV, client=None):
+        f = SimpleUploadedFile('equipment.csv', content, content_type='text/csv')
+        return await (client or self.async_client).post('/async/upload/', {'file': f},
+                                                        headers=self.auth)
+
+    async def test_upload_history_and_report(self):
+        response = await self._upload()
+        self.assertEqual(response.status_code, 201)
+        dataset_id = response.json()['id']
+
+        history = await self.async_client.get('/async/history/', headers=self.auth)
+        self.assertEqual(history.status_code, 200)
+        self.assertEqual([d['id'] for d in history.json()], [dataset_id])
+
+        report = await self.async_client.get(f'/async/datasets/{dataset_id}/report.pdf',
+                                              headers=self.auth)
+        self.assertEqual(report.status_code, 200)
+        body = b''.join([chunk async for chunk in report.streaming_content])
+        self.assertTrue(body.startswith(b'%PDF'))
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/async/history/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(DEBUG=True)
+    def test_async_chain_is_not_adapted(self):
+        # Django logs each adaptation at DEBUG on 'django.request'
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    @override_settings(DEBUG=True)
+    async def test_async_view_is_not_adapted(self):
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            response = await self.async_client.get(
+                '/async/history/', headers={**self.auth, 'X-Request-ID': 'asgi-test'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Request-ID'], 'asgi-test')
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_sync_view_still_timed(self):
+        response = self.client.get('/history/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    async def test_failed_analysis_releases_blob(self):
+        client = AsyncClient(raise_request_exception=False)
+        response = await self._upload(b'not,an,equipment,file\n1,2,3,4\n', client)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(list((self.tmp / 'media' / 'blobs').glob('??/??/*')), [])
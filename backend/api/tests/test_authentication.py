@@ -0,0 +1,109 @@
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from rest_framework_simplejwt import settings as jwt_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CachedJWTAuthentication, TTLCache, user_cache
+
+
+class TTLCacheTests(TestCase):
+
+    def test_hits_and_misses(self):
+        cache = TTLCache(max_size=4, ttl=60)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        cache = TTLCache(max_size=4, ttl=60)
+        with mock.patch('api.authentication.time.monotonic', return_value=1000.0):
+            cache.set('a', 1)
+        with mock.patch('api.authentication.time.monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('api.authentication.time.monotonic', return_value=1061.0):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.misses, 1)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user('operator', password='secret')
+
+    def _authenticate(self, token):
+        request = RequestFactory().get('/history/', headers={'Authorization': f'Bearer {token}'})
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def _check_revoke_token(self):
+        # simplejwt modules each hold their own reference to api_settings
+        patched = jwt_settings.APISettings(
+            {'CHECK_REVOKE_TOKEN': True}, jwt_settings.DEFAULTS, jwt_settings.IMPORT_STRINGS)
+        stack = ExitStack()
+        for target in ('rest_framework_simplejwt.tokens.api_settings',
+                       'rest_framework_simplejwt.authentication.api_settings',
+                       'api.authentication.api_settings'):
+            stack.enter_context(mock.patch(target, patched))
+        return stack
+
+    def test_second_request_is_served_from_cache(self):
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            first = self._authenticate(token)
+        with self.assertNumQueries(0):
+            second = self._authenticate(token)
+        self.assertEqual(second.pk, self.user.pk)
+        # A copy per request, not the cached instance
+        self.assertIsNot(first, second)
+
+    def test_expired_entry_is_reloaded(self):
+        token = AccessToken.for_user(self.user)
+        self._authenticate(token)
+        later = user_cache.ttl + 1
+        now = time.monotonic()
+        with mock.patch('api.authentication.time.monotonic', return_value=now + later), \
+                self.assertNumQueries(1):
+            self._authenticate(token)
+
+    def test_save_invalidates_entry(self):
+        token = AccessToken.for_user(self.user)
+        self._authenticate(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(token)
+
+    def test_delete_invalidates_entry(self):
+        token = AccessToken.for_user(self.user)
+        self._authenticate(token)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(token)
+
+    def test_revoked_token_rejected_on_cache_hit(self):
+        with self._check_revoke_token():
+            old_token = AccessToken.for_user(self.user)
+            self.user.set_password('changed')
+            self.user.save()
+            new_token = AccessToken.for_user(self.user)
+            # Caches the user with the new password
+            self.assertEqual(self._authenticate(new_token).pk, self.user.pk)
+            with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+                self._authenticate(old_token)
@@ -0,0 +1,69 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from rest_framework.test import APIClient
+
+from api.models import EquipmentDataset
+
+from . import SAMPLE_CSV, IsolatedStorageTestCase
+
+
+class ConcurrentUploadHistoryTests(IsolatedStorageTestCase):
+    """Uploads and history reads running at the same time on SQLite."""
+
+    UPLOADERS = 4
+    UPLOADS_EACH = 5
+    READERS = 4
+    READS_EACH = 20
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('operator', password='secret')
+
+    def _client(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client
+
+    def _run(self, target, results):
+        def run():
+            try:
+                target(self._client(), results)
+            except Exception as exc:
+                results.append(exc)
+            finally:
+                connections.close_all()
+        return threading.Thread(target=run)
+
+    def test_wal_enabled(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_uploads_and_history_reads_do_not_lock(self):
+        results = []
+
+        def upload(client, results):
+            for i in range(self.UPLOADS_EACH):
+                f = SimpleUploadedFile(f'equipment_{i}.csv', SAMPLE_CSV, content_type='text/csv')
+                results.append(client.post('/upload/', {'file': f}, format='multipart').status_code)
+
+        def read_history(client, results):
+            for _ in range(self.READS_EACH):
+                results.append(client.get('/history/').status_code)
+
+        threads = [self._run(upload, results) for _ in range(self.UPLOADERS)]
+        threads += [self._run(read_history, results) for _ in range(self.READERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        errors = [r for r in results if isinstance(r, Exception)]
+        self.assertEqual(errors, [])
+        self.assertEqual(results.count(201), self.UPLOADERS * self.UPLOADS_EACH)
+        self.assertEqual(results.count(200), self.READERS * self.READS_EACH)
+        # Retention still holds after concurrent inserts
+        self.assertEqual(EquipmentDataset.objects.count(), 5)
@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api import db, ingest
+from api.executors import get_executor
+from api.models import EquipmentDataset
+
+from . import SAMPLE_CSV, IsolatedStorageTestCase
+
+
+class IngestTests(IsolatedStorageTestCase):
+    """Upload ingest: blob references, owner scoping and quota."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('operator', password='secret')
+        self.client = self._client(self.user)
+
+    def _client(self, user):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        return client
+
+    def _upload(self, content=SAMPLE_CSV, client=None, name='equipment.csv'):
+        f = SimpleUploadedFile(name, content, content_type='text/csv')
+        return (client or self.client).post('/upload/', {'file': f}, format='multipart')
+
+    def _blob_files(self):
+        blobs = self.tmp / 'media' / 'blobs'
+        return sorted(str(p.relative_to(blobs)) for p in blobs.glob('??/??/*'))
+
+    def test_failed_analysis_releases_blob(self):
+        response = self._upload(b'not,an,equipment,file\n1,2,3,4\n')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(EquipmentDataset.objects.count(), 0)
+        self.assertEqual(self._blob_files(), [])
+
+    @override_settings(UPLOAD_INLINE_MAX_BYTES=0)
+    def test_rejected_deferred_upload_releases_blob(self):
+        # The pool fills up between the capacity check and the submit
+        with mock.patch.object(get_executor('analysis'), 'submit', return_value=None), \
+                mock.patch('api.db.serialized_writer', wraps=db.serialized_writer) as writer:
+            response = self._upload()
+        self.assertEqual(response.status_code, 429)
+        # Storing and dropping the pending dataset are both serialized writes
+        self.assertEqual(writer.call_count, 2)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(EquipmentDataset.objects.count(), 0)
+        self.assertEqual(self._blob_files(), [])
+
+    @override_settings(UPLOAD_INLINE_MAX_BYTES=0)
+    def test_failed_background_analysis_is_a_serialized_write(self):
+        with mock.patch.object(get_executor('analysis'), 'submit') as submit:
+            response = self._upload(b'not,an,equipment,file\n1,2,3,4\n')
+        self.assertEqual(response.status_code, 202)
+        job, dataset_id = submit.call_args.args
+        self.assertIs(job, ingest.analyze_dataset)
+
+        with mock.patch('api.db.serialized_writer', wraps=db.serialized_writer) as writer, \
+                self.assertLogs('api.ingest', 'ERROR'):
+            job(dataset_id)
+        writer.assert_called_once()
+        self.assertEqual(EquipmentDataset.objects.get(pk=dataset_id).status,
+                         EquipmentDataset.STATUS_FAILED)
+
+    def test_other_users_datasets_are_not_found(self):
+        dataset_id = self._upload().json()['id']
+        other = self._client(User.objects.create_user('visitor', password='secret'))
+
+        self.assertEqual(other.get('/history/').json(), [])
+        self.assertEqual(other.get(f'/datasets/{dataset_id}/report.pdf').status_code, 404)
+        response = other.get('/reports/bulk', {'ids': str(dataset_id)})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['ids'], [dataset_id])
+        self.assertEqual(self.client.get(f'/datasets/{dataset_id}/report.pdf').status_code, 200)
+
+    def test_quota_counts_only_datasets_kept_by_retention(self):
+        size = len(SAMPLE_CSV)
+        with override_settings(USER_STORAGE_QUOTA_BYTES=2 * size + 1, DATASET_RETENTION_PER_USER=3):
+            self.assertEqual(self._upload().status_code, 201)
+            self.assertEqual(self._upload(SAMPLE_CSV + b'\n').status_code, 201)
+            response = self._upload(SAMPLE_CSV + b'\n\n')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(EquipmentDataset.objects.count(), 2)
+        # Rejected before it was stored: two blobs, each with its .refs file
+        self.assertEqual(len(self._blob_files()), 4)
+
+        # With two kept, the oldest is dropped by this upload and not counted
+        with override_settings(USER_STORAGE_QUOTA_BYTES=2 * size + 3, DATASET_RETENTION_PER_USER=2):
+            self.assertEqual(self._upload(SAMPLE_CSV + b'\n\n').status_code, 201)
+        self.assertEqual(EquipmentDataset.objects.count(), 2)
+
+    def test_identical_uploads_share_one_blob(self):
+        first = EquipmentDataset.objects.get(pk=self._upload().json()['id'])
+        second = EquipmentDataset.objects.get(pk=self._upload(name='copy.csv').json()['id'])
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.content_hash, second.content_hash)
+        self.assertEqual(default_storage.references(first.file.name), 2)
+        self.assertEqual(len(self._blob_files()), 2)  # The blob and its .refs file
+
+        first.delete()
+        self.assertEqual(default_storage.references(second.file.name), 1)
+        self.assertTrue(default_storage.exists(second.file.name))
+
+        second.delete()
+        self.assertEqual(self._blob_files(), [])
+
+    @override_settings(DATASET_RETENTION_PER_USER=1)
+    def test_retention_releases_dropped_blob(self):
+        self._upload()
+        self._upload(SAMPLE_CSV + b'\n')
+        blob = EquipmentDataset.objects.get().file.name.removeprefix('blobs/')
+        self.assertEqual(self._blob_files(), [blob, f'{blob}.refs'])
@@ -0,0 +1,123 @@
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.reports import purge_report_cache
+from api.utils import analyze_csv
+from benchmarks.generate import generate
+
+from . import IsolatedStorageTestCase
+
+
+def peak_memory(fn):
+    """
+    Peak traced allocation (Python objects and numpy buffers) of one call
+    to `fn`, after a warm-up call so lazy imports and caches do not count.
+    """
+    fn()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@override_settings(UPLOAD_INLINE_MAX_BYTES=None, USER_STORAGE_QUOTA_BYTES=None)
+class MemoryBudgetTests(IsolatedStorageTestCase):
+    """
+    Peak memory of the ingest and report paths on generated CSVs.
+
+    Budgets are in bytes of peak allocation per byte of CSV, with headroom
+    over what the code uses today. Each path is also measured at SIZES[0]
+    and SIZES[1] rows; peak memory must not grow faster than the input
+    (times SUPERLINEAR_TOLERANCE), so an accidental quadratic copy fails
+    even when it still fits the budget at these sizes.
+    """
+
+    SIZES = (4_000, 16_000)
+    # Wide files (many unused columns) are what ran workers out of memory
+    WIDE_EXTRA_COLUMNS = 30
+    SUPERLINEAR_TOLERANCE = 1.25
+
+    ANALYZE_BYTES_PER_INPUT_BYTE = 7
+    # Includes the test client's in-memory copy of the multipart body
+    UPLOAD_BYTES_PER_INPUT_BYTE = 11
+    SUMMARY_REPORT_BUDGET = 1 * 1024 * 1024
+    FULL_REPORT_BUDGET = 4 * 1024 * 1024
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('operator'))
+
+    def _csv(self, rows, extra_columns=0):
+        path = self.tmp / f'equipment_{rows}_{extra_columns}.csv'
+        if not path.exists():
+            generate(path, rows, bad_rows=0.01, extra_columns=extra_columns)
+        return path
+
+    def _upload(self, path):
+        with open(path, 'rb') as f:
+            response = self.client.post('/upload/', {'file': f}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data['id']
+
+    def _report(self, dataset_id, mode):
+        purge_report_cache(dataset_id)
+        response = self.client.get(f'/datasets/{dataset_id}/report.pdf?mode={mode}')
+        self.assertEqual(response.status_code, 200)
+        # Drain the stream without keeping the PDF around
+        for _ in response.streaming_content:
+            pass
+
+    def assertLinear(self, peaks, label):
+        small, large = peaks
+        allowed = small * self.SIZES[1] / self.SIZES[0] * self.SUPERLINEAR_TOLERANCE
+        self.assertLessEqual(
+            large, allowed,
+            f"{label}: peak grew from {small} to {large} bytes for "
+            f"{self.SIZES[1] // self.SIZES[0]}x the rows")
+
+    def _check_analyze_csv(self, extra_columns):
+        peaks = []
+        for rows in self.SIZES:
+            path = self._csv(rows, extra_columns)
+            with open(path, 'rb') as f:
+                name = default_storage.save('uploads/equipment.csv', File(f))
+            peak = peak_memory(lambda: analyze_csv(name))
+            budget = self.ANALYZE_BYTES_PER_INPUT_BYTE * path.stat().st_size
+            self.assertLessEqual(peak, budget, f"analyze_csv, {rows} rows x {extra_columns} extra columns")
+            peaks.append(peak)
+        self.assertLinear(peaks, f"analyze_csv x {extra_columns} extra columns")
+
+    def test_analyze_csv(self):
+        self._check_analyze_csv(0)
+
+    def test_analyze_csv_wide(self):
+        self._check_analyze_csv(self.WIDE_EXTRA_COLUMNS)
+
+    def test_upload_view(self):
+        peaks = []
+        for rows in self.SIZES:
+            path = self._csv(rows)
+            peak = peak_memory(lambda: self._upload(path))
+            budget = self.UPLOAD_BYTES_PER_INPUT_BYTE * path.stat().st_size
+            self.assertLessEqual(peak, budget, f"upload, {rows} rows")
+            peaks.append(peak)
+        self.assertLinear(peaks, "upload")
+
+    def test_dataset_report_pdf(self):
+        for mode, budget in (('summary', self.SUMMARY_REPORT_BUDGET), ('full', self.FULL_REPORT_BUDGET)):
+            peaks = []
+            for rows in self.SIZES:
+                dataset_id = self._upload(self._csv(rows))
+                peak = peak_memory(lambda: self._report(dataset_id, mode))
+                # The CSV is read in REPORT_BATCH_ROWS batches, so the budget is fixed
+                self.assertLessEqual(peak, budget, f"{mode} report, {rows} rows")
+                peaks.append(peak)
+            self.assertLinear(peaks, f"{mode} report")
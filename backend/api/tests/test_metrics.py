@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from api import metrics
+
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class MetricsFileTests(SimpleTestCase):
+    """Per-worker snapshot files in METRICS_DIR."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.settings_override = override_settings(METRICS_DIR=self.tmp)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write(self, name, pid, requests):
+        snapshot = {
+            'pid': pid, 'instance': name, 'buckets': list(metrics.DEFAULT_BUCKETS),
+            'counters': [['api_requests_total', {'view': 'history', 'status': '200'}, requests]],
+            'histograms': [],
+            'gauges': [['api_executor_pending', {'pool': 'gone'}, 3]],
+        }
+        (self.tmp / f'{name}.json').write_text(json.dumps(snapshot))
+
+    def _requests(self, text):
+        for line in text.splitlines():
+            if line.startswith('api_requests_total{status="200",view="history"}'):
+                return int(line.split()[-1])
+        return 0
+
+    def test_exited_workers_are_folded_into_retired(self):
+        own = self._requests(metrics.render([metrics.registry.snapshot()]))
+        self._write('dead-a', _exited_pid(), 5)
+        self._write('dead-b', _exited_pid(), 7)
+
+        text = metrics.render(metrics.collect_snapshots())
+        self.assertEqual(self._requests(text), own + 12)
+        self.assertNotIn('pool="gone"', text)
+        self.assertEqual(sorted(p.name for p in self.tmp.glob('*.json')),
+                         sorted([metrics.RETIRED_NAME, f'{metrics.registry.instance}.json']))
+
+        # Folded once: a second scrape adds nothing
+        self.assertEqual(self._requests(metrics.render(metrics.collect_snapshots())), own + 12)
+
+    def test_reused_pid_does_not_overwrite_predecessor(self):
+        own = self._requests(metrics.render([metrics.registry.snapshot()]))
+        # An earlier worker that had this process's pid
+        self._write('predecessor', os.getpid(), 4)
+
+        metrics.registry.flush(force=True)
+        self.assertFalse((self.tmp / 'predecessor.json').exists())
+        text = metrics.render(metrics.collect_snapshots())
+        self.assertEqual(self._requests(text), own + 4)
+        self.assertNotIn('pool="gone"', text)
+
+
+class MetricsViewTests(SimpleTestCase):
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False, METRICS_DIR=None)
+    def test_no_token_hides_endpoint(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=True, METRICS_DIR=None)
+    def test_no_token_served_in_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape', DEBUG=False, METRICS_DIR=None)
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape'})
+        self.assertEqual(response.status_code, 200)
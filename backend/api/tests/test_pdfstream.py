@@ -0,0 +1,63 @@
+import io
+import re
+
+from django.test import SimpleTestCase
+from pypdf import PdfReader
+
+from api.pdfstream import A4, Graphics, StreamingPDFWriter
+
+
+def _write(pages, form=None):
+    """PDF bytes with one page per list of strings in `pages`."""
+    out = io.BytesIO()
+    writer = StreamingPDFWriter(out, A4)
+    if form is not None:
+        writer.add_form("Chart1", form, 100, 100)
+    for lines in pages:
+        g = Graphics()
+        for i, line in enumerate(lines):
+            g.text(50, 800 - 20 * i, line)
+        g.text_row(50, 100, [(0, lines[0]), (200, "end")])
+        if form is not None:
+            g.form("Chart1", 50, 400)
+        writer.add_page(g)
+    writer.close()
+    return out.getvalue()
+
+
+class StreamingPDFWriterTests(SimpleTestCase):
+
+    def test_multi_page_output(self):
+        chart = Graphics()
+        chart.fill_color('#667eea')
+        chart.rect(0, 0, 50, 80)
+        data = _write([[f"Page {n}"] for n in range(1, 26)], form=chart)
+
+        pdf = PdfReader(io.BytesIO(data), strict=True)
+        self.assertEqual(len(pdf.pages), 25)
+        for n, page in enumerate(pdf.pages, 1):
+            self.assertIn(f"Page {n}", page.extract_text())
+            self.assertIn("/Chart1", page["/Resources"]["/XObject"])
+
+    def test_xref_offsets_point_at_their_objects(self):
+        data = _write([["one"], ["two"], ["three"]])
+        PdfReader(io.BytesIO(data), strict=True).pages[2].extract_text()
+
+        xref_pos = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", data).group(1))
+        self.assertTrue(data[xref_pos:].startswith(b"xref\n0 "))
+        entries = re.findall(rb"(\d{10}) 00000 n \n", data[xref_pos:])
+        self.assertGreater(len(entries), 5)
+        for obj_id, offset in enumerate(entries, 1):
+            self.assertTrue(data[int(offset):].startswith(b"%d 0 obj\n" % obj_id), obj_id)
+
+    def test_non_latin1_text(self):
+        names = ["Pumpe-Ö €5", "Šťastný", "泵-1", "Насос", "a(b)\\c", "two\nlines"]
+        data = _write([names])
+
+        text = PdfReader(io.BytesIO(data), strict=True).pages[0].extract_text()
+        self.assertIn("Pumpe-Ö €5", text)   # WinAnsi covers these
+        self.assertIn("Štastný", text)      # 'ť' falls back to 't'
+        self.assertIn("?-1", text)          # no glyph in the standard fonts
+        self.assertIn("?????", text)
+        self.assertIn("a(b)\\c", text)
+        self.assertIn("two\nlines", text)
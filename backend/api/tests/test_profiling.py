@@ -0,0 +1,47 @@
+import cProfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import IsolatedStorageTestCase
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0, PROFILING_TOKEN='s3cret')
+class ProfilingTriggerTests(IsolatedStorageTestCase):
+    """X-Profile only starts the profiler with a valid PROFILING_TOKEN."""
+
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(PROFILING_DIR=self.tmp / 'profiles')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user('admin', password='secret', is_staff=True)
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.staff)}'}
+
+    def _get(self, **headers):
+        with mock.patch('api.middleware.cProfile.Profile', wraps=cProfile.Profile) as profile:
+            response = self.client.get('/history/', headers={**self.auth, **headers})
+        self.assertEqual(response.status_code, 200)
+        return response, profile
+
+    def test_flag_without_token_is_ignored(self):
+        response, profile = self._get(**{'X-Profile': '1'})
+        profile.assert_not_called()
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_flag_with_wrong_token_is_ignored(self):
+        response, profile = self._get(**{'X-Profile': '1', 'X-Profile-Token': 'guess'})
+        profile.assert_not_called()
+        self.assertNotIn('X-Profile-Id', response)
+
+    @override_settings(PROFILING_TOKEN=None)
+    def test_flag_ignored_while_token_unset(self):
+        _, profile = self._get(**{'X-Profile': '1', 'X-Profile-Token': ''})
+        profile.assert_not_called()
+
+    def test_flag_with_token_profiles(self):
+        response, profile = self._get(**{'X-Profile': '1', 'X-Profile-Token': 's3cret'})
+        profile.assert_called_once()
+        self.assertTrue((self.tmp / 'profiles' / f"{response['X-Profile-Id']}.prof").exists())
@@ -0,0 +1,237 @@
+import io
+import threading
+from concurrent.futures import Future
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from pypdf import PdfReader
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import db, reports
+from api.admission import AdmissionRejected
+from api.executors import get_executor
+from api.models import EquipmentDataset
+
+from . import SAMPLE_CSV, IsolatedStorageTestCase
+
+
+def _reject(name):
+    raise AdmissionRejected(name, 7)
+
+
+class ReportTests(IsolatedStorageTestCase):
+    """Report downloads: cache, admission gate, sync and async views."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('operator', password='secret')
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(self.user)
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _dataset(self):
+        f = SimpleUploadedFile('equipment.csv', SAMPLE_CSV, content_type='text/csv')
+        response = self.client.post('/upload/', {'file': f}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return EquipmentDataset.objects.get(pk=response.json()['id'])
+
+    async def _adataset(self):
+        return await sync_to_async(self._dataset)()
+
+    def _cached_reports(self):
+        return sorted(p.name for p in (self.tmp / 'report_cache').glob('*/*.pdf'))
+
+    def test_report_is_rendered_once(self):
+        url = f'/datasets/{self._dataset().pk}/report.pdf'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(self._cached_reports()), 1)
+
+        with mock.patch('api.reports.render_report') as render:
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, 200)
+        render.assert_not_called()
+        self.assertEqual(b''.join(second.streaming_content), b''.join(first.streaming_content))
+
+    def test_report_etag_and_ranges(self):
+        url = f'/datasets/{self._dataset().pk}/report.pdf'
+        full = self.client.get(url)
+        self.assertEqual(full.status_code, 200)
+        body = b''.join(full.streaming_content)
+        etag = full['ETag']
+        self.assertEqual(full['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(full['Content-Length']), len(body))
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        part = self.client.get(url, headers={'Range': 'bytes=10-109', 'If-Range': etag})
+        self.assertEqual(part.status_code, 206)
+        self.assertEqual(part['Content-Range'], f'bytes 10-109/{len(body)}')
+        self.assertEqual(b''.join(part.streaming_content), body[10:110])
+
+        tail = self.client.get(url, headers={'Range': 'bytes=-20'})
+        self.assertEqual(b''.join(tail.streaming_content), body[-20:])
+
+        # The cached copy changed since the client's partial download
+        stale = self.client.get(url, headers={'Range': 'bytes=10-', 'If-Range': '"old"'})
+        self.assertEqual(stale.status_code, 200)
+
+        unsatisfiable = self.client.get(url, headers={'Range': f'bytes={len(body)}-'})
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], f'bytes */{len(body)}')
+
+    def test_deleting_a_dataset_purges_its_reports(self):
+        dataset = self._dataset()
+        self.assertEqual(self.client.get(f'/datasets/{dataset.pk}/report.pdf').status_code, 200)
+        dataset.delete()
+        self.assertEqual(self._cached_reports(), [])
+
+    def test_history_etag(self):
+        self._dataset()
+        first = self.client.get('/history/')
+        self.assertIn('ETag', first)
+        again = self.client.get('/history/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+        self._dataset()
+        changed = self.client.get('/history/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(changed.status_code, 200)
+
+    def test_missing_content_hash_is_saved_as_a_serialized_write(self):
+        dataset = self._dataset()
+        EquipmentDataset.objects.filter(pk=dataset.pk).update(content_hash='')
+        dataset.refresh_from_db()
+        with mock.patch('api.db.serialized_writer', wraps=db.serialized_writer) as writer:
+            content_hash = reports.dataset_content_hash(dataset)
+        writer.assert_called_once()
+        self.assertTrue(content_hash)
+        self.assertEqual(EquipmentDataset.objects.get(pk=dataset.pk).content_hash, content_hash)
+
+    @override_settings(REPORT_PREGENERATE=True)
+    def test_upload_pregenerates_report(self):
+        executor = get_executor('reports')
+        with mock.patch.object(executor, 'submit', wraps=executor.submit) as submit:
+            dataset = self._dataset()
+        submit.assert_called_once_with(reports.pregenerate_report, dataset.pk)
+        path = reports.report_cache_path(dataset)
+        with reports._pending_lock:
+            future = reports._pending.get(path)
+        if future is not None:
+            future.result(timeout=30)
+        self.assertTrue(path.exists())
+
+        with mock.patch('api.reports.render_report') as render:
+            response = self.client.get(f'/datasets/{dataset.pk}/report.pdf')
+        self.assertEqual(response.status_code, 200)
+        render.assert_not_called()
+
+    @override_settings(REPORT_PREGENERATE=True)
+    def test_pregeneration_skipped_when_pool_full(self):
+        with mock.patch.object(get_executor('reports'), 'submit', return_value=None):
+            dataset = self._dataset()
+        self.assertEqual(self._cached_reports(), [])
+        # Rendered on demand instead
+        self.assertEqual(self.client.get(f'/datasets/{dataset.pk}/report.pdf').status_code, 200)
+        self.assertEqual(len(self._cached_reports()), 1)
+
+    @override_settings(REPORT_BATCH_ROWS=100)
+    def test_full_report_is_a_valid_pdf_with_every_row(self):
+        types = ['Pump', 'Valve', 'Compressor']
+        lines = ['Equipment Name,Type,Flowrate,Pressure,Temperature']
+        lines += [f'Unit-{i:04d},{types[i % 3]},{100 + i % 50},{5 + i % 7}.5,{90 + i % 30}'
+                  for i in range(600)]
+        f = SimpleUploadedFile('large.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        dataset_id = self.client.post('/upload/', {'file': f}, format='multipart').json()['id']
+
+        response = self.client.get(f'/datasets/{dataset_id}/report.pdf', {'mode': 'full'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="dataset_{dataset_id}_full_report.pdf"')
+
+        pdf = PdfReader(io.BytesIO(b''.join(response.streaming_content)), strict=True)
+        self.assertGreater(len(pdf.pages), 5)
+        text = '\n'.join(page.extract_text() for page in pdf.pages)
+        for i in range(600):
+            self.assertIn(f'Unit-{i:04d}', text)
+        for name in types:
+            self.assertIn(name, text)
+
+    async def test_async_render_takes_reports_gate(self):
+        dataset = await self._adataset()
+        with mock.patch('api.reports.admit', _reject):
+            response = await self.async_client.get(f'/async/datasets/{dataset.pk}/report.pdf',
+                                                   headers=self.auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(self._cached_reports(), [])
+
+    async def test_async_cache_hit_skips_reports_gate(self):
+        dataset = await self._adataset()
+        url = f'/async/datasets/{dataset.pk}/report.pdf'
+        first = await self.async_client.get(url, headers=self.auth)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(self._cached_reports()), 1)
+
+        with mock.patch('api.reports.admit', _reject):
+            second = await self.async_client.get(url, headers=self.auth)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    async def test_async_waits_for_pending_pregeneration(self):
+        dataset = await self._adataset()
+        path = await sync_to_async(reports.report_cache_path)(dataset)
+        future = Future()
+
+        def pregenerate():
+            path.parent.mkdir(parents=True)
+            path.write_bytes(b'%PDF-1.4 pregenerated')
+            future.set_result(path)
+
+        with reports._pending_lock:
+            reports._pending[path] = future
+        try:
+            with mock.patch('api.reports.build_report_file') as render:
+                threading.Timer(0.2, pregenerate).start()
+                response = await self.async_client.get(f'/async/datasets/{dataset.pk}/report.pdf',
+                                                       headers=self.auth)
+        finally:
+            with reports._pending_lock:
+                reports._pending.pop(path, None)
+        self.assertEqual(response.status_code, 200)
+        render.assert_not_called()
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]),
+                         b'%PDF-1.4 pregenerated')
+
+    async def test_pending_dataset_answers_409_in_both_views(self):
+        dataset = await self._adataset()
+        await EquipmentDataset.objects.filter(pk=dataset.pk).aupdate(
+            status=EquipmentDataset.STATUS_PENDING)
+        sync = await sync_to_async(self.client.get)(f'/datasets/{dataset.pk}/report.pdf')
+        response = await self.async_client.get(f'/async/datasets/{dataset.pk}/report.pdf',
+                                               headers=self.auth)
+        for answer in (sync, response):
+            self.assertEqual(answer.status_code, 409)
+            self.assertEqual(answer['Retry-After'], '5')
+        self.assertEqual(response.json(), sync.json())
+
+    def test_combined_report_reuses_cached_reports(self):
+        datasets = [self._dataset(), self._dataset()]
+        for dataset in datasets:
+            self.assertEqual(self.client.get(f'/datasets/{dataset.pk}/report.pdf').status_code, 200)
+
+        # Everything is cached: no render and no 'reports' gate
+        with mock.patch('api.reports.admit', _reject), \
+                mock.patch('api.reports.render_report_file') as render:
+            response = self.client.get(
+                '/reports/bulk', {'ids': ','.join(str(d.pk) for d in datasets), 'combined': '1'})
+        self.assertEqual(response.status_code, 200)
+        render.assert_not_called()
+
+        pdf = PdfReader(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(pdf.pages), 3)
+        self.assertIn('Combined Report', pdf.pages[0].extract_text())
+        self.assertIn(f'ID {datasets[1].pk}', pdf.pages[2].extract_text())
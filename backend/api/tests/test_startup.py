@@ -0,0 +1,27 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Loads the app the way a worker does, including the URLconf (and so every
+# view module), then reports which heavy libraries got imported
+BOOT = """
+import os, sys
+os.environ['DJANGO_SETTINGS_MODULE'] = 'backend.settings'
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(' '.join(m for m in ('pandas', 'numpy', 'reportlab') if m in sys.modules))
+"""
+
+
+class WorkerBootTests(SimpleTestCase):
+
+    def test_boot_does_not_import_heavy_libraries(self):
+        result = subprocess.run([sys.executable, '-c', BOOT], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '')
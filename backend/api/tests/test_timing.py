@@ -0,0 +1,59 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import timing
+
+from . import IsolatedStorageTestCase
+
+
+class ServerTimingHeaderTests(SimpleTestCase):
+
+    def test_header_format(self):
+        header = timing.server_timing_header({'db': [0.0125, 3], 'auth': [0.002, 1]}, 0.05)
+        self.assertEqual(header, 'db;dur=12.5;desc="3x", auth;dur=2.0, total;dur=50.0')
+
+    def test_phases_outside_a_request_are_dropped(self):
+        with timing.phase('parse'):
+            pass
+        token = timing.start()
+        with timing.phase('parse'):
+            pass
+        with timing.phase('parse'):
+            pass
+        phases = timing.stop(token)
+        self.assertEqual(list(phases), ['parse'])
+        self.assertEqual(phases['parse'][1], 2)
+
+
+class TimingMiddlewareTests(IsolatedStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('operator', password='secret')
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_request_id_is_echoed(self):
+        response = self.client.get('/history/', headers={**self.auth, 'X-Request-ID': 'abc-123.x_y'})
+        self.assertEqual(response['X-Request-ID'], 'abc-123.x_y')
+
+    def test_invalid_request_id_is_replaced(self):
+        for request_id in ('', 'has space', 'x' * 65, 'a\r\nSet-Cookie: x=1'):
+            response = self.client.get('/history/', headers={**self.auth, 'X-Request-ID': request_id})
+            self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_server_timing_and_request_log(self):
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            response = self.client.get('/history/', headers={**self.auth, 'X-Request-ID': 'log-test'})
+        phases = dict(re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+        self.assertLessEqual({'auth', 'db', 'serialize', 'render', 'total'}, set(phases))
+
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['request_id'], 'log-test')
+        self.assertEqual(entry['view'], 'history')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['user_id'], self.user.id)
+        self.assertIn('db', entry['phases'])
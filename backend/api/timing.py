@@ -0,0 +1,83 @@
+"""
+Per-request phase timings.
+
+TimingMiddleware (api/middleware.py) opens a collector for each request;
+code on the request path adds to it with `with timing.phase('parse'):`,
+and every database query is added as 'db' (see install_query_timer).
+The totals go out in the Server-Timing header and the JSON request log.
+Work done outside a request (background pools) is not collected.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework.renderers import JSONRenderer
+
+# Phase name -> [seconds, count]; a mutable dict so sync_to_async threads
+# add to the same collector as the request
+_phases = ContextVar('api_timing_phases', default=None)
+
+
+def start():
+    """Open a collector for the current request; returns a token for stop()."""
+    return _phases.set({})
+
+
+def stop(token):
+    phases = _phases.get()
+    _phases.reset(token)
+    return phases or {}
+
+
+def add(name, seconds):
+    phases = _phases.get()
+    if phases is None:
+        return
+    entry = phases.setdefault(name, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += 1
+
+
+@contextmanager
+def phase(name):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start_time)
+
+
+def query_timer(execute, sql, params, many, context):
+    """connection.execute_wrapper hook timing every query as 'db'."""
+    with phase('db'):
+        return execute(sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver: time the queries of every connection,
+    including those of sync_to_async threads serving async views. Queries
+    outside a request have no collector and are not recorded.
+    """
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def server_timing_header(phases, total):
+    """Server-Timing value, durations in milliseconds."""
+    parts = []
+    for name, (seconds, count) in phases.items():
+        part = f'{name};dur={seconds * 1000:.1f}'
+        if count > 1:
+            part += f';desc="{count}x"'
+        parts.append(part)
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that reports its time as the 'render' phase."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase('render'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -12,11 +12,21 @@
 
 
 # api/urls.py
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import async_views, views
 
 urlpatterns = [
     path('upload/', views.upload_csv, name='upload_csv'),
     path('history/', views.history, name='history'),
     path('datasets/<int:pk>/report.pdf', views.dataset_report_pdf, name='dataset_report_pdf'),
+    path('reports/bulk', views.bulk_reports, name='bulk_reports'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('profiles/', views.profiles, name='profiles'),
+    re_path(r'^profiles/(?P<profile_id>\d{8}-\d{6}-[0-9a-f]{8})\.prof$',
+            views.profile_download, name='profile_download'),
+
+    # Async variants, for ASGI deployments
+    path('async/upload/', async_views.upload_csv, name='async_upload_csv'),
+    path('async/history/', async_views.history, name='async_history'),
+    path('async/datasets/<int:pk>/report.pdf', async_views.dataset_report_pdf, name='async_dataset_report_pdf'),
 ]
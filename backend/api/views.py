@@ -1,19 +1,31 @@
-import json
-from io import BytesIO
-from django.http import FileResponse, Http404
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+import hmac
+import os
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.core.files.storage import default_storage
 
+from . import metrics, timing
+from .admission import admit, runs_inline
+from .authentication import read_authentication_classes
+from .ingest import (
+    check_analysis_capacity, defer_ingest, discard_upload, exceeds_quota, finish_ingest, save_upload,
+    user_datasets,
+)
 from .models import EquipmentDataset
+from .profiling import profile_path, recent_profiles
 from .serializers import EquipmentDatasetSerializer
 from .utils import analyze_csv
-
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
+from .reports import (
+    REPORT_MODES, build_combined_report, build_reports, get_or_build_report, report_etag,
+)
+from .responses import file_response, zip_response
 
 
 @api_view(['POST'])
@@ -24,45 +36,35 @@ def upload_csv(request):
 
     csv_file = request.FILES['file']
 
-    # Save file
-    # file_path = default_storage.save(csv_file.name, csv_file)
-
-    saved_name = default_storage.save(f"uploads/{csv_file.name}",csv_file)
-
-    # Analyze
-    result = analyze_csv(saved_name)
+    if exceeds_quota(request.user, csv_file.size):
+        return Response({"error": "Storage quota exceeded"}, status=413)
+
+    # Large files: analyse in the background, the client polls /history/
+    if not runs_inline(csv_file.size):
+        check_analysis_capacity()
+        saved_name, content_hash = save_upload(csv_file)
+        dataset = defer_ingest(request.user, csv_file, saved_name, content_hash)
+        with timing.phase('serialize'):
+            data = EquipmentDatasetSerializer(dataset).data
+        return Response(data, status=202)
+
+    # Save and analyze; the gate is taken first so a busy server does
+    # not store uploads it turns away
+    with admit('analysis'):
+        saved_name, content_hash = save_upload(csv_file)
+        try:
+            result = analyze_csv(saved_name)
+        except BaseException:
+            discard_upload(saved_name)
+            raise
 
     # Save in DB
-    dataset = EquipmentDataset.objects.create(
-        file=saved_name,
-        total_count=result["total_count"],
-        
-        avg_flowrate=result["avg_flowrate"],
-        avg_pressure=result["avg_pressure"],
-        avg_temperature=result["avg_temperature"],
-        type_distribution=result["type_distribution"],
-
-        min_flowrate=result["min_flowrate"],
-        min_pressure=result["min_pressure"],
-        min_temperature=result["min_temperature"],
-
-        max_flowrate=result["max_flowrate"],
-        max_pressure=result["max_pressure"],
-        max_temperature=result["max_temperature"],
-
-        rows = result['rows'],
-        # Min-Max Info
-        # min_flowrate = result
-    )
-
-    # Keep only last 5 entries
-    qs = EquipmentDataset.objects.order_by('-uploaded_at')
-    if qs.count() > 5:
-        for old in qs[5:]:
-            old.delete()
+    dataset = finish_ingest(request.user, csv_file, saved_name, content_hash, result)
 
     serializer = EquipmentDatasetSerializer(dataset)
-    return Response(serializer.data, status=201)
+    with timing.phase('serialize'):
+        data = serializer.data
+    return Response(data, status=201)
 
 
 
@@ -118,122 +120,140 @@ def upload_csv(request):
 #     return Response(serializer.data, status=201)
 
 @api_view(['GET'])
+@authentication_classes(read_authentication_classes())
 @permission_classes([IsAuthenticated])
 def history(request):
-    datasets = EquipmentDataset.objects.order_by('-uploaded_at')[:5]
+    datasets = user_datasets(request.user)[:settings.DATASET_RETENTION_PER_USER]
     serializer = EquipmentDatasetSerializer(datasets, many=True)
-    return Response(serializer.data)
+    with timing.phase('serialize'):
+        data = serializer.data
+    return Response(data)
 
 # TO-DO add pdf download opton
 
+def _not_ready(datasets):
+    """
+    409 for reports on datasets still being analysed (or failed). A plain
+    JsonResponse, so the async views answer with the same body and headers.
+    """
+    response = JsonResponse({
+        "error": "Dataset analysis has not finished",
+        "ids": [dataset.id for dataset in datasets],
+        "status": [dataset.status for dataset in datasets],
+    }, status=409)
+    if any(dataset.status == EquipmentDataset.STATUS_PENDING for dataset in datasets):
+        response['Retry-After'] = str(settings.API_ADMISSION['analysis'].get('retry_after', 5))
+    return response
+
+
 @api_view(['GET'])
+@authentication_classes(read_authentication_classes())
 @permission_classes([IsAuthenticated])
 def dataset_report_pdf(request, pk):
     """
-    Generate a simple PDF report for dataset `pk` and return as FileResponse.
+    Return the PDF report for dataset `pk`, rendering it on first request
+    and serving it from the report cache afterwards. `?mode=full` adds
+    per-type sections and the complete row table.
     """
+    mode = request.GET.get('mode', 'summary')
+    if mode not in REPORT_MODES:
+        return Response({"error": f"mode must be one of {', '.join(REPORT_MODES)}"}, status=400)
+
     try:
-        dataset = EquipmentDataset.objects.get(pk=pk)
+        dataset = user_datasets(request.user).get(pk=pk)
     except EquipmentDataset.DoesNotExist:
         return Response({"error": "Dataset not found"}, status=404)
+    if dataset.status != EquipmentDataset.STATUS_READY:
+        return _not_ready([dataset])
+
+    path = get_or_build_report(dataset, mode)
+    if mode == 'summary':
+        filename = f"dataset_{dataset.id}_report.pdf"
+    else:
+        filename = f"dataset_{dataset.id}_{mode}_report.pdf"
+
+    return file_response(request, path, filename, report_etag(dataset, mode))
+
 
-    # Create a bytes buffer for the PDF
-    buffer = BytesIO()
-
-    # Create a canvas (ReportLab)
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # Margins
-    left = 20 * mm
-    top = height - 20 * mm
-    line_h = 8 * mm
-
-    # Header
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(left, top, f"Dataset Report — ID {dataset.id}")
-
-    p.setFont("Helvetica", 10)
-    p.drawString(left, top - 1.2 * line_h, f"Uploaded: {dataset.uploaded_at.isoformat()}")
-
-    # Summary box
-    y = top - 2.6 * line_h
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(left, y, "Summary")
-    y -= 1.1 * line_h
-    p.setFont("Helvetica", 10)
-
-    def draw_kv(key, value, indent=0):
-        nonlocal y
-        p.drawString(left + indent, y, f"{key}: {value}")
-        y -= 0.9 * line_h
-
-    draw_kv("Total count", getattr(dataset, "total_count", "N/A"))
-    draw_kv("Avg Flowrate", getattr(dataset, "avg_flowrate", "N/A"))
-    draw_kv("Avg Pressure", getattr(dataset, "avg_pressure", "N/A"))
-    draw_kv("Avg Temperature", getattr(dataset, "avg_temperature", "N/A"))
-    draw_kv("Min Flowrate", getattr(dataset, "min_flowrate", "N/A"))
-    draw_kv("Max Flowrate", getattr(dataset, "max_flowrate", "N/A"))
-    draw_kv("Min Pressure", getattr(dataset, "min_pressure", "N/A"))
-    draw_kv("Max Pressure", getattr(dataset, "max_pressure", "N/A"))
-    draw_kv("Min Temperature", getattr(dataset, "min_temperature", "N/A"))
-    draw_kv("Max Temperature", getattr(dataset, "max_temperature", "N/A"))
-
-    # Leave a bit of space before distribution
-    y -= 0.5 * line_h
-
-    # Type distribution
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(left, y, "Type Distribution")
-    y -= 1.1 * line_h
-    p.setFont("Helvetica", 10)
-
-    # dataset.type_distribution assumed to be dict or JSONField
-    td = dataset.type_distribution or {}
-    # If stored as string, try parse
-    if isinstance(td, str):
+@api_view(['GET'])
+@authentication_classes(read_authentication_classes())
+@permission_classes([IsAuthenticated])
+def bulk_reports(request):
+    """
+    Reports for several datasets at once: `?ids=1,2,3` returns a ZIP of the
+    individual PDFs, `&combined=1` a single PDF with a shared summary page.
+    """
+    try:
+        ids = [int(part) for part in request.GET.get('ids', '').split(',') if part.strip()]
+    except ValueError:
+        return Response({"error": "ids must be a comma separated list of integers"}, status=400)
+    if not ids:
+        return Response({"error": "ids not provided"}, status=400)
+    if len(ids) > settings.REPORT_BULK_MAX_IDS:
+        return Response({"error": f"At most {settings.REPORT_BULK_MAX_IDS} ids per request"}, status=400)
+
+    # Keep the order the caller asked for, without duplicates
+    ids = list(dict.fromkeys(ids))
+    found = user_datasets(request.user).in_bulk(ids)
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        return Response({"error": "Dataset not found", "ids": missing}, status=404)
+    datasets = [found[pk] for pk in ids]
+    not_ready = [dataset for dataset in datasets if dataset.status != EquipmentDataset.STATUS_READY]
+    if not_ready:
+        return _not_ready(not_ready)
+
+    if request.GET.get('combined') in ('1', 'true'):
+        fd, tmp_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
         try:
-            td = json.loads(td)
-        except Exception:
-            td = {}
-
-    # Draw as simple two-column table
-    p.drawString(left, y, "Type")
-    p.drawString(left + 80 * mm, y, "Count")
-    y -= 0.9 * line_h
-
-    for tp, cnt in td.items():
-        # If out of space, add a new page
-        if y < 40 * mm:
-            p.showPage()
-            y = top - 20 * mm
-            p.setFont("Helvetica", 10)
-
-        p.drawString(left, y, str(tp))
-        p.drawString(left + 80 * mm, y, str(cnt))
-        y -= 0.8 * line_h
-
-    # Optionally include original CSV path (local path). We include it as text:
-    y -= 1.1 * line_h
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(left, y, "Source file (local path):")
-    y -= 0.9 * line_h
-    p.setFont("Helvetica", 9)
-    src = dataset.file.name if dataset.file else "N/A"
-    # Draw multi-line if long
-    text_obj = p.beginText(left, y)
-    text_obj.setFont("Helvetica", 9)
-    max_width = width - 2 * left
-    # naive wrap: split at spaces
-    for part in str(src).split():
-        text_obj.textLine(part)
-    p.drawText(text_obj)
-
-    # Finalize
-    p.showPage()
-    p.save()
-
-    buffer.seek(0)
-    filename = f"dataset_{dataset.id}_report.pdf"
-
-    return FileResponse(buffer, as_attachment=True, filename=filename)
+            build_combined_report(datasets, tmp_path)
+            combined = open(tmp_path, 'rb')
+        finally:
+            # The open handle keeps the data readable until the response closes
+            os.unlink(tmp_path)
+        return FileResponse(combined, as_attachment=True, filename="combined_report.pdf")
+
+    paths = build_reports(datasets)
+    entries = [(f"dataset_{dataset.id}_report.pdf", path) for dataset, path in zip(datasets, paths)]
+    return zip_response(entries, "reports.zip")
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, summed over all workers. Needs the
+    METRICS_TOKEN bearer token; only a DEBUG server answers without one.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(metrics.collect_snapshots()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profiles(request):
+    """Recent request profiles, newest first (staff only)."""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 50)), 500))
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+    entries = recent_profiles(limit)
+    for entry in entries:
+        entry['url'] = request.build_absolute_uri(reverse('profile_download', args=[entry['id']]))
+    return Response(entries)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_download(request, profile_id):
+    path = profile_path(profile_id)
+    if not path.exists():
+        return Response({"error": "Profile not found"}, status=404)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name,
+                        content_type='application/octet-stream')
@@ -0,0 +1,32 @@
+"""
+Preload the heavy libraries that request code imports lazily (pandas for
+CSV analysis, ReportLab for reports).
+
+gunicorn.conf.py calls this in the master before workers are forked, so
+the imported modules are shared copy-on-write between workers and no
+worker pays for them on its first upload or report. Without it, workers
+boot faster and load the libraries on first use.
+"""
+import importlib
+import time
+
+HEAVY_MODULES = (
+    "pandas",
+    "reportlab.pdfgen.canvas",
+    "reportlab.pdfbase.pdfmetrics",
+)
+
+
+def preload_heavy_modules():
+    """Import HEAVY_MODULES; returns {module: seconds}."""
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = time.perf_counter() - start
+
+    # Font metrics are loaded on the first width measurement
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    stringWidth("warm-up", "Helvetica", 9)
+    stringWidth("warm-up", "Helvetica-Bold", 9)
+    return timings
@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Database, uploads, report cache, metrics and profiles live under DATA_DIR.
+# API_DATA_DIR moves them elsewhere, e.g. the throwaway server started by
+# benchmarks/load.py
+DATA_DIR = Path(os.environ.get('API_DATA_DIR') or BASE_DIR)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -45,14 +51,25 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',   # default: require auth for all views
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.timing.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 MIDDLEWARE = [
+    'api.middleware.TimingMiddleware',
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.CompressionMiddleware',
+    # ETag on JSON responses (/history/) and 304 for If-None-Match; below
+    # compression so the tag is computed on the uncompressed body
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +89,9 @@ CORS_ALLOWED_ORIGINS = [
 # disbale later
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Let browser clients read the timing and backpressure headers
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'X-Request-ID', 'Retry-After']
+
 
 ROOT_URLCONF = 'backend.urls'
 
@@ -96,10 +116,33 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite runs in WAL mode so readers (e.g. /history/) do not block behind
+# writers when several gunicorn workers share the file. Write transactions
+# start IMMEDIATE, wait up to SQLITE_BUSY_TIMEOUT seconds for the lock and
+# ingest writes are serialized through api/db.py.
+
+SQLITE_BUSY_TIMEOUT = 20
+
+# Extra attempts (with exponential backoff) for writes that still hit
+# "database is locked"
+SQLITE_WRITE_RETRIES = 3
+SQLITE_RETRY_BACKOFF = 0.05
+
+SQLITE_WRITER_LOCK_FILE = DATA_DIR / 'db.sqlite3.writer.lock'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': DATA_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+        # File-backed so concurrency tests exercise real locking
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -140,6 +183,118 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploads live under DATA_DIR: new ones as content-addressed blobs
+# (blobs/ab/cd/<sha256>, see api/storage.py), older ones in uploads/
+
+MEDIA_ROOT = DATA_DIR
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Resolved JWT users are cached per process for TTL seconds,
+# see api/authentication.py
+
+AUTH_USER_CACHE = {
+    'TTL': 60,
+    'MAX_SIZE': 1024,
+}
+
+# Serve read-only endpoints from the token alone (no user lookup at all).
+# Deactivated users keep read access until their access token expires.
+AUTH_STATELESS_READS = False
+
+
+# Per-user limits: datasets kept per user (older ones are deleted on
+# upload) and total bytes of uploads kept per user (None for no limit)
+
+DATASET_RETENTION_PER_USER = 5
+USER_STORAGE_QUOTA_BYTES = 500 * 1024 * 1024
+
+
+# Cached PDF reports
+# One subdirectory per dataset, see api/reports.py
+
+REPORT_CACHE_DIR = DATA_DIR / 'report_cache'
+
+# Render each report in the background right after upload
+REPORT_PREGENERATE = True
+
+# Background worker pools, see api/executors.py
+# max_workers caps concurrency, max_pending caps running + queued jobs
+
+API_EXECUTORS = {
+    'reports': {'kind': 'thread', 'max_workers': 2, 'max_pending': 16},
+    'bulk_reports': {'kind': 'process', 'max_workers': 2, 'max_pending': 32},
+    # CSV analysis for deferred (large) uploads and the async views, and
+    # on-demand report rendering for the async views
+    'analysis': {'kind': 'thread', 'max_workers': 4, 'max_pending': 64},
+    'render': {'kind': 'thread', 'max_workers': 2, 'max_pending': 32},
+}
+
+# Admission control for the expensive request paths, see api/admission.py.
+# Per endpoint class: requests doing the work at once, requests allowed to
+# wait for a slot (and for how long), and the Retry-After sent with 429
+API_ADMISSION = {
+    'analysis': {'max_concurrent': 2, 'max_waiting': 8, 'wait_timeout': 10, 'retry_after': 5},
+    'reports': {'max_concurrent': 2, 'max_waiting': 8, 'wait_timeout': 10, 'retry_after': 5},
+}
+
+# Uploads above this size are analysed on the 'analysis' pool: the upload
+# returns 202 with status "pending" and /history/ shows the result later.
+# None analyses every upload inline
+UPLOAD_INLINE_MAX_BYTES = 5 * 1024 * 1024
+
+# /metrics, see api/metrics.py. Each worker writes its snapshot to
+# METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds; None keeps
+# metrics per process. Scrapers must send "Authorization: Bearer
+# <METRICS_TOKEN>"; while it is unset, /metrics answers only with DEBUG on
+# and is a 404 otherwise
+METRICS_DIR = DATA_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
+# Request profiling, see api/profiling.py. When enabled, staff can profile
+# a request with "X-Profile: 1" or ?profile=1 plus an
+# "X-Profile-Token: <PROFILING_TOKEN>" header (the flag is ignored while
+# PROFILING_TOKEN is unset), and PROFILING_SAMPLE_RATE of all requests are
+# profiled; the newest PROFILING_KEEP are kept
+PROFILING_ENABLED = False
+PROFILING_TOKEN = None
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_DIR = DATA_DIR / 'profiles'
+PROFILING_KEEP = 200
+
+# Upper bound on ids accepted by /reports/bulk
+REPORT_BULK_MAX_IDS = 50
+
+# Rows read from the CSV per batch when rendering full-data reports
+REPORT_BATCH_ROWS = 5000
+
+# Response types gzipped by api.middleware.CompressionMiddleware when the
+# client accepts it
+COMPRESS_CONTENT_TYPES = ('application/json', 'text/plain')
+
+# One JSON line per request from api.middleware.TimingMiddleware
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'api.requests': {'handlers': ['requests'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,9 @@
+"""
+Performance benchmarks for the backend.
+
+    python -m benchmarks.generate --rows 1000000 data.csv
+    python -m benchmarks.run --sizes 1000,100000 --output results.json
+    python -m benchmarks.compare baseline.json results.json
+
+Run from the backend directory.
+"""
@@ -0,0 +1,72 @@
+"""
+Compare two benchmarks.run result files:
+
+    python -m benchmarks.compare baseline.json results.json --threshold 10
+
+Prints the median time and peak memory change per benchmark and size, and
+exits with status 1 if any benchmark got slower by more than --threshold
+percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data["meta"], {(r["benchmark"], r["rows"]): r for r in data["results"]}
+
+
+def _change(old, new):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def _fmt_change(change):
+    return "n/a" if change is None else f"{change:+.1f}%"
+
+
+def compare(baseline, current, threshold):
+    """Rows of (benchmark, rows, old, new, time change, memory change, regressed)."""
+    rows = []
+    for key in sorted(set(baseline) & set(current), key=lambda k: (k[1], k[0])):
+        old, new = baseline[key], current[key]
+        time_change = _change(old["median_s"], new["median_s"])
+        memory_change = _change(old["peak_memory_bytes"], new["peak_memory_bytes"])
+        regressed = time_change is not None and time_change > threshold
+        rows.append((key[0], key[1], old["median_s"], new["median_s"], time_change, memory_change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    old_meta, baseline = _load(args.baseline)
+    new_meta, current = _load(args.current)
+    print(f"baseline {(old_meta.get('commit') or '?')[:10]}  current {(new_meta.get('commit') or '?')[:10]}")
+
+    header = f"{'benchmark':<16} {'rows':>10} {'base (s)':>10} {'new (s)':>10} {'time':>9} {'memory':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = compare(baseline, current, args.threshold)
+    for name, n, old, new, time_change, memory_change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<16} {n:>10} {old:>10.4f} {new:>10.4f} "
+              f"{_fmt_change(time_change):>9} {_fmt_change(memory_change):>9}{flag}")
+
+    for key in sorted(set(baseline) ^ set(current), key=lambda k: (k[1], k[0])):
+        where = "baseline" if key in baseline else "current"
+        print(f"{key[0]:<16} {key[1]:>10}  only in {where}")
+
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Deterministic generator for equipment CSVs in the upload format
+(Equipment Name, Type, Flowrate, Pressure, Temperature).
+
+The same arguments always produce the same file. Rows are written in
+chunks, so sizes up to tens of millions of rows need little memory.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Equipment Name", "Type", "Flowrate", "Pressure", "Temperature"]
+
+BASE_TYPES = ["Pump", "Compressor", "Valve", "HeatExchanger", "Reactor", "Condenser"]
+
+CHUNK_ROWS = 100_000
+
+
+def type_names(cardinality):
+    """The sample file's types first, then Type7, Type8, ..."""
+    names = BASE_TYPES[:cardinality]
+    names += [f"Type{i}" for i in range(len(names) + 1, cardinality + 1)]
+    return names
+
+
+def _chunks(rows, types, noise, bad_rows, seed, extra_columns):
+    rng = np.random.default_rng(seed)
+    names = np.array(type_names(types), dtype=object)
+    # Per-type operating point, so type statistics differ
+    base_flow = rng.uniform(50, 200, len(names))
+    base_pressure = rng.uniform(3, 9, len(names))
+    base_temp = rng.uniform(90, 140, len(names))
+
+    for offset in range(0, rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, rows - offset)
+        kind = rng.integers(0, len(names), n)
+        jitter = 1 + rng.normal(0, noise, (3, n))
+
+        chunk = pd.DataFrame({
+            "Equipment Name": names[kind] + "-" + np.arange(offset + 1, offset + n + 1).astype(str).astype(object),
+            "Type": names[kind],
+            "Flowrate": np.round(base_flow[kind] * jitter[0]).astype(float),
+            "Pressure": np.round(base_pressure[kind] * jitter[1], 1),
+            "Temperature": np.round(base_temp[kind] * jitter[2]).astype(float),
+        })
+
+        # Bad rows: one numeric reading missing, as from a dropped sensor
+        if bad_rows:
+            bad = np.flatnonzero(rng.random(n) < bad_rows)
+            column = rng.integers(2, 5, len(bad))
+            for col in range(2, 5):
+                chunk.iloc[bad[column == col], col] = np.nan
+
+        # Wide files: extra sensor readings the analysis does not use
+        for i in range(1, extra_columns + 1):
+            chunk[f"Sensor{i}"] = np.round(rng.normal(100, 15, n), 2)
+        yield chunk
+
+
+def generate(path, rows, types=6, noise=0.1, bad_rows=0.0, seed=0, extra_columns=0):
+    """
+    Write `rows` rows to `path`.
+
+    types          number of distinct Type values
+    noise          relative standard deviation of the readings
+    bad_rows       fraction of rows with a missing reading
+    extra_columns  additional SensorN columns, for wide files
+    """
+    with open(path, "w", newline="") as f:
+        columns = COLUMNS + [f"Sensor{i}" for i in range(1, extra_columns + 1)]
+        f.write(",".join(columns) + "\n")
+        for chunk in _chunks(rows, types, noise, bad_rows, seed, extra_columns):
+            chunk.to_csv(f, header=False, index=False, float_format="%g")
+    return path
+
+
+def parse_rows(value):
+    """Row counts with k/M suffixes: 1k, 250k, 50M."""
+    value = value.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=parse_rows, default=1000, help="e.g. 1000, 250k, 50M")
+    parser.add_argument("--types", type=int, default=6, help="Type cardinality")
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--bad-rows", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extra-columns", type=int, default=0, help="SensorN columns for wide files")
+    args = parser.parse_args(argv)
+    generate(args.path, args.rows, args.types, args.noise, args.bad_rows, args.seed, args.extra_columns)
+
+
+if __name__ == "__main__":
+    main()
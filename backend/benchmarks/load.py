@@ -0,0 +1,352 @@
+"""
+Load test: N simulated operators against a local gunicorn (or --url).
+
+    python -m benchmarks.load --users 20 --workers 4 --duration 60
+
+Each user logs in, then loops over a weighted mix of /history/ polls,
+CSV uploads, report downloads and fresh logins with exponential think
+time in between. The report lists, per endpoint, request count,
+throughput, p50/p95/p99 latency, errors and rejections (429/503 from
+admission control).
+
+When the harness starts the server itself it points it (via API_DATA_DIR,
+see settings.py) at a freshly migrated database and media directory in a
+temporary directory, creates loadtest-<n> users there and drops it all
+afterwards. With --url, pass --username/--password of an existing account
+shared by all simulated users.
+
+The HTTP client is plain asyncio (one connection per request), so no
+extra packages are needed besides gunicorn for the local server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .generate import generate, parse_rows
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+ENDPOINTS = ("login", "history", "upload", "report")
+DEFAULT_MIX = "history=60,report=25,upload=10,login=5"
+BUSY_STATUS_CODES = (429, 503)
+PASSWORD = "loadtest-password"
+
+
+class HTTPError(Exception):
+    pass
+
+
+def _dechunk(body):
+    out = bytearray()
+    while body:
+        size_line, _, rest = body.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        body = rest[size + 2:]
+    return bytes(out)
+
+
+async def http_request(host, port, method, path, headers=None, body=b"", timeout=120):
+    """Minimal HTTP/1.1 request; returns (status, headers, body)."""
+    async def send():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}",
+                     "Connection: close", f"Content-Length: {len(body)}"]
+            lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise HTTPError("connection closed before response")
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+            data = await reader.read()
+            if response_headers.get("transfer-encoding", "").lower() == "chunked":
+                data = _dechunk(data)
+            return status, response_headers, data
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(send(), timeout)
+
+
+def _multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: text/csv\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Stats:
+
+    def __init__(self):
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.rejected = {name: 0 for name in ENDPOINTS}
+
+    def record(self, endpoint, seconds, status):
+        if status is None or (status >= 400 and status not in BUSY_STATUS_CODES):
+            self.errors[endpoint] += 1
+        elif status in BUSY_STATUS_CODES:
+            self.rejected[endpoint] += 1
+        self.latencies[endpoint].append(seconds)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class Simulation:
+
+    def __init__(self, url, credentials, mix, think, upload_body, stats, seed):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.credentials = credentials
+        self.actions, self.weights = zip(*mix.items())
+        self.think = think
+        self.upload_body = upload_body
+        self.stats = stats
+        self.seed = seed
+
+    async def _call(self, endpoint, method, path, token=None, body=b"", content_type=None):
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if content_type:
+            headers["Content-Type"] = content_type
+        start = time.perf_counter()
+        try:
+            status, _, data = await http_request(self.host, self.port, method, path, headers, body)
+        except (OSError, asyncio.TimeoutError, HTTPError, ValueError, IndexError):
+            self.stats.record(endpoint, time.perf_counter() - start, None)
+            return None, None
+        self.stats.record(endpoint, time.perf_counter() - start, status)
+        return status, data
+
+    async def _login(self, user_index):
+        username, password = self.credentials(user_index)
+        body = json.dumps({"username": username, "password": password}).encode()
+        status, data = await self._call("login", "POST", "/api/token/", body=body,
+                                        content_type="application/json")
+        return json.loads(data)["access"] if status == 200 else None
+
+    async def user(self, index, deadline, start_delay):
+        rng = random.Random(self.seed * 100_003 + index)
+        await asyncio.sleep(start_delay)
+        token = await self._login(index)
+        dataset_ids = []
+        while time.monotonic() < deadline:
+            action = rng.choices(self.actions, self.weights)[0]
+            if action == "login" or token is None:
+                token = await self._login(index) or token
+            elif action == "history":
+                status, data = await self._call("history", "GET", "/history/", token)
+                if status == 200:
+                    dataset_ids = [d["id"] for d in json.loads(data) if d.get("status", "ready") == "ready"]
+            elif action == "upload":
+                body, content_type = self.upload_body
+                await self._call("upload", "POST", "/upload/", token, body, content_type)
+            elif action == "report" and dataset_ids:
+                await self._call("report", "GET", f"/datasets/{rng.choice(dataset_ids)}/report.pdf", token)
+            if self.think:
+                await asyncio.sleep(rng.expovariate(1 / self.think))
+
+    async def run(self, users, duration, ramp_up):
+        deadline = time.monotonic() + ramp_up + duration
+        await asyncio.gather(*(
+            self.user(i, deadline, ramp_up * i / max(users, 1)) for i in range(users)
+        ))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_server(workers, threads, log_path):
+    """Run gunicorn on a free port until the block exits; yields the URL."""
+    port = _free_port()
+    command = [
+        sys.executable, "-m", "gunicorn", "backend.wsgi:application",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers), "--threads", str(threads), "--timeout", "300",
+    ]
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            for _ in range(300):
+                if process.poll() is not None:
+                    raise SystemExit(f"gunicorn exited (is it installed?), see {log_path}")
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            else:
+                raise SystemExit(f"gunicorn did not start, see {log_path}")
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+@contextmanager
+def load_test_users(count):
+    """Create loadtest-<n> users in the harness's temporary database for the run."""
+    from django.contrib.auth.models import User
+    from django.contrib.auth.hashers import make_password
+
+    password = make_password(PASSWORD)
+    names = [f"loadtest-{i}" for i in range(count)]
+    User.objects.filter(username__in=names).delete()
+    User.objects.bulk_create([User(username=name, password=password) for name in names])
+    try:
+        yield lambda index: (names[index], PASSWORD)
+    finally:
+        # Cascades to their datasets; the signals release stored files
+        for user in User.objects.filter(username__in=names):
+            user.delete()
+
+
+def summarize(stats, elapsed):
+    summary = {}
+    for endpoint in ENDPOINTS:
+        latencies = stats.latencies[endpoint]
+        if not latencies:
+            continue
+        count = len(latencies)
+        summary[endpoint] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+            "errors": stats.errors[endpoint],
+            "error_rate": round(stats.errors[endpoint] / count, 4),
+            "rejected": stats.rejected[endpoint],
+        }
+    return summary
+
+
+def print_summary(summary, elapsed):
+    header = (f"{'endpoint':<10} {'reqs':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'max ms':>9} {'err %':>7} {'429/503':>8}")
+    print(f"\n{elapsed:.1f}s")
+    print(header)
+    print("-" * len(header))
+    for endpoint, s in summary.items():
+        print(f"{endpoint:<10} {s['requests']:>7} {s['throughput_rps']:>8.2f} {s['p50_ms']:>9.1f} "
+              f"{s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['max_ms']:>9.1f} "
+              f"{s['error_rate'] * 100:>7.2f} {s['rejected']:>8}")
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the backend with simulated operators.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds, after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds to start all users")
+    parser.add_argument("--think", type=float, default=1.0, help="mean pause between requests")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--upload-rows", type=parse_rows, default=1000)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=1, help="threads per gunicorn worker")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the summary as JSON")
+    args = parser.parse_args(argv)
+    if args.url and not (args.username and args.password):
+        parser.error("--url needs --username and --password")
+
+    with tempfile.TemporaryDirectory(prefix="api-load-") as tmp:
+        csv_path = Path(tmp) / "upload.csv"
+        generate(csv_path, args.upload_rows, seed=args.seed)
+        upload_body = _multipart("file", "loadtest.csv", csv_path.read_bytes())
+        stats = Stats()
+
+        def simulate(url, credentials):
+            simulation = Simulation(url, credentials, args.mix, args.think, upload_body, stats, args.seed)
+            start = time.perf_counter()
+            asyncio.run(simulation.run(args.users, args.duration, args.ramp_up))
+            return time.perf_counter() - start
+
+        if args.url:
+            elapsed = simulate(args.url, lambda index: (args.username, args.password))
+        else:
+            sys.path.insert(0, str(BACKEND_DIR))
+            os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+            # Never the project's db.sqlite3 and uploads: this process and
+            # the gunicorn it starts (which inherits the environment) share
+            # a temporary data directory
+            data_dir = Path(tmp) / "data"
+            data_dir.mkdir()
+            os.environ["API_DATA_DIR"] = str(data_dir)
+            import django
+            from django.core.management import call_command
+            django.setup()
+            call_command("migrate", verbosity=0)
+            log_path = Path(tmp) / "gunicorn.log"
+            with load_test_users(args.users) as credentials, \
+                    local_server(args.workers, args.threads, log_path) as url:
+                print(f"Server at {url}, {args.workers} workers x {args.threads} threads", file=sys.stderr)
+                elapsed = simulate(url, credentials)
+
+    summary = summarize(stats, elapsed)
+    print_summary(summary, elapsed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "users": args.users, "duration_s": round(elapsed, 2), "workers": args.workers,
+                "threads": args.threads, "mix": args.mix, "endpoints": summary,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Time the ingest and report paths on generated CSVs and write the results
+as JSON, for comparison across commits with benchmarks.compare.
+
+Benchmarks, per CSV size:
+    analyze_csv         parse and aggregate a stored file
+    upload              POST /upload/ end to end (storage, analysis, DB)
+    history             GET /history/ with a full page of datasets
+    report_summary      GET /datasets/<id>/report.pdf, cache cleared
+    report_full         the same with ?mode=full (up to --full-report-max-rows)
+
+Each benchmark is timed --repeat times; a separate run under tracemalloc
+records peak Python/numpy memory. Everything runs against the test
+database and a temporary media directory.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .generate import generate, parse_rows
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _measure(fn, repeat):
+    """Wall times of `repeat` calls, then one call under tracemalloc."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def _result(name, rows, size, times, peak):
+    median = statistics.median(times)
+    return {
+        "benchmark": name,
+        "rows": rows,
+        "bytes": size,
+        "times_s": [round(t, 6) for t in times],
+        "min_s": round(min(times), 6),
+        "median_s": round(median, 6),
+        "rows_per_s": round(rows / median, 1) if median else None,
+        "bytes_per_s": round(size / median, 1) if median else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_benchmarks(sizes, repeat, generator_options, full_report_max_rows, only=None):
+    from django.contrib.auth.models import User
+    from django.core.files.base import File
+    from django.core.files.storage import default_storage
+    from django.test.utils import (
+        override_settings, setup_databases, setup_test_environment,
+        teardown_databases, teardown_test_environment,
+    )
+    from rest_framework.test import APIClient
+
+    from api.reports import purge_report_cache
+    from api.utils import analyze_csv
+
+    work_dir = Path(tempfile.mkdtemp(prefix="api-bench-"))
+    overrides = override_settings(
+        MEDIA_ROOT=str(work_dir / "media"),
+        REPORT_CACHE_DIR=work_dir / "report_cache",
+        SQLITE_WRITER_LOCK_FILE=work_dir / "writer.lock",
+        METRICS_DIR=None,
+        REPORT_PREGENERATE=False,
+        UPLOAD_INLINE_MAX_BYTES=None,
+        USER_STORAGE_QUOTA_BYTES=None,
+    )
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    overrides.enable()
+    results = []
+    try:
+        user = User.objects.create_user("bench")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def wanted(name):
+            return only is None or name in only
+
+        for rows in sizes:
+            csv_path = work_dir / f"equipment_{rows}.csv"
+            generate(csv_path, rows, **generator_options)
+            size = csv_path.stat().st_size
+            print(f"{rows} rows ({size / 1e6:.1f} MB)", file=sys.stderr)
+
+            with open(csv_path, "rb") as f:
+                stored = default_storage.save(f"uploads/{csv_path.name}", File(f))
+
+            def add(name, fn):
+                times, peak = _measure(fn, repeat)
+                results.append(_result(name, rows, size, times, peak))
+                print(f"  {name:<16} {results[-1]['median_s']:.4f}s", file=sys.stderr)
+
+            if wanted("analyze_csv"):
+                add("analyze_csv", lambda: analyze_csv(stored))
+
+            def upload():
+                with open(csv_path, "rb") as f:
+                    response = client.post("/upload/", {"file": f}, format="multipart")
+                assert response.status_code == 201, response.content
+                return response.data["id"]
+
+            # Also leaves a full history page and a dataset to report on
+            dataset_id = upload()
+            if wanted("upload"):
+                add("upload", upload)
+                dataset_id = client.get("/history/").data[0]["id"]
+
+            if wanted("history"):
+                add("history", lambda: client.get("/history/").content)
+
+            modes = [("report_summary", "summary")]
+            if rows <= full_report_max_rows:
+                modes.append(("report_full", "full"))
+            for name, mode in modes:
+                if not wanted(name):
+                    continue
+
+                def report(mode=mode):
+                    purge_report_cache(dataset_id)
+                    response = client.get(f"/datasets/{dataset_id}/report.pdf?mode={mode}")
+                    assert response.status_code == 200, response
+                    for _ in response.streaming_content:
+                        pass
+                add(name, report)
+
+            csv_path.unlink()
+    finally:
+        overrides.disable()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the backend benchmarks.")
+    parser.add_argument("--sizes", default="1k,10k,100k",
+                        help="comma separated row counts, e.g. 1k,100k,1M")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="comma separated benchmark names")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--types", type=int, default=6)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--bad-rows", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--full-report-max-rows", type=parse_rows, default=parse_rows("100k"))
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    import django
+    django.setup()
+    # One JSON line per request would bury the progress output
+    logging.getLogger("api.requests").setLevel(logging.WARNING)
+
+    generator_options = {
+        "types": args.types, "noise": args.noise, "bad_rows": args.bad_rows, "seed": args.seed,
+    }
+    sizes = [parse_rows(size) for size in args.sizes.split(",") if size.strip()]
+    only = set(args.only.split(",")) if args.only else None
+    results = run_benchmarks(sizes, args.repeat, generator_options, args.full_report_max_rows, only)
+
+    output = {
+        "meta": {
+            "commit": _git("rev-parse", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "generator": generator_options,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Worker cold-start benchmark.
+
+    python -m benchmarks.startup --repeat 10 --output startup.json
+    python -m benchmarks.compare startup-before.json startup.json
+
+Each repeat starts a fresh interpreter and measures:
+    process_start     interpreter start to a loaded app, as seen from outside
+    worker_boot       get_wsgi_application() plus the URLconf (all views)
+    import_pandas     what the first upload pays without preloading
+    import_reportlab  what the first report pays without preloading
+
+Results use the benchmarks.run format (rows is 0), so compare.py works on
+them. --importtime also prints the slowest imports of a worker boot.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from .run import BACKEND_DIR, _git
+
+CHILD = """
+import json, os, resource, sys, time
+os.environ['DJANGO_SETTINGS_MODULE'] = 'backend.settings'
+timings = {}
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+timings['worker_boot'] = time.perf_counter() - start
+heavy = [m for m in ('pandas', 'reportlab') if m in sys.modules]
+start = time.perf_counter()
+import pandas
+timings['import_pandas'] = time.perf_counter() - start
+start = time.perf_counter()
+import reportlab.pdfgen.canvas
+timings['import_reportlab'] = time.perf_counter() - start
+print(json.dumps({'timings': timings, 'heavy_at_boot': heavy,
+                  'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}))
+"""
+
+BOOT_ONLY = CHILD.split("heavy = ")[0]
+
+
+def _run_child():
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def _process_start():
+    # Boot only, so the heavy imports in CHILD do not count
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", BOOT_ONLY], cwd=BACKEND_DIR, check=True)
+    return time.perf_counter() - start
+
+
+def slowest_imports(limit):
+    """(cumulative microseconds, module) of a worker boot, slowest first."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", BOOT_ONLY], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    # "import time: <self us> | <cumulative us> | <module>"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def _result(name, times, peak):
+    return {
+        "benchmark": name,
+        "rows": 0,
+        "bytes": 0,
+        "times_s": [round(t, 6) for t in times],
+        "min_s": round(min(times), 6),
+        "median_s": round(statistics.median(times), 6),
+        "rows_per_s": None,
+        "bytes_per_s": None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure worker cold-start time.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--importtime", type=int, metavar="N", default=0,
+                        help="also print the N slowest imports of a worker boot")
+    args = parser.parse_args(argv)
+
+    samples = {"process_start": [], "worker_boot": [], "import_pandas": [], "import_reportlab": []}
+    peak = 0
+    heavy_at_boot = set()
+    for _ in range(args.repeat):
+        data = _run_child()
+        for name, seconds in data["timings"].items():
+            samples[name].append(seconds)
+        samples["process_start"].append(_process_start())
+        peak = max(peak, data["maxrss"])
+        heavy_at_boot.update(data["heavy_at_boot"])
+
+    results = [_result(name, times, peak if name == "process_start" else 0)
+               for name, times in samples.items()]
+    for r in results:
+        print(f"{r['benchmark']:<18} median {r['median_s'] * 1000:8.1f} ms   min {r['min_s'] * 1000:8.1f} ms")
+    print(f"max RSS {peak / 1e6:.1f} MB; heavy modules at boot: {', '.join(sorted(heavy_at_boot)) or 'none'}")
+
+    if args.importtime:
+        print(f"\n{'cumulative ms':>14}  module")
+        for cumulative, module in slowest_imports(args.importtime):
+            print(f"{cumulative / 1000:>14.1f}  {module}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "commit": _git("rev-parse", "HEAD"),
+                    "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+                    "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                    "repeat": args.repeat,
+                    "heavy_at_boot": sorted(heavy_at_boot),
+                },
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+gunicorn settings, picked up automatically when gunicorn runs from this
+directory:
+
+    gunicorn backend.wsgi:application --workers 4
+
+Set API_PRELOAD_HEAVY_MODULES=0 to skip preloading pandas and ReportLab in
+the master (see api/warmup.py).
+"""
+import os
+
+# Report renders of large datasets can take a while
+timeout = 300
+
+# Hold idle client connections open between dashboard calls. Applies to
+# threaded workers (--threads > 1); sync workers close every connection.
+keepalive = 30
+
+preload_heavy_modules = os.environ.get("API_PRELOAD_HEAVY_MODULES", "1") != "0"
+
+
+def on_starting(server):
+    if not preload_heavy_modules:
+        return
+    from api.warmup import preload_heavy_modules as preload
+
+    timings = preload()
+    server.log.info("Preloaded %s in %.2fs", ", ".join(timings), sum(timings.values()))
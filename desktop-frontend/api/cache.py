@@ -0,0 +1,204 @@
+"""
+Local cache of server data for instant startup and offline use
+
+History entries (each dataset with its summary statistics and rows) and
+downloaded PDF reports are kept in a SQLite database in the user's data
+directory, one set per account (username@server). Entries carry the ETag
+the server sent with them: APIClient revalidates with If-None-Match and
+the server answers 304 when nothing changed.
+
+Offline use needs the password of the last online login: a salted
+scrypt verifier of it is kept per account (never the password itself).
+
+The cache is written from worker threads, so every call opens its own
+connection.
+"""
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+APP_DIR_NAME = os.path.join('FOSSEE', 'Chemical Equipment Visualizer')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    account TEXT PRIMARY KEY,
+    etag TEXT,
+    dataset_ids TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    account TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    etag TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (account, id)
+);
+CREATE TABLE IF NOT EXISTS reports (
+    account TEXT NOT NULL,
+    dataset_id INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    path TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (account, dataset_id)
+);
+CREATE TABLE IF NOT EXISTS credentials (
+    account TEXT PRIMARY KEY,
+    salt BLOB NOT NULL,
+    verifier BLOB NOT NULL
+);
+"""
+
+# scrypt cost: about 50 ms per check, once per login
+SCRYPT_PARAMS = {'n': 2 ** 14, 'r': 8, 'p': 1, 'dklen': 32}
+
+
+def default_cache_dir() -> str:
+    """
+    Per-user data directory of the app; CHEMVIZ_CACHE_DIR overrides it
+    """
+    override = os.environ.get('CHEMVIZ_CACHE_DIR')
+    if override:
+        return override
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(r'~\AppData\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return os.path.join(base, APP_DIR_NAME)
+
+
+class CachedHistory(NamedTuple):
+    etag: Optional[str]
+    datasets: List[Dict]
+    fetched_at: float
+
+
+class CachedReport(NamedTuple):
+    etag: str
+    path: str
+
+
+class LocalCache:
+    """SQLite cache of history and reports under `directory`"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or default_cache_dir()
+        self.reports_dir = os.path.join(self.directory, 'reports')
+        os.makedirs(self.reports_dir, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection committed on success and closed afterwards"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def has_account(self, account: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute('SELECT 1 FROM history WHERE account = ?', (account,)).fetchone()
+        return row is not None
+
+    def store_credentials(self, account: str, password: str):
+        """Remember a verifier of a password the server just accepted"""
+        salt = os.urandom(16)
+        verifier = hashlib.scrypt(password.encode('utf-8'), salt=salt, **SCRYPT_PARAMS)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO credentials VALUES (?, ?, ?)',
+                         (account, salt, verifier))
+
+    def check_credentials(self, account: str, password: str) -> bool:
+        """True if `password` matches the last online login of `account`"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT salt, verifier FROM credentials WHERE account = ?',
+                               (account,)).fetchone()
+        if row is None:
+            return False
+        salt, verifier = row
+        candidate = hashlib.scrypt(password.encode('utf-8'), salt=salt, **SCRYPT_PARAMS)
+        return hmac.compare_digest(candidate, verifier)
+
+    def history(self, account: str) -> Optional[CachedHistory]:
+        """The last history fetched for `account`, newest dataset first"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT etag, dataset_ids, fetched_at FROM history WHERE account = ?',
+                               (account,)).fetchone()
+            if row is None:
+                return None
+            etag, dataset_ids, fetched_at = row
+            ids = json.loads(dataset_ids)
+            data = dict(conn.execute(
+                f'SELECT id, data FROM datasets WHERE account = ? AND id IN ({",".join("?" * len(ids))})',
+                (account, *ids)).fetchall())
+        datasets = [json.loads(data[i]) for i in ids if i in data]
+        return CachedHistory(etag, datasets, fetched_at)
+
+    def store_history(self, account: str, etag: Optional[str], datasets: List[Dict]):
+        """
+        Replace the cached history of `account`. Datasets no longer in it
+        (removed by retention on the server) are dropped with their reports.
+        """
+        now = time.time()
+        ids = [dataset['id'] for dataset in datasets]
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?)',
+                         (account, etag, json.dumps(ids), now))
+            conn.executemany('INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?)',
+                             [(account, dataset['id'], json.dumps(dataset), etag, now)
+                              for dataset in datasets])
+            placeholders = ','.join('?' * len(ids))
+            conn.execute(f'DELETE FROM datasets WHERE account = ? AND id NOT IN ({placeholders})',
+                         (account, *ids))
+            stale = conn.execute(
+                f'SELECT path FROM reports WHERE account = ? AND dataset_id NOT IN ({placeholders})',
+                (account, *ids)).fetchall()
+            conn.execute(f'DELETE FROM reports WHERE account = ? AND dataset_id NOT IN ({placeholders})',
+                         (account, *ids))
+        for (path,) in stale:
+            self._remove(path)
+
+    def touch_history(self, account: str):
+        """Record that the server confirmed the cached history (304)"""
+        with self._connect() as conn:
+            conn.execute('UPDATE history SET fetched_at = ? WHERE account = ?', (time.time(), account))
+
+    def report(self, account: str, dataset_id: int) -> Optional[CachedReport]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT etag, path FROM reports WHERE account = ? AND dataset_id = ?',
+                               (account, dataset_id)).fetchone()
+        if row is None or not os.path.exists(row[1]):
+            return None
+        return CachedReport(*row)
+
+    def store_report(self, account: str, dataset_id: int, etag: str, source_path: str):
+        """Keep a copy of a downloaded report under its ETag"""
+        name = f"{hashlib.sha1(account.encode('utf-8')).hexdigest()[:16]}-{dataset_id}.pdf"
+        path = os.path.join(self.reports_dir, name)
+        tmp_path = path + '.tmp'
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)',
+                         (account, dataset_id, etag, path, time.time()))
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -2,33 +2,213 @@
 API Client for communicating with Django backend
 Handles JWT authentication, token refresh, and all API endpoints
 """
+import base64
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, List
+from urllib3.util.retry import Retry
+
+from .cache import CachedHistory, LocalCache
+from .multipart import MultipartFileStream, UploadCancelled
+
+logger = logging.getLogger(__name__)
+
+# Status codes the server uses to say "busy, come back later"
+BUSY_STATUS_CODES = (429, 503)
+
+
+def parse_server_timing(value: Optional[str]) -> Dict[str, float]:
+    """
+    Parse a Server-Timing header into {phase: milliseconds}, e.g.
+    'db;dur=3.2;desc="4x", total;dur=12.5' -> {'db': 3.2, 'total': 12.5}
+    """
+    phases = {}
+    for part in (value or '').split(','):
+        fields = [field.strip() for field in part.split(';')]
+        if not fields[0]:
+            continue
+        for field in fields[1:]:
+            if field.startswith('dur='):
+                try:
+                    phases[fields[0]] = float(field[4:])
+                except ValueError:
+                    pass
+    return phases
+
+
+def jwt_expiry(token: Optional[str]) -> Optional[float]:
+    """
+    The 'exp' claim (Unix time) of a JWT, or None if it cannot be read. The
+    signature is not checked; the server does that.
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class ServerUnreachable(Exception):
+    """The server could not be reached (connection refused or timed out)"""
+
+
+class DownloadCancelled(Exception):
+    """Raised by APIClient.download_report when the user cancels; the
+    partial file is kept so the next download resumes it"""
+
 
 class APIClient:
     """Client for Django REST API with JWT authentication"""
+
+    # How often a busy response is retried, and the longest wait honoured
+    # from a Retry-After header
+    max_busy_retries = 3
+    max_retry_after = 30.0
+
+    # (connect, read) timeouts in seconds: connecting fails fast when the
+    # server is down, reads allow for the server's work. Uploads and
+    # reports get a longer read timeout for inline analysis and rendering.
+    timeout = (3.05, 30)
+    long_timeout = (3.05, 300)
+
+    # Keep-alive pool per host; the GUI runs a few requests at once at most
+    pool_maxsize = 4
+    # Transport retries (connection errors for any method, read errors and
+    # 502/504 for idempotent methods only), with exponential backoff of
+    # retry_backoff * 2**n seconds plus up to retry_jitter seconds
+    max_transport_retries = 3
+    retry_backoff = 0.3
+    retry_jitter = 0.3
+
+    # Refresh the access token this many seconds before it expires (or at
+    # half its lifetime, if that is shorter)
+    refresh_margin = 60.0
+
+    # Report downloads: bytes per write, and how often a dropped connection
+    # is resumed with a Range request before giving up
+    download_chunk_size = 64 * 1024
+    max_download_resumes = 3
     
-    def __init__(self, base_url: str = "http://127.0.0.1:8000"):
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", cache: Optional[LocalCache] = None):
         self.base_url = base_url
+        # History and reports are kept here per account, see api/cache.py
+        self.cache = cache
+        self.username: Optional[str] = None
+        # True after a request failed to reach the server, until one succeeds
+        self.offline = False
         self.access_token: Optional[str] = None
         self.refresh_token: Optional[str] = None
-        self.session = requests.Session()
-        self.session.timeout = 30
+        self.session = self._build_session()
+        # One refresh at a time; callers that waited reuse its result
+        self._refresh_lock = threading.Lock()
+        self._refresh_timer: Optional[threading.Timer] = None
+        self.access_expires_at: Optional[float] = None
+        # Recent request timings, newest last; see _send
+        self.timings = deque(maxlen=100)
+        self.last_timing: Optional[Dict] = None
         
+    def _build_session(self) -> requests.Session:
+        """
+        Session with a pooled keep-alive adapter and transport retries.
+        requests already sends Accept-Encoding (gzip, deflate) and decodes
+        compressed responses.
+        """
+        retry = Retry(
+            total=self.max_transport_retries,
+            # 429 and 503 carry Retry-After and are handled by
+            # _request_when_admitted, not slept on again inside the transport
+            status_forcelist=(502, 504),
+            respect_retry_after_header=False,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            backoff_factor=self.retry_backoff,
+            backoff_jitter=self.retry_jitter,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
     def set_tokens(self, access: str, refresh: str):
         """Set authentication tokens and update session headers"""
-        self.access_token = access
         self.refresh_token = refresh
+        self._set_access_token(access)
+
+    def _set_access_token(self, access: str):
+        """Use a new access token and schedule its background refresh"""
+        self.access_token = access
+        self.access_expires_at = jwt_expiry(access)
         self.session.headers.update({
             'Authorization': f'Bearer {access}'
         })
+        self._schedule_refresh()
         
     def clear_tokens(self):
         """Clear authentication tokens"""
+        self._cancel_refresh()
         self.access_token = None
         self.refresh_token = None
+        self.access_expires_at = None
         if 'Authorization' in self.session.headers:
             del self.session.headers['Authorization']
+
+    def _refresh_delay(self) -> Optional[float]:
+        """Seconds until the access token should be refreshed, None if unknown"""
+        if self.access_expires_at is None:
+            return None
+        remaining = self.access_expires_at - time.time()
+        return max(remaining - min(self.refresh_margin, remaining / 2), 0.0)
+
+    def _schedule_refresh(self):
+        self._cancel_refresh()
+        delay = self._refresh_delay()
+        if delay is None or not self.refresh_token:
+            return
+        timer = threading.Timer(delay, self._background_refresh, args=(self.access_token,))
+        timer.daemon = True
+        self._refresh_timer = timer
+        timer.start()
+
+    def _cancel_refresh(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _background_refresh(self, stale_token: str):
+        try:
+            self._refresh_once(stale_token)
+        except Exception as e:
+            # The next request refreshes (or reports the expiry) itself
+            logger.warning("Background token refresh failed: %s", e)
+
+    def _refresh_once(self, stale_token: Optional[str]) -> str:
+        """
+        Refresh the access token unless another caller already replaced
+        `stale_token` while this one waited for the lock
+        """
+        with self._refresh_lock:
+            if self.access_token != stale_token and self.access_token:
+                return self.access_token
+            return self.refresh_access_token()
+
+    def _ensure_fresh_token(self):
+        """Refresh before sending if the token is due (e.g. the timer was late)"""
+        delay = self._refresh_delay()
+        if delay == 0.0 and self.refresh_token:
+            self._refresh_once(self.access_token)
         
     def login(self, username: str, password: str) -> Dict:
         """
@@ -46,14 +226,20 @@ class APIClient:
         """
         url = f"{self.base_url}/api/token/"
         try:
-            response = requests.post(url, json={
+            response = self._send('POST', url, json={
                 'username': username,
                 'password': password
-            }, timeout=10)
+            })
             response.raise_for_status()
             data = response.json()
             self.set_tokens(data['access'], data['refresh'])
+            self.username = username
+            self.offline = False
+            self._remember_credentials(password)
             return data
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.offline = True
+            raise ServerUnreachable(f"Login failed: cannot connect to server ({e.__class__.__name__})")
         except requests.exceptions.RequestException as e:
             if hasattr(e, 'response') and e.response is not None:
                 try:
@@ -64,6 +250,39 @@ class APIClient:
             else:
                 error_msg = str(e)
             raise Exception(f"Login failed: {error_msg}")
+
+    @property
+    def account(self) -> str:
+        """Cache key of the logged-in user on this server"""
+        return f"{self.username}@{self.base_url}"
+
+    def _remember_credentials(self, password: str):
+        """Keep a verifier of the password so offline logins can be checked"""
+        if self.cache is None:
+            return
+        try:
+            self.cache.store_credentials(self.account, password)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Could not store offline credentials: %s", e)
+
+    def start_offline(self, username: str, password: str) -> bool:
+        """
+        Work read-only from the cache as `username` while the server is
+        unreachable. False if nothing is cached for that user or `password`
+        does not match their last online login.
+        """
+        account = f"{username}@{self.base_url}"
+        if self.cache is None or not self.cache.has_account(account):
+            return False
+        if not self.cache.check_credentials(account, password):
+            return False
+        self.clear_tokens()
+        self.username = username
+        self.offline = True
+        return True
+
+    def _cache_active(self) -> bool:
+        return self.cache is not None and self.username is not None
         
     def refresh_access_token(self) -> str:
         """
@@ -80,26 +299,31 @@ class APIClient:
             
         url = f"{self.base_url}/api/token/refresh/"
         try:
-            response = requests.post(url, json={
+            response = self._send('POST', url, json={
                 'refresh': self.refresh_token
-            }, timeout=10)
+            })
             response.raise_for_status()
             data = response.json()
-            self.access_token = data['access']
-            self.session.headers.update({
-                'Authorization': f'Bearer {data["access"]}'
-            })
+            if 'refresh' in data:
+                # ROTATE_REFRESH_TOKENS on the server
+                self.refresh_token = data['refresh']
+            self._set_access_token(data['access'])
             return data['access']
         except requests.exceptions.RequestException:
             raise Exception("Token refresh failed")
         
-    def _request_with_retry(self, method: str, url: str, **kwargs):
+    def _request_with_retry(self, method: str, url: str, allow_status=(), cancel_event=None,
+                            cancelled=None, **kwargs):
         """
         Make HTTP request with automatic token refresh on 401
         
         Args:
             method: HTTP method (GET, POST, etc.)
             url: Request URL
+            allow_status: Error statuses returned to the caller instead of raised
+            cancel_event: Optional threading.Event that ends a wait for a
+                busy server early
+            cancelled: Exception class raised when it does
             **kwargs: Additional request parameters
             
         Returns:
@@ -109,26 +333,40 @@ class APIClient:
             Exception: If request fails
         """
         try:
-            response = self.session.request(method, url, **kwargs)
+            if self.refresh_token:
+                try:
+                    self._ensure_fresh_token()
+                except Exception:
+                    pass  # the request gets a 401 and the path below reports it
+            sent_with = self.access_token
+            response = self._request_when_admitted(method, url, cancel_event, cancelled, **kwargs)
             
             # Handle 401 Unauthorized - try to refresh token
             if response.status_code == 401 and self.refresh_token:
+                response.close()
                 try:
-                    self.refresh_access_token()
-                    # Retry original request with new token
-                    response = self.session.request(method, url, **kwargs)
+                    self._refresh_once(sent_with)
                 except Exception:
                     raise Exception("Authentication expired. Please login again.")
+                # Retry original request with new token
+                response = self._request_when_admitted(method, url, cancel_event, cancelled,
+                                                       **kwargs)
             
-            response.raise_for_status()
+            self.offline = False
+            if response.status_code not in allow_status:
+                response.raise_for_status()
             return response
             
         except requests.exceptions.Timeout:
-            raise Exception("Request timed out. Please check your connection.")
+            self.offline = True
+            raise ServerUnreachable("Request timed out. Please check your connection.")
         except requests.exceptions.ConnectionError:
-            raise Exception("Cannot connect to server. Is the backend running?")
+            self.offline = True
+            raise ServerUnreachable("Cannot connect to server. Is the backend running?")
         except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 401:
+            if e.response.status_code in BUSY_STATUS_CODES:
+                raise Exception("Server is busy. Please try again in a moment.")
+            elif e.response.status_code == 401:
                 raise Exception("Authentication failed. Please login again.")
             elif e.response.status_code == 400:
                 try:
@@ -141,63 +379,289 @@ class APIClient:
                 raise Exception(f"HTTP {e.response.status_code}: {str(e)}")
         except requests.exceptions.RequestException as e:
             raise Exception(f"Request failed: {str(e)}")
+
+    def _request_when_admitted(self, method: str, url: str, cancel_event=None, cancelled=None,
+                               **kwargs):
+        """
+        Send a request, waiting and retrying while the server answers 429
+        or 503 with a Retry-After header. Setting `cancel_event` ends the
+        wait at once with a `cancelled` exception.
+        """
+        for attempt in range(self.max_busy_retries + 1):
+            response = self._send(method, url, **kwargs)
+            if response.status_code not in BUSY_STATUS_CODES or attempt == self.max_busy_retries:
+                return response
+            delay = self._retry_after(response)
+            if delay is None:
+                return response
+            # Hand the connection back to the pool while waiting
+            response.close()
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise cancelled("Cancelled while waiting for the server")
+        return response
+
+    def _send(self, method: str, url: str, **kwargs):
+        """
+        Send one request and record where its time went: the server's own
+        phases (Server-Timing), the network (everything else until the body
+        is downloaded) and, once a caller decodes the body, the client.
+        """
+        request_id = uuid.uuid4().hex
+        # Every send (busy retry, 401 replay) reads the upload from the start
+        self._rewind_files(kwargs)
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.setdefault('X-Request-ID', request_id)
+        kwargs.setdefault('timeout', self.timeout)
+
+        start = time.perf_counter()
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        server_phases = parse_server_timing(response.headers.get('Server-Timing'))
+        server_ms = server_phases.pop('total', 0.0)
+        self.last_timing = {
+            'method': method,
+            'path': urlsplit(url).path,
+            'status': response.status_code,
+            'request_id': response.headers.get('X-Request-ID', headers['X-Request-ID']),
+            'total_ms': round(total_ms, 1),
+            'server_ms': server_ms,
+            'network_ms': round(max(total_ms - server_ms, 0.0), 1),
+            'client_ms': 0.0,
+            'server_phases': server_phases,
+        }
+        self.timings.append(self.last_timing)
+        logger.debug("%s %s -> %s in %.1f ms (server %.1f ms, network %.1f ms) [%s]",
+                     method, self.last_timing['path'], response.status_code, total_ms,
+                     server_ms, self.last_timing['network_ms'], self.last_timing['request_id'])
+        return response
+
+    def _decode_json(self, response):
+        """response.json(), counting the decode as client time"""
+        start = time.perf_counter()
+        data = response.json()
+        self.record_client_time(time.perf_counter() - start)
+        return data
+
+    def record_client_time(self, seconds: float):
+        """Add client-side processing time to the last request's timing"""
+        if self.last_timing is not None:
+            self.last_timing['client_ms'] = round(self.last_timing['client_ms'] + seconds * 1000, 1)
+
+    def _retry_after(self, response) -> Optional[float]:
+        """Seconds to wait from a Retry-After header (seconds form only)"""
+        value = response.headers.get('Retry-After')
+        try:
+            delay = float(value)
+        except (TypeError, ValueError):
+            return None
+        return min(max(delay, 0.0), self.max_retry_after)
+
+    @staticmethod
+    def _rewind_files(kwargs):
+        """Seek upload file objects (files= entries or a data= stream) back to the start"""
+        fileobjs = [value[1] if isinstance(value, tuple) else value
+                    for value in (kwargs.get('files') or {}).values()]
+        fileobjs.append(kwargs.get('data'))
+        for fileobj in fileobjs:
+            if hasattr(fileobj, 'seek'):
+                fileobj.seek(0)
             
-    def upload_csv(self, file_path: str) -> Dict:
+    def upload_csv(self, file_path: str, progress=None, cancel_event=None) -> Dict:
         """
-        Upload CSV file to backend
+        Upload CSV file to backend, streaming it from disk
         
         Args:
             file_path: Absolute path to CSV file
+            progress: Optional callback progress(bytes_sent, total_bytes)
+            cancel_event: Optional threading.Event that cancels the upload
             
         Returns:
-            Dict with dataset information including statistics
+            Dict with dataset information including statistics. Large
+            files come back with status "pending" and no statistics yet;
+            they appear in the history once analysed.
             
         Raises:
+            UploadCancelled: If cancel_event was set
             Exception: If upload fails
         """
         url = f"{self.base_url}/upload/"
         try:
-            with open(file_path, 'rb') as f:
-                files = {'file': (file_path.split('/')[-1], f, 'text/csv')}
-                response = self._request_with_retry('POST', url, files=files)
-                return response.json()
+            with MultipartFileStream(file_path, progress=progress, cancel_event=cancel_event) as body:
+                response = self._request_with_retry('POST', url, data=body,
+                                                     headers={'Content-Type': body.content_type},
+                                                     timeout=self.long_timeout,
+                                                     cancel_event=cancel_event,
+                                                     cancelled=UploadCancelled)
+                return self._decode_json(response)
         except FileNotFoundError:
             raise Exception(f"File not found: {file_path}")
         except PermissionError:
             raise Exception(f"Permission denied: {file_path}")
             
+    def cached_history(self) -> Optional[CachedHistory]:
+        """History from the local cache (no request), or None"""
+        if not self._cache_active():
+            return None
+        return self.cache.history(self.account)
+
     def get_history(self) -> List[Dict]:
         """
         Get upload history (last 5 datasets)
         
+        With a cache, the request carries the cached ETag and a 304 answer
+        returns the cached history without downloading it again.
+        
         Returns:
             List of dataset dictionaries
             
         Raises:
+            ServerUnreachable: If the server cannot be reached
             Exception: If request fails
         """
         url = f"{self.base_url}/history/"
-        response = self._request_with_retry('GET', url)
-        return response.json()
+        cached = self.cached_history()
+        headers = {}
+        if cached is not None and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        response = self._request_with_retry('GET', url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            self.cache.touch_history(self.account)
+            return cached.datasets
+        history = self._decode_json(response)
+        if self._cache_active():
+            self.cache.store_history(self.account, response.headers.get('ETag'), history)
+        return history
         
-    def download_report(self, dataset_id: int, save_path: str):
+    def download_report(self, dataset_id: int, save_path: str, progress=None, cancel_event=None):
         """
         Download PDF report for a dataset
         
+        The report is streamed to `save_path + '.part'` and renamed into
+        place once complete. A partial file left by a cancelled or dropped
+        download is resumed with a Range request (If-Range on its ETag, so
+        a report that changed meanwhile is downloaded afresh).
+        
+        With a cache, a report downloaded before is revalidated with its
+        ETag and copied from the cache on 304, or when the server cannot be
+        reached (or the session is offline).
+        
         Args:
             dataset_id: ID of the dataset
             save_path: Path where PDF should be saved
+            progress: Optional callback progress(bytes_received, total_bytes)
+            cancel_event: Optional threading.Event that cancels the download
             
         Raises:
+            DownloadCancelled: If cancel_event was set
+            ServerUnreachable: If the server cannot be reached and the
+                report is not cached
             Exception: If download fails
         """
         url = f"{self.base_url}/datasets/{dataset_id}/report.pdf"
-        response = self._request_with_retry('GET', url)
+        part_path = save_path + '.part'
+        etag_path = part_path + '.etag'
+        cached = self.cache.report(self.account, dataset_id) if self._cache_active() else None
         
         try:
-            with open(save_path, 'wb') as f:
-                f.write(response.content)
+            if cached is not None and self.access_token is None:
+                # Offline session: nothing to revalidate with
+                shutil.copyfile(cached.path, save_path)
+                return
+            for attempt in range(self.max_download_resumes + 1):
+                try:
+                    if self._download_part(url, part_path, etag_path, progress, cancel_event,
+                                           cached):
+                        break
+                except (requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.ConnectionError) as e:
+                    # Dropped mid-body; the next attempt resumes from the part file
+                    if attempt == self.max_download_resumes:
+                        raise Exception(f"Download interrupted: {e}")
+                    logger.info("Report download interrupted, resuming: %s", e)
+            else:
+                raise Exception("Download failed: the report kept changing")
+            os.replace(part_path, save_path)
+            etag = None
+            if os.path.exists(etag_path):
+                with open(etag_path) as f:
+                    etag = f.read().strip() or None
+                os.remove(etag_path)
+            if etag and self._cache_active() and (cached is None or cached.etag != etag):
+                self.cache.store_report(self.account, dataset_id, etag, save_path)
+        except ServerUnreachable:
+            if cached is None:
+                raise
+            logger.info("Server unreachable, using the cached report of dataset %s", dataset_id)
+            shutil.copyfile(cached.path, save_path)
         except PermissionError:
             raise Exception(f"Permission denied: {save_path}")
-        except Exception as e:
-            raise Exception(f"Failed to save file: {str(e)}")
\ No newline at end of file
+        except OSError as e:
+            raise Exception(f"Failed to save file: {str(e)}")
+
+    def _download_part(self, url, part_path, etag_path, progress, cancel_event,
+                       cached=None) -> bool:
+        """
+        Append the rest of the report to `part_path`; True once the part
+        file holds the whole report. A fresh download of a `cached` report
+        is conditional and copies the cached file on 304.
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        etag = None
+        if offset and os.path.exists(etag_path):
+            with open(etag_path) as f:
+                etag = f.read().strip() or None
+        # Byte offsets must refer to the file itself, not a compressed body
+        headers = {'Accept-Encoding': 'identity'}
+        if offset and etag:
+            headers.update({'Range': f'bytes={offset}-', 'If-Range': etag})
+        elif not offset and cached is not None:
+            headers['If-None-Match'] = cached.etag
+
+        response = self._request_with_retry('GET', url, headers=headers, stream=True,
+                                            timeout=self.long_timeout, allow_status=(416,),
+                                            cancel_event=cancel_event, cancelled=DownloadCancelled)
+        with response:
+            if response.status_code == 304:
+                shutil.copyfile(cached.path, part_path)
+                with open(etag_path, 'w') as f:
+                    f.write(cached.etag)
+                return True
+
+            if response.status_code == 416:
+                # Nothing left to fetch (or the range is stale): compare sizes
+                total = int(response.headers.get('Content-Range', '*/-1').rsplit('/', 1)[-1])
+                if total == offset:
+                    return True
+                os.remove(part_path)
+                return False
+
+            if response.status_code == 206:
+                total = int(response.headers['Content-Range'].rsplit('/', 1)[-1])
+                mode = 'ab'
+            else:
+                # Whole report: no part file, or the report changed since
+                offset = 0
+                total = int(response.headers.get('Content-Length', 0)) or None
+                mode = 'wb'
+                with open(etag_path, 'w') as f:
+                    f.write(response.headers.get('ETag', ''))
+
+            received = offset
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.download_chunk_size):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise DownloadCancelled("Download cancelled")
+                    f.write(chunk)
+                    received += len(chunk)
+                    if progress is not None:
+                        progress(received, total or received)
+                f.flush()
+                os.fsync(f.fileno())
+
+        if total is not None and received != total:
+            raise requests.exceptions.ChunkedEncodingError(
+                f"Received {received} of {total} bytes")
+        return True
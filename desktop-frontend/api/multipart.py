@@ -0,0 +1,102 @@
+"""
+Streaming multipart/form-data body for file uploads
+
+requests reads a file-like `data=` body in blocks as it sends, so the
+upload never holds more than one block of the file in memory. The stream
+reports progress on every read and stops the upload when its cancel event
+is set.
+"""
+import os
+import uuid
+from typing import Callable, Optional
+
+
+class UploadCancelled(Exception):
+    """Raised from the body stream when the user cancels an upload"""
+
+
+class MultipartFileStream:
+    """
+    multipart/form-data body with a single file field, read from disk in
+    chunks of at most `chunk_size` bytes
+
+    Args:
+        path: File to upload
+        field: Form field name
+        content_type: Content type of the file part
+        progress: Called as progress(bytes_sent, total_bytes) after each read
+        cancel_event: threading.Event; once set, the next read raises
+            UploadCancelled
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, field: str = 'file', content_type: str = 'text/csv',
+                 progress: Optional[Callable[[int, int], None]] = None, cancel_event=None):
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(path).replace('"', '%22')
+        self._head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+        self._file = open(path, 'rb')
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        self.len = len(self._head) + self._file_size + len(self._tail)
+        self._pos = 0
+        self.progress = progress
+        self.cancel_event = cancel_event
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self.len
+
+    def read(self, size: int = -1) -> bytes:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise UploadCancelled("Upload cancelled")
+        if size is None or size < 0 or size > self.chunk_size:
+            size = self.chunk_size
+
+        head_end = len(self._head)
+        file_end = head_end + self._file_size
+        if self._pos < head_end:
+            chunk = self._head[self._pos:self._pos + size]
+        elif self._pos < file_end:
+            chunk = self._file.read(min(size, file_end - self._pos))
+            if not chunk:
+                raise IOError(f"{self._file.name} shrank during the upload")
+        else:
+            offset = self._pos - file_end
+            chunk = self._tail[offset:offset + size]
+
+        self._pos += len(chunk)
+        if chunk and self.progress is not None:
+            self.progress(self._pos, self.len)
+        return chunk
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Position in the whole body; urllib3 and APIClient rewind with this"""
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.len
+        self._pos = min(max(offset, 0), self.len)
+        file_offset = min(max(self._pos - len(self._head), 0), self._file_size)
+        self._file.seek(file_offset)
+        return self._pos
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,110 @@
+"""
+Local preview of a CSV before (and while) it is uploaded
+
+preview_csv computes the same statistics as the server's analyze_csv
+(backend/api/utils.py) so the dashboard can show them while the upload is
+still running. The file is parsed in chunks and each chunk is aggregated
+with vectorized pandas operations, so memory stays bounded on large files.
+The server's result replaces the preview once it arrives.
+"""
+import os
+from typing import Callable, Dict, Optional
+
+NUMERIC_COLUMNS = ('Flowrate', 'Pressure', 'Temperature')
+
+
+class PreviewCancelled(Exception):
+    """Raised between chunks once the preview's cancel event is set"""
+
+
+def preview_csv(file_path: str, progress: Optional[Callable[[int, int], None]] = None,
+                cancel_event=None, chunk_rows: int = 200_000) -> Dict:
+    """
+    Summary statistics of a CSV file, in the shape of the server's result
+
+    Args:
+        file_path: CSV file to analyse
+        progress: Called as progress(bytes_read, total_bytes) after each chunk
+        cancel_event: threading.Event; once set, the next chunk raises
+            PreviewCancelled
+        chunk_rows: Rows parsed and aggregated at a time
+
+    Returns:
+        Dict with total_count, avg/min/max of Flowrate, Pressure and
+        Temperature (rounded to 2 places), type_distribution and the first
+        5 rows (NaN statistics for a column without values)
+
+    Raises:
+        PreviewCancelled: If cancel_event was set
+        ValueError: If a required column is missing or not numeric
+    """
+    # Imported here: pandas is only needed once a file is picked
+    import pandas as pd
+
+    total_bytes = os.path.getsize(file_path)
+    total_count = 0
+    sums = dict.fromkeys(NUMERIC_COLUMNS, 0.0)
+    counts = dict.fromkeys(NUMERIC_COLUMNS, 0)
+    minimums = {}
+    maximums = {}
+    type_counts = None
+    rows = None
+
+    with open(file_path, 'rb') as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_rows):
+            if cancel_event is not None and cancel_event.is_set():
+                raise PreviewCancelled("Preview cancelled")
+            missing = [column for column in ('Type',) + NUMERIC_COLUMNS if column not in chunk]
+            if missing:
+                raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+            if rows is None:
+                rows = chunk.head().to_dict(orient='records')
+            total_count += len(chunk)
+
+            numeric = chunk[list(NUMERIC_COLUMNS)]
+            for column in NUMERIC_COLUMNS:
+                if not pd.api.types.is_numeric_dtype(numeric[column]):
+                    raise ValueError(f"Column '{column}' is not numeric")
+            chunk_sums = numeric.sum()
+            chunk_counts = numeric.count()
+            chunk_min = numeric.min()
+            chunk_max = numeric.max()
+            for column in NUMERIC_COLUMNS:
+                sums[column] += chunk_sums[column]
+                counts[column] += int(chunk_counts[column])
+                if chunk_counts[column]:
+                    minimums[column] = min(minimums.get(column, chunk_min[column]), chunk_min[column])
+                    maximums[column] = max(maximums.get(column, chunk_max[column]), chunk_max[column])
+
+            chunk_types = chunk['Type'].value_counts()
+            type_counts = chunk_types if type_counts is None else type_counts.add(chunk_types, fill_value=0)
+
+            if progress is not None:
+                progress(min(f.tell(), total_bytes), total_bytes)
+
+    def mean(column):
+        # NaN for an all-empty column, like pandas' mean on the server
+        return round(sums[column] / counts[column], 2) if counts[column] else float('nan')
+
+    def rounded(values, column):
+        return round(float(values[column]), 2) if column in values else float('nan')
+
+    type_distribution = {}
+    if type_counts is not None:
+        type_distribution = {str(name): int(count) for name, count in
+                             type_counts.sort_values(ascending=False, kind='stable').items()}
+    return {
+        "total_count": total_count,
+        "avg_flowrate": mean('Flowrate'),
+        "avg_pressure": mean('Pressure'),
+        "avg_temperature": mean('Temperature'),
+        "type_distribution": type_distribution,
+        "min_flowrate": rounded(minimums, 'Flowrate'),
+        "min_pressure": rounded(minimums, 'Pressure'),
+        "min_temperature": rounded(minimums, 'Temperature'),
+        "max_flowrate": rounded(maximums, 'Flowrate'),
+        "max_pressure": rounded(maximums, 'Pressure'),
+        "max_temperature": rounded(maximums, 'Temperature'),
+        "rows": rows or [],
+    }
@@ -1,52 +1,75 @@
 """
 Chart widgets using Matplotlib for data visualization
+
+Matplotlib is imported when a chart first has data to draw (or by
+preload_matplotlib in the background once the dashboard is up), not at
+startup; the empty state is a plain label.
 """
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QSizePolicy
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from PyQt5.QtWidgets import QVBoxLayout, QGroupBox, QSizePolicy, QLabel
+from PyQt5.QtCore import Qt
 
-class TypePieChart(QGroupBox):
-    """Pie chart widget for equipment type distribution"""
-    
-    def __init__(self):
-        super().__init__("Type Distribution")
+NO_DATA_TEXT = 'No data available\n\nUpload a CSV file to see visualization'
+
+
+def preload_matplotlib():
+    """Import the matplotlib modules the charts need (also builds the font cache)"""
+    import matplotlib.figure  # noqa: F401
+    import matplotlib.backends.backend_agg  # noqa: F401
+
+
+class ChartBox(QGroupBox):
+    """Group box showing a 'no data' label until there is a chart to draw"""
+
+    def __init__(self, title):
+        super().__init__(title)
+        self.figure = None
+        self.canvas = None
+        self.ax = None
         self.init_ui()
-        
+
     def init_ui(self):
         """Initialize the user interface"""
-        layout = QVBoxLayout()
-        
-        # Create matplotlib figure and canvas
-        self.figure = Figure(figsize=(5, 4), dpi=100)
-        self.canvas = FigureCanvas(self.figure)
-        self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.ax = self.figure.add_subplot(111)
-        
-        # Initial empty state
-        self.show_no_data()
-        
-        layout.addWidget(self.canvas)
-        self.setLayout(layout)
-        
+        self.chart_layout = QVBoxLayout()
+
+        self.placeholder = QLabel(NO_DATA_TEXT)
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        self.placeholder.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.placeholder.setStyleSheet("""
+            QLabel {
+                color: #6c757d;
+                font-size: 12px;
+                background-color: #ffffff;
+            }
+        """)
+        self.chart_layout.addWidget(self.placeholder)
+        self.setLayout(self.chart_layout)
+
+    def ensure_canvas(self):
+        """Create the matplotlib figure and canvas on first use and show them"""
+        if self.canvas is None:
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+            from matplotlib.figure import Figure
+
+            self.figure = Figure(figsize=(5, 4), dpi=100)
+            self.canvas = FigureCanvas(self.figure)
+            self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+            self.ax = self.figure.add_subplot(111)
+            self.chart_layout.addWidget(self.canvas)
+        self.placeholder.hide()
+        self.canvas.show()
+
     def show_no_data(self):
         """Display 'No data available' message"""
-        self.ax.clear()
-        self.ax.text(0.5, 0.5, 'No data available\n\nUpload a CSV file to see visualization', 
-                    ha='center', va='center', 
-                    transform=self.ax.transAxes,
-                    fontsize=12, color='#6c757d',
-                    bbox=dict(boxstyle='round,pad=1', facecolor='#f8f9fa', edgecolor='#e9ecef', linewidth=2))
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
-        self.ax.spines['bottom'].set_visible(False)
-        self.ax.spines['left'].set_visible(False)
-        self.ax.set_facecolor('#ffffff')
-        self.figure.patch.set_facecolor('#ffffff')
-        self.figure.tight_layout()
-        self.canvas.draw()
+        if self.canvas is not None:
+            self.canvas.hide()
+        self.placeholder.show()
+
+
+class TypePieChart(ChartBox):
+    """Pie chart widget for equipment type distribution"""
+    
+    def __init__(self):
+        super().__init__("Type Distribution")
         
     def update_chart(self, type_distribution):
         """
@@ -55,12 +78,13 @@ class TypePieChart(QGroupBox):
         Args:
             type_distribution: Dict mapping equipment types to counts
         """
-        self.ax.clear()
-        
         if not type_distribution or len(type_distribution) == 0:
             self.show_no_data()
             return
         
+        self.ensure_canvas()
+        self.ax.clear()
+        
         # Prepare data
         labels = list(type_distribution.keys())
         sizes = list(type_distribution.values())
@@ -98,47 +122,11 @@ class TypePieChart(QGroupBox):
         self.canvas.draw()
 
 
-class FlowrateChart(QGroupBox):
+class FlowrateChart(ChartBox):
     """Line chart widget for flowrate data visualization"""
     
     def __init__(self):
         super().__init__("Flowrate Data (Sample)")
-        self.init_ui()
-        
-    def init_ui(self):
-        """Initialize the user interface"""
-        layout = QVBoxLayout()
-        
-        # Create matplotlib figure and canvas
-        self.figure = Figure(figsize=(5, 4), dpi=100)
-        self.canvas = FigureCanvas(self.figure)
-        self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.ax = self.figure.add_subplot(111)
-        
-        # Initial empty state
-        self.show_no_data()
-        
-        layout.addWidget(self.canvas)
-        self.setLayout(layout)
-        
-    def show_no_data(self):
-        """Display 'No data available' message"""
-        self.ax.clear()
-        self.ax.text(0.5, 0.5, 'No data available\n\nUpload a CSV file to see visualization', 
-                    ha='center', va='center', 
-                    transform=self.ax.transAxes,
-                    fontsize=12, color='#6c757d',
-                    bbox=dict(boxstyle='round,pad=1', facecolor='#f8f9fa', edgecolor='#e9ecef', linewidth=2))
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
-        self.ax.spines['bottom'].set_visible(False)
-        self.ax.spines['left'].set_visible(False)
-        self.ax.set_facecolor('#ffffff')
-        self.figure.patch.set_facecolor('#ffffff')
-        self.figure.tight_layout()
-        self.canvas.draw()
         
     def update_chart(self, rows):
         """
@@ -147,12 +135,13 @@ class FlowrateChart(QGroupBox):
         Args:
             rows: List of equipment data dictionaries
         """
-        self.ax.clear()
-        
         if not rows or len(rows) == 0:
             self.show_no_data()
             return
         
+        self.ensure_canvas()
+        self.ax.clear()
+        
         # Extract equipment names and flowrates
         equipment_names = []
         flowrates = []
@@ -5,7 +5,8 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QLineEdit, QPushButton, QMessageBox, QFrame)
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont, QIcon
-from api.client import APIClient
+from api.client import APIClient, ServerUnreachable
+from gui.tasks import TaskRunner
 
 class LoginDialog(QDialog):
     """Modal dialog for user login"""
@@ -14,6 +15,7 @@ class LoginDialog(QDialog):
         super().__init__(parent)
         self.api_client = api_client
         self.authenticated = False
+        self.tasks = TaskRunner(self)
         self.init_ui()
         
     def init_ui(self):
@@ -178,29 +180,47 @@ class LoginDialog(QDialog):
             self.show_error("Please enter both username and password")
             return
         
-        # Disable UI during login
+        # Disable UI during login (Cancel stays available)
         self.login_button.setEnabled(False)
         self.login_button.setText("Logging in...")
         self.username_input.setEnabled(False)
         self.password_input.setEnabled(False)
-        self.cancel_button.setEnabled(False)
         self.error_label.hide()
         
-        # Attempt login
-        try:
-            self.api_client.login(username, password)
-            self.authenticated = True
-            self.accept()
-        except Exception as e:
-            self.show_error(str(e))
-            # Re-enable UI
-            self.login_button.setEnabled(True)
-            self.login_button.setText("Login")
-            self.username_input.setEnabled(True)
-            self.password_input.setEnabled(True)
-            self.cancel_button.setEnabled(True)
-            self.password_input.clear()
-            self.password_input.setFocus()
+        # Attempt login in the background
+        def login(task):
+            try:
+                return self.api_client.login(username, password)
+            except ServerUnreachable:
+                # Read-only from the cache of an earlier session, if any;
+                # the password must match the last online login
+                if self.api_client.start_offline(username, password):
+                    return None
+                raise
+
+        self.tasks.run('login', login,
+                       on_result=self.on_login_success, on_error=self.on_login_error)
+
+    def on_login_success(self, data):
+        """Handle successful login"""
+        self.authenticated = True
+        self.accept()
+
+    def on_login_error(self, error_msg):
+        """Handle failed login"""
+        self.show_error(error_msg)
+        # Re-enable UI
+        self.login_button.setEnabled(True)
+        self.login_button.setText("Login")
+        self.username_input.setEnabled(True)
+        self.password_input.setEnabled(True)
+        self.password_input.clear()
+        self.password_input.setFocus()
+
+    def reject(self):
+        """Close the dialog, ignoring a login still in flight"""
+        self.tasks.cancel('login')
+        super().reject()
             
     def show_error(self, message: str):
         """Show error message"""
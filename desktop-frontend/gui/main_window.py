@@ -5,44 +5,49 @@ Complete version combining all functionality
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QFileDialog, QMessageBox, QLabel,
                              QTableWidget, QTableWidgetItem, QSplitter, QGroupBox,
-                             QListWidget, QListWidgetItem, QHeaderView, QDialog)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                             QListWidget, QListWidgetItem, QHeaderView, QProgressBar)
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 from api.client import APIClient
-from gui.login_dialog import LoginDialog
-from gui.chart_widgets import TypePieChart, FlowrateChart
+from api.preview import preview_csv
+from gui.chart_widgets import TypePieChart, FlowrateChart, preload_matplotlib
+from gui.tasks import TaskRunner
 import os
 import subprocess
 import platform
-
-class UploadThread(QThread):
-    """Background thread for CSV file upload"""
-    finished = pyqtSignal(dict)
-    error = pyqtSignal(str)
-    
-    def __init__(self, api_client, file_path):
-        super().__init__()
-        self.api_client = api_client
-        self.file_path = file_path
-        
-    def run(self):
-        """Execute upload in background"""
-        try:
-            result = self.api_client.upload_csv(self.file_path)
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
+import time
 
 
 class MainWindow(QMainWindow):
     """Main application window with dashboard"""
     
-    def __init__(self):
+    def __init__(self, api_client=None):
         super().__init__()
-        self.api_client = APIClient()
+        # main.py logs in before building the window and passes the client in
+        self.api_client = api_client or APIClient()
         self.current_dataset = None
+        # Server unreachable: the window shows cached data only
+        self.offline = False
+        # When the shown history was fetched from the server (time.time())
+        self.history_fetched_at = None
+        # Local preview of an uploaded file: wanted until the server's
+        # statistics are shown ('uploading', 'analysing on server' or None),
+        # and whether the dashboard currently shows it
+        self.preview_stage = None
+        self.showing_preview = False
+        # All API calls run through this; see gui/tasks.py
+        self.tasks = TaskRunner(self)
         self.init_ui()
-        self.show_login()
+
+    def start_background_loading(self):
+        """Fetch history and import matplotlib once the window is on screen"""
+        self.load_history()
+        self.tasks.run('preload-matplotlib', lambda task: preload_matplotlib())
+
+    def closeEvent(self, event):
+        """Stop running transfers; a cancelled download resumes next time"""
+        self.tasks.cancel_all()
+        super().closeEvent(event)
         
     def init_ui(self):
         """Initialize the user interface"""
@@ -110,6 +115,11 @@ class MainWindow(QMainWindow):
                 font-weight: 500;
             }
         """)
+        # Shown while the server is unreachable and the cache is displayed
+        self.offline_label = QLabel("⚠ Offline (read-only)")
+        self.offline_label.setStyleSheet("color: white; font-weight: bold; padding: 0 8px;")
+        self.offline_label.hide()
+        self.statusBar().addPermanentWidget(self.offline_label)
         
     def create_header(self):
         """Create header with title and upload button"""
@@ -159,6 +169,33 @@ class MainWindow(QMainWindow):
             }
         """)
         layout.addWidget(self.upload_button)
+
+        # Upload progress and cancel, shown while an upload runs
+        self.upload_progress = QProgressBar()
+        self.upload_progress.setRange(0, 1000)
+        self.upload_progress.setTextVisible(False)
+        self.upload_progress.setFixedWidth(200)
+        self.upload_progress.hide()
+        layout.addWidget(self.upload_progress)
+
+        self.cancel_upload_button = QPushButton("✖ Cancel")
+        self.cancel_upload_button.clicked.connect(self.cancel_upload)
+        self.cancel_upload_button.setStyleSheet("""
+            QPushButton {
+                background: rgba(255, 255, 255, 0.2);
+                color: white;
+                padding: 12px 18px;
+                font-size: 14px;
+                font-weight: bold;
+                border: 1px solid white;
+                border-radius: 6px;
+            }
+            QPushButton:hover {
+                background: rgba(255, 255, 255, 0.35);
+            }
+        """)
+        self.cancel_upload_button.hide()
+        layout.addWidget(self.cancel_upload_button)
         
         return header
         
@@ -328,6 +365,21 @@ class MainWindow(QMainWindow):
             }
         """)
         actions_layout.addWidget(self.download_button)
+
+        # Download progress and cancel, shown while a report downloads
+        download_progress_layout = QHBoxLayout()
+        self.download_progress = QProgressBar()
+        self.download_progress.setRange(0, 1000)
+        self.download_progress.setTextVisible(False)
+        self.download_progress.hide()
+        download_progress_layout.addWidget(self.download_progress)
+
+        self.cancel_download_button = QPushButton("✖")
+        self.cancel_download_button.setToolTip("Cancel download (it resumes next time)")
+        self.cancel_download_button.clicked.connect(self.cancel_download)
+        self.cancel_download_button.hide()
+        download_progress_layout.addWidget(self.cancel_download_button)
+        actions_layout.addLayout(download_progress_layout)
         
         actions_group.setLayout(actions_layout)
         layout.addWidget(actions_group)
@@ -392,17 +444,6 @@ class MainWindow(QMainWindow):
         
         return panel
         
-    def show_login(self):
-        """Show login dialog"""
-        dialog = LoginDialog(self.api_client, self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.statusBar().showMessage("✓ Logged in successfully")
-            self.load_history()
-        else:
-            QMessageBox.warning(self, "Login Required", 
-                              "You must login to use this application.")
-            self.close()
-            
     def upload_file(self):
         """Handle file upload"""
         file_path, _ = QFileDialog.getOpenFileName(
@@ -411,19 +452,102 @@ class MainWindow(QMainWindow):
         if file_path:
             self.upload_button.setEnabled(False)
             self.upload_button.setText("⏳ Uploading...")
+            self.upload_progress.setValue(0)
+            self.upload_progress.show()
+            self.cancel_upload_button.setEnabled(True)
+            self.cancel_upload_button.show()
             self.statusBar().showMessage("Uploading file...")
             
-            # Upload in background thread
-            self.upload_thread = UploadThread(self.api_client, file_path)
-            self.upload_thread.finished.connect(self.on_upload_success)
-            self.upload_thread.error.connect(self.on_upload_error)
-            self.upload_thread.start()
+            # Upload in background
+            self.tasks.run(
+                'upload',
+                lambda task: self.api_client.upload_csv(
+                    file_path, progress=task.report_progress, cancel_event=task.cancel_token),
+                on_result=self.on_upload_success, on_error=self.on_upload_error,
+                on_progress=self.on_upload_progress, on_cancelled=self.on_upload_cancelled)
+            # Meanwhile analyse the file locally so a wrong file shows at once
+            self.preview_stage = 'uploading'
+            self.tasks.run('preview', lambda task: preview_csv(file_path, cancel_event=task.cancel_token),
+                           on_result=self.on_preview_ready, on_error=self.on_preview_error)
+
+    def on_preview_ready(self, preview):
+        """Show the local statistics until the server's arrive"""
+        if self.preview_stage is None:
+            # Server results are shown already, or the upload failed
+            return
+        self.update_dashboard(preview, preview=True)
+        self.statusBar().showMessage(
+            f"Preview of {preview['total_count']} records shown; {self.preview_stage}...", 5000)
+
+    def on_preview_error(self, error_msg):
+        """The server reports its own error; just note the preview failed"""
+        if self.preview_stage is not None:
+            self.statusBar().showMessage(f"No local preview: {error_msg}", 5000)
+
+    def _discard_preview(self):
+        """Stop the local preview and put back the dataset shown before it"""
+        self.preview_stage = None
+        self.tasks.cancel('preview')
+        if self.showing_preview:
+            if self.current_dataset is not None:
+                self.update_dashboard(self.current_dataset)
+            else:
+                self._set_preview_title(False)
+                for card in (self.total_label, self.avg_flow_label,
+                             self.avg_pressure_label, self.avg_temp_label):
+                    self.update_stat_card(card, "--")
+                self.type_chart.show_no_data()
+                self.flowrate_chart.show_no_data()
+                self.table.setRowCount(0)
+
+    def on_upload_progress(self, sent, total):
+        """Show upload progress"""
+        self.upload_progress.setValue(int(sent * 1000 / total) if total else 0)
+        if sent < total:
+            self.statusBar().showMessage(
+                f"Uploading file... {sent * 100 // total}% ({sent / 1e6:.1f} of {total / 1e6:.1f} MB)")
+        else:
+            # Too late to cancel: the server has the whole file
+            self.cancel_upload_button.setEnabled(False)
+            self.statusBar().showMessage("Upload sent, waiting for the server to analyse it...")
+
+    def cancel_upload(self):
+        """Cancel the running upload"""
+        self.cancel_upload_button.setEnabled(False)
+        self.statusBar().showMessage("Cancelling upload...")
+        self.tasks.cancel('upload')
+
+    def on_upload_cancelled(self):
+        """Handle a cancelled upload"""
+        self._reset_upload_controls()
+        self._discard_preview()
+        self.statusBar().showMessage("Upload cancelled", 5000)
+
+    def _reset_upload_controls(self):
+        self.upload_button.setEnabled(not self.offline)
+        self.upload_button.setText("📁 Upload CSV")
+        self.upload_progress.hide()
+        self.cancel_upload_button.hide()
             
     def on_upload_success(self, dataset):
         """Handle successful upload"""
-        self.upload_button.setEnabled(True)
-        self.upload_button.setText("📁 Upload CSV")
+        self._reset_upload_controls()
         self.statusBar().showMessage("✓ Upload successful!", 5000)
+        if dataset.get('status') == 'pending':
+            # Large file: the server analyses it in the background; the
+            # local preview stays until a dataset is picked
+            self.preview_stage = 'analysing on server'
+            if self.showing_preview:
+                self._set_preview_title(True)
+            self.load_history()
+            QMessageBox.information(self, "Upload Received",
+                                  "CSV file uploaded successfully!\n\n"
+                                  "The file is large and is being analysed on the server. "
+                                  "Refresh the history to see the results.")
+            return
+        # The server's statistics replace the preview
+        self.preview_stage = None
+        self.tasks.cancel('preview')
         self.current_dataset = dataset
         self.update_dashboard(dataset)
         self.load_history()
@@ -434,14 +558,18 @@ class MainWindow(QMainWindow):
         
     def on_upload_error(self, error_msg):
         """Handle upload error"""
-        self.upload_button.setEnabled(True)
-        self.upload_button.setText("📁 Upload CSV")
+        self._reset_upload_controls()
+        self._discard_preview()
         self.statusBar().showMessage("✗ Upload failed", 5000)
         QMessageBox.critical(self, "Upload Error", 
                            f"Failed to upload file:\n\n{error_msg}")
         
-    def update_dashboard(self, dataset):
-        """Update dashboard with dataset information"""
+    def update_dashboard(self, dataset, preview=False):
+        """
+        Update dashboard with dataset information; `preview` marks local
+        statistics of a file still being uploaded (no report yet)
+        """
+        self._set_preview_title(preview)
         # Update summary cards
         self.update_stat_card(self.total_label, dataset.get('total_count', 0))
         self.update_stat_card(self.avg_flow_label, f"{dataset.get('avg_flowrate', 0):.2f}")
@@ -482,38 +610,109 @@ class MainWindow(QMainWindow):
             temp_item.setTextAlignment(Qt.AlignCenter)
             self.table.setItem(i, 4, temp_item)
         
-        # Enable download button
-        self.download_button.setEnabled(True)
+        # Enable download button (one download at a time)
+        self.download_button.setEnabled(not preview and not self.tasks.is_running('download'))
+
+    def _set_preview_title(self, preview):
+        self.showing_preview = preview
+        self.summary_widget.setTitle(f"Summary Statistics (local preview, {self.preview_stage}...)"
+                                     if preview else "Summary Statistics")
         
     def load_history(self):
-        """Load upload history"""
-        try:
-            history = self.api_client.get_history()
-            self.history_list.clear()
-            
-            for dataset in history:
-                # Format item text
-                date_str = dataset['uploaded_at'][:16].replace('T', ' ')
-                item_text = f"📊 Dataset #{dataset['id']}\n"
-                item_text += f"📅 {date_str}\n"
+        """
+        Load upload history in the background, showing the cached history
+        first (stale-while-revalidate)
+        """
+        cached = None
+        if not self.history_list.count():
+            cached = self.api_client.cached_history()
+            if cached is not None:
+                self._fill_history_list(cached.datasets)
+                self.history_fetched_at = cached.fetched_at
+        if self.api_client.access_token is None:
+            # Logged in offline: the cache is all there is until the next login
+            self.set_offline(True)
+            self.statusBar().showMessage(
+                f"Offline: showing history cached {self._cached_at()}; log in again to refresh")
+            return
+        # Coalesced: a refresh while one runs is queued to run once afterwards
+        self.statusBar().showMessage(
+            f"Showing history cached {self._cached_at()}, refreshing..." if cached is not None
+            else "Loading history...")
+        self.tasks.run('history', lambda task: self.api_client.get_history(),
+                       on_result=self.on_history_loaded, on_error=self.on_history_error)
+
+    def on_history_loaded(self, history):
+        """Fill the history list"""
+        started = time.perf_counter()
+        self.set_offline(False)
+        self._fill_history_list(history)
+        self.history_fetched_at = time.time()
+        self.api_client.record_client_time(time.perf_counter() - started)
+        self.statusBar().showMessage(
+            f"✓ Loaded {len(history)} datasets from history {self._timing_summary()}", 3000)
+
+    def _fill_history_list(self, history):
+        self.history_list.clear()
+
+        for dataset in history:
+            # Format item text
+            date_str = dataset['uploaded_at'][:16].replace('T', ' ')
+            item_text = f"📊 Dataset #{dataset['id']}\n"
+            item_text += f"📅 {date_str}\n"
+            if dataset.get('status', 'ready') != 'ready':
+                item_text += f"⏳ Analysis {dataset['status']}"
+            else:
                 item_text += f"📈 Count: {dataset['total_count']}, "
                 item_text += f"Flow: {dataset['avg_flowrate']:.2f}"
-                
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, dataset)
-                self.history_list.addItem(item)
-                
-            if len(history) > 0:
-                self.statusBar().showMessage(f"✓ Loaded {len(history)} datasets from history", 3000)
-            
-        except Exception as e:
-            self.statusBar().showMessage(f"✗ Failed to load history: {str(e)}", 5000)
-            QMessageBox.warning(self, "History Error", 
-                              f"Could not load history:\n{str(e)}")
-            
+
+            item = QListWidgetItem(item_text)
+            item.setData(Qt.UserRole, dataset)
+            self.history_list.addItem(item)
+
+    def on_history_error(self, error_msg):
+        """Handle history error"""
+        if self.api_client.offline:
+            self.set_offline(True)
+            if self.history_list.count():
+                # Keep showing the cached history; the next refresh retries
+                self.statusBar().showMessage(
+                    f"Offline: showing history cached {self._cached_at()} ({error_msg})")
+                return
+        self.statusBar().showMessage(f"✗ Failed to load history: {error_msg}", 5000)
+        QMessageBox.warning(self, "History Error",
+                          f"Could not load history:\n{error_msg}")
+
+    def set_offline(self, offline):
+        """Read-only while offline: cached history and reports only"""
+        self.offline = offline
+        self.offline_label.setVisible(offline)
+        self.upload_button.setEnabled(not offline and not self.tasks.is_running('upload'))
+        self.upload_button.setToolTip("Uploading needs a connection to the server" if offline else "")
+
+    def _cached_at(self):
+        """'at HH:MM' for the shown history, or '' without one"""
+        if self.history_fetched_at is None:
+            return ""
+        return f"at {time.strftime('%H:%M', time.localtime(self.history_fetched_at))}"
+
+    def _timing_summary(self):
+        """'(server X ms, network Y ms, client Z ms)' for the last request"""
+        timing = self.api_client.last_timing
+        if not timing:
+            return ""
+        return (f"(server {timing['server_ms']:.0f} ms, network {timing['network_ms']:.0f} ms, "
+                f"client {timing['client_ms']:.0f} ms)")
+
     def load_dataset_from_history(self, item):
         """Load dataset from history"""
         dataset = item.data(Qt.UserRole)
+        if dataset.get('status', 'ready') != 'ready':
+            self.statusBar().showMessage(
+                f"Dataset #{dataset['id']} is not analysed yet ({dataset['status']})", 3000)
+            return
+        self.preview_stage = None
+        self.tasks.cancel('preview')
         self.current_dataset = dataset
         self.update_dashboard(dataset)
         self.statusBar().showMessage(f"✓ Loaded dataset #{dataset['id']}", 3000)
@@ -532,27 +731,70 @@ class MainWindow(QMainWindow):
             "PDF Files (*.pdf);;All Files (*)")
             
         if save_path:
-            try:
-                self.statusBar().showMessage("Downloading report...")
-                self.api_client.download_report(self.current_dataset['id'], save_path)
-                self.statusBar().showMessage("✓ Report downloaded successfully!", 5000)
-                
-                # Show success message with option to open
-                reply = QMessageBox.question(
-                    self, "Success", 
-                    f"Report downloaded successfully!\n\n{save_path}\n\nOpen file location?",
-                    QMessageBox.Yes | QMessageBox.No)
-                
-                if reply == QMessageBox.Yes:
-                    # Open file location based on OS
-                    if platform.system() == 'Windows':
-                        subprocess.Popen(f'explorer /select,"{save_path}"')
-                    elif platform.system() == 'Darwin':  # macOS
-                        subprocess.Popen(['open', '-R', save_path])
-                    else:  # Linux
-                        subprocess.Popen(['xdg-open', os.path.dirname(save_path)])
-                        
-            except Exception as e:
-                self.statusBar().showMessage("✗ Download failed", 5000)
-                QMessageBox.critical(self, "Download Error", 
-                                   f"Failed to download report:\n\n{str(e)}")
\ No newline at end of file
+            self.download_button.setEnabled(False)
+            self.download_progress.setValue(0)
+            self.download_progress.show()
+            self.cancel_download_button.setEnabled(True)
+            self.cancel_download_button.show()
+            self.statusBar().showMessage("Downloading report...")
+
+            # Download in background
+            dataset_id = self.current_dataset['id']
+
+            def download(task):
+                self.api_client.download_report(dataset_id, save_path, progress=task.report_progress,
+                                                cancel_event=task.cancel_token)
+                return save_path
+
+            self.tasks.run('download', download,
+                           on_result=self.on_download_success, on_error=self.on_download_error,
+                           on_progress=self.on_download_progress,
+                           on_cancelled=self.on_download_cancelled)
+
+    def on_download_progress(self, received, total):
+        """Show download progress"""
+        self.download_progress.setValue(int(received * 1000 / total) if total else 0)
+        self.statusBar().showMessage(
+            f"Downloading report... {received / 1e6:.1f} of {total / 1e6:.1f} MB")
+
+    def cancel_download(self):
+        """Cancel the running download"""
+        self.cancel_download_button.setEnabled(False)
+        self.tasks.cancel('download')
+
+    def _reset_download_controls(self):
+        self.download_button.setEnabled(self.current_dataset is not None and not self.showing_preview)
+        self.download_progress.hide()
+        self.cancel_download_button.hide()
+
+    def on_download_cancelled(self):
+        """Handle a cancelled download"""
+        self._reset_download_controls()
+        self.statusBar().showMessage("Download cancelled; downloading again resumes it", 5000)
+
+    def on_download_error(self, error_msg):
+        """Handle download error"""
+        self._reset_download_controls()
+        self.statusBar().showMessage("✗ Download failed", 5000)
+        QMessageBox.critical(self, "Download Error", 
+                           f"Failed to download report:\n\n{error_msg}")
+
+    def on_download_success(self, save_path):
+        """Handle finished download"""
+        self._reset_download_controls()
+        self.statusBar().showMessage("✓ Report downloaded successfully!", 5000)
+        
+        # Show success message with option to open
+        reply = QMessageBox.question(
+            self, "Success", 
+            f"Report downloaded successfully!\n\n{save_path}\n\nOpen file location?",
+            QMessageBox.Yes | QMessageBox.No)
+        
+        if reply == QMessageBox.Yes:
+            # Open file location based on OS
+            if platform.system() == 'Windows':
+                subprocess.Popen(f'explorer /select,"{save_path}"')
+            elif platform.system() == 'Darwin':  # macOS
+                subprocess.Popen(['open', '-R', save_path])
+            else:  # Linux
+                subprocess.Popen(['xdg-open', os.path.dirname(save_path)])
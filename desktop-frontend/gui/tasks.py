@@ -0,0 +1,143 @@
+"""
+Task runner for network calls and other slow work off the GUI thread
+
+    self.tasks = TaskRunner(self)
+    self.tasks.run('history', lambda task: self.api_client.get_history(),
+                   on_result=self.on_history_loaded, on_error=self.on_history_error)
+
+Functions run on QThreadPool.globalInstance() and receive their Task:
+`task.cancel_token` is passed to APIClient as cancel_event and
+`task.report_progress` as progress. Callbacks run on the GUI thread.
+
+Tasks with the same key are coalesced: while one runs, a new submission is
+queued to run after it, replacing any submission already queued, so
+repeated refreshes cost at most one extra request.
+"""
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class CancelToken(threading.Event):
+    """Set once the task is cancelled; APIClient checks it between chunks"""
+
+    def cancel(self):
+        self.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.is_set()
+
+
+class TaskSignals(QObject):
+    """Signals of one task, delivered on the GUI thread"""
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    # done, total (64-bit: transfers can be larger than 2 GB)
+    progress = pyqtSignal('qint64', 'qint64')
+    cancelled = pyqtSignal()
+    # Always emitted last, after result/error/cancelled
+    done = pyqtSignal()
+
+
+class Task(QRunnable):
+    """QRunnable calling fn(task) and reporting the outcome through signals"""
+
+    # Emit progress at most this often; transfers report every chunk
+    progress_interval = 0.1
+
+    def __init__(self, key, fn):
+        super().__init__()
+        # Owned by Python (TaskRunner holds it until done), not the pool
+        self.setAutoDelete(False)
+        self.key = key
+        self.fn = fn
+        self.cancel_token = CancelToken()
+        # Created on the calling (GUI) thread, so emits from the pool are queued to it
+        self.signals = TaskSignals()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def report_progress(self, done, total):
+        now = time.monotonic()
+        if done == total or now - self._last_progress >= self.progress_interval:
+            self._last_progress = now
+            self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            result = self.fn(self)
+        except Exception as e:
+            # Cancelled transfers raise; either way the caller asked to stop
+            if self.cancel_token.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.error.emit(str(e))
+        else:
+            if self.cancel_token.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.done.emit()
+
+
+class TaskRunner(QObject):
+    """Runs Tasks on the global thread pool, at most one per key at a time"""
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._running = {}
+        # key -> (fn, callbacks) waiting for the running task of that key
+        self._queued = {}
+
+    def run(self, key, fn, on_result=None, on_error=None, on_progress=None,
+            on_cancelled=None, on_done=None):
+        """
+        Run fn(task) in the pool and return the Task, or None if it was
+        queued behind a running task with the same key
+        """
+        callbacks = (on_result, on_error, on_progress, on_cancelled, on_done)
+        if key in self._running:
+            self._queued[key] = (fn, callbacks)
+            return None
+        return self._start(key, fn, callbacks)
+
+    def _start(self, key, fn, callbacks):
+        on_result, on_error, on_progress, on_cancelled, on_done = callbacks
+        task = Task(key, fn)
+        for signal, slot in ((task.signals.result, on_result), (task.signals.error, on_error),
+                             (task.signals.progress, on_progress),
+                             (task.signals.cancelled, on_cancelled), (task.signals.done, on_done)):
+            if slot is not None:
+                signal.connect(slot)
+        task.signals.done.connect(lambda: self._finished(task))
+        # Keep the Python objects alive until the task is done
+        self._running[key] = task
+        self.pool.start(task)
+        return task
+
+    def _finished(self, task):
+        if self._running.get(task.key) is task:
+            del self._running[task.key]
+        queued = self._queued.pop(task.key, None)
+        if queued is not None:
+            self._start(task.key, *queued)
+
+    def is_running(self, key) -> bool:
+        return key in self._running
+
+    def cancel(self, key):
+        """Cancel the running task with `key` and drop any queued one"""
+        self._queued.pop(key, None)
+        task = self._running.get(key)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self):
+        for key in list(self._running):
+            self.cancel(key)
@@ -1,25 +1,92 @@
+import time
+
+# Startup is measured from here, before the Qt and app imports
+PROCESS_STARTED = time.perf_counter()
+
+import logging
+import sqlite3
 import sys
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
-from gui.main_window import MainWindow
+from PyQt5.QtWidgets import QApplication, QDialog, QMessageBox
+from PyQt5.QtCore import Qt, QTimer
+from api.cache import LocalCache
+from api.client import APIClient
+from gui.login_dialog import LoginDialog
+
+logger = logging.getLogger(__name__)
+
+# Targets for time to an interactive window: the login dialog from process
+# start, and the dashboard from a successful login. Run
+# `python main.py --measure-startup` to print the login figure and exit.
+LOGIN_INTERACTIVE_TARGET_S = 0.5
+DASHBOARD_INTERACTIVE_TARGET_S = 0.3
+
+
+def when_interactive(started, name, target, callback=None):
+    """
+    Report the time from `started` until the event loop next runs, i.e.
+    until a window shown just before this call can take input.
+    """
+    def report():
+        elapsed = time.perf_counter() - started
+        if elapsed > target:
+            logger.warning("%s took %.0f ms to become interactive (target %.0f ms)",
+                           name, elapsed * 1000, target * 1000)
+        else:
+            logger.info("%s interactive after %.0f ms", name, elapsed * 1000)
+        if callback:
+            callback(elapsed)
+    QTimer.singleShot(0, report)
+
+
+def open_cache():
+    """The local history/report cache, or None if it cannot be opened"""
+    try:
+        return LocalCache()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Local cache unavailable, working without it: %s", e)
+        return None
+
 
 def main():
     # Enable high DPI scaling
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
-    
+
     app = QApplication(sys.argv)
     app.setApplicationName("Chemical Equipment Visualizer")
     app.setOrganizationName("FOSSEE")
-    
+
     # Set application style
     app.setStyle('Fusion')
-    
-    # Create and show main window
-    window = MainWindow()
+
+    # Log in first; the dashboard (and matplotlib) is only loaded afterwards
+    api_client = APIClient(cache=open_cache())
+    dialog = LoginDialog(api_client)
+    if '--measure-startup' in sys.argv:
+        def print_and_quit(elapsed):
+            print(f"login dialog interactive after {elapsed * 1000:.0f} ms "
+                  f"(target {LOGIN_INTERACTIVE_TARGET_S * 1000:.0f} ms)")
+            dialog.reject()
+        when_interactive(PROCESS_STARTED, "Login dialog", LOGIN_INTERACTIVE_TARGET_S, print_and_quit)
+        dialog.exec_()
+        return 0
+    when_interactive(PROCESS_STARTED, "Login dialog", LOGIN_INTERACTIVE_TARGET_S)
+    if dialog.exec_() != QDialog.Accepted:
+        QMessageBox.warning(None, "Login Required",
+                            "You must login to use this application.")
+        return 0
+
+    logged_in = time.perf_counter()
+    from gui.main_window import MainWindow
+    window = MainWindow(api_client)
+    window.statusBar().showMessage("Offline: working from cached data" if api_client.offline
+                                   else "✓ Logged in successfully")
     window.show()
-    
-    sys.exit(app.exec_())
+    when_interactive(logged_in, "Dashboard", DASHBOARD_INTERACTIVE_TARGET_S)
+    # History and matplotlib load in the background behind the shown window
+    QTimer.singleShot(0, window.start_background_loading)
+
+    return app.exec_()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import shutil
+import tempfile
+import unittest
+
+from api.cache import LocalCache
+from api.client import APIClient
+
+BASE_URL = 'http://127.0.0.1:1'
+
+
+class OfflineLoginTests(unittest.TestCase):
+    """Offline mode needs the password of the last online login."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = LocalCache(self.directory)
+        self.account = f'operator@{BASE_URL}'
+        self.cache.store_history(self.account, '"v1"', [{'id': 1, 'total_count': 3}])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_verifier_not_password(self):
+        self.cache.store_credentials(self.account, 'secret')
+        with open(self.cache.path, 'rb') as f:
+            self.assertNotIn(b'secret', f.read())
+        self.assertTrue(self.cache.check_credentials(self.account, 'secret'))
+        self.assertFalse(self.cache.check_credentials(self.account, 'wrong'))
+
+    def test_start_offline_checks_password(self):
+        self.cache.store_credentials(self.account, 'secret')
+        client = APIClient(BASE_URL, cache=self.cache)
+        self.assertFalse(client.start_offline('operator', 'wrong'))
+        self.assertFalse(client.offline)
+        self.assertTrue(client.start_offline('operator', 'secret'))
+        self.assertTrue(client.offline)
+        self.assertEqual(client.cached_history().datasets, [{'id': 1, 'total_count': 3}])
+
+    def test_no_verifier_refuses_offline(self):
+        client = APIClient(BASE_URL, cache=self.cache)
+        self.assertFalse(client.start_offline('operator', 'anything'))
+
+    def test_other_account_verifier_does_not_apply(self):
+        self.cache.store_credentials(f'someone@{BASE_URL}', 'secret')
+        client = APIClient(BASE_URL, cache=self.cache)
+        self.assertFalse(client.start_offline('operator', 'secret'))
+
+
+if __name__ == '__main__':
+    unittest.main()
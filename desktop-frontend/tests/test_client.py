@@ -0,0 +1,291 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from api.cache import LocalCache
+from api.client import APIClient, DownloadCancelled
+from api.multipart import MultipartFileStream, UploadCancelled
+
+REPORT = bytes(range(256)) * 1024  # 256 KiB
+ETAG = '"1-abc-v2"'
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # Clients hanging up mid-response are part of the tests
+
+
+class FakeServer:
+    """
+    HTTP server on a free local port. Each request is recorded and answered
+    by `handle(request_handler)`, which tests replace.
+    """
+
+    def __init__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests.append((self.command, self.path, dict(self.headers), b''))
+                server.handle(self)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                server.requests.append((self.command, self.path, dict(self.headers), body))
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.requests = []
+        self.handle = lambda handler: reply(handler, 404)
+        self.httpd = QuietHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def reply(handler, status, body=b'', headers=None, send=None):
+    """Answer with `body`; `send` bytes of it only (then drop the connection)"""
+    handler.send_response(status)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.send_header('Content-Length', str(len(body)))
+    if send is not None:
+        handler.send_header('Connection', 'close')
+        handler.close_connection = True
+    handler.end_headers()
+    handler.wfile.write(body if send is None else body[:send])
+    handler.wfile.flush()
+
+
+def serve_report(handler, drop_after=None):
+    """Report download with ETag, If-None-Match and Range/If-Range"""
+    if handler.headers.get('If-None-Match') == ETAG:
+        return reply(handler, 304, headers={'ETag': ETAG})
+    range_header = handler.headers.get('Range')
+    if range_header and handler.headers.get('If-Range') == ETAG:
+        start = int(range_header[len('bytes='):-1])
+        return reply(handler, 206, REPORT[start:], {
+            'ETag': ETAG, 'Content-Range': f'bytes {start}-{len(REPORT) - 1}/{len(REPORT)}'})
+    reply(handler, 200, REPORT, {'ETag': ETAG}, send=drop_after)
+
+
+class ClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.addCleanup(self.server.close)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.client = APIClient(self.server.url)
+        self.client.access_token = 'token'
+        self.client.max_retry_after = 60.0
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+
+class MultipartUploadTests(ClientTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.csv_path = self.path('data.csv')
+        with open(self.csv_path, 'wb') as f:
+            f.write(b'Equipment Name,Type\n' + b'Pump-1,Pump\n' * 30000)
+
+    def test_body_is_streamed_in_chunks(self):
+        with MultipartFileStream(self.csv_path) as body:
+            sizes = []
+            while True:
+                chunk = body.read(1 << 20)
+                if not chunk:
+                    break
+                sizes.append(len(chunk))
+        self.assertLessEqual(max(sizes), MultipartFileStream.chunk_size)
+        self.assertEqual(sum(sizes), body.len)
+
+    def test_upload_sends_file_and_reports_progress(self):
+        self.server.handle = lambda handler: reply(handler, 201, b'{"id": 1}',
+                                                   {'Content-Type': 'application/json'})
+        progress = []
+        self.assertEqual(self.client.upload_csv(self.csv_path, progress=lambda *p: progress.append(p)),
+                         {'id': 1})
+
+        method, path, headers, body = self.server.requests[-1]
+        self.assertEqual((method, path), ('POST', '/upload/'))
+        boundary = headers['Content-Type'].split('boundary=')[1]
+        with open(self.csv_path, 'rb') as f:
+            content = f.read()
+        self.assertIn(b'filename="data.csv"', body)
+        self.assertIn(b'\r\n\r\n' + content + f'\r\n--{boundary}--\r\n'.encode(), body)
+        self.assertGreater(len(progress), 2)
+        self.assertEqual(progress[-1], (len(body), len(body)))
+
+    def test_cancel_stops_upload(self):
+        self.server.handle = lambda handler: reply(handler, 201, b'{}')
+        cancel = threading.Event()
+        with self.assertRaises(UploadCancelled):
+            self.client.upload_csv(self.csv_path, progress=lambda *p: cancel.set(), cancel_event=cancel)
+
+    def test_cancel_ends_busy_wait(self):
+        self.server.handle = lambda handler: reply(handler, 429, b'{}', {'Retry-After': '30'})
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        start = time.monotonic()
+        with self.assertRaises(UploadCancelled):
+            self.client.upload_csv(self.csv_path, cancel_event=cancel)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_cancel_during_replay_after_refresh(self):
+        self.client.refresh_token = 'refresh'
+
+        def handle(handler):
+            if handler.path == '/api/token/refresh/':
+                return reply(handler, 200, b'{"access": "fresh"}', {'Content-Type': 'application/json'})
+            if handler.headers.get('Authorization') != 'Bearer fresh':
+                return reply(handler, 401, b'{}')
+            reply(handler, 429, b'{}', {'Retry-After': '30'})
+
+        self.server.handle = handle
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        with self.assertRaises(UploadCancelled):
+            self.client.upload_csv(self.csv_path, cancel_event=cancel)
+        self.assertEqual([path for _, path, _, _ in self.server.requests],
+                         ['/upload/', '/api/token/refresh/', '/upload/'])
+
+
+class BusyRetryTests(ClientTestCase):
+
+    def test_busy_answer_is_retried_after_delay(self):
+        answers = [(429, b'{}', {'Retry-After': '0.1'}),
+                   (200, b'[]', {'Content-Type': 'application/json'})]
+        self.server.handle = lambda handler: reply(handler, *answers.pop(0))
+        self.assertEqual(self.client.get_history(), [])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_busy_retries_are_not_repeated_by_the_transport(self):
+        self.server.handle = lambda handler: reply(handler, 503, b'{}', {'Retry-After': '0'})
+        with self.assertRaisesRegex(Exception, 'busy'):
+            self.client.get_history()
+        self.assertEqual(len(self.server.requests), self.client.max_busy_retries + 1)
+
+
+class ReportDownloadTests(ClientTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.save_path = self.path('report.pdf')
+        self.part_path = self.save_path + '.part'
+        self.etag_path = self.part_path + '.etag'
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_dropped_download_resumes_with_range(self):
+        attempts = []
+
+        def handle(handler):
+            attempts.append(handler.headers.get('Range'))
+            serve_report(handler, drop_after=100_000 if len(attempts) == 1 else None)
+
+        self.server.handle = handle
+        self.client.download_report(1, self.save_path)
+
+        self.assertEqual(self._read(self.save_path), REPORT)
+        self.assertEqual(len(attempts), 2)
+        # Resumed after the last whole chunk written before the drop
+        _, _, headers, _ = self.server.requests[-1]
+        offset = int(headers['Range'][len('bytes='):-1])
+        self.assertTrue(0 < offset <= 100_000)
+        self.assertEqual(headers['If-Range'], ETAG)
+        self.assertFalse(os.path.exists(self.part_path))
+        self.assertFalse(os.path.exists(self.etag_path))
+
+    def test_cancelled_download_keeps_part_and_etag(self):
+        self.server.handle = serve_report
+        cancel = threading.Event()
+
+        def progress(done, total):
+            if done >= 64 * 1024:
+                cancel.set()
+
+        with self.assertRaises(DownloadCancelled):
+            self.client.download_report(1, self.save_path, progress=progress, cancel_event=cancel)
+        self.assertEqual(self._read(self.etag_path), ETAG.encode())
+        kept = os.path.getsize(self.part_path)
+        self.assertGreater(kept, 0)
+
+        self.client.download_report(1, self.save_path)
+        self.assertEqual(self._read(self.save_path), REPORT)
+        self.assertEqual(self.server.requests[-1][2]['Range'], f'bytes={kept}-')
+
+    def test_stale_part_is_downloaded_afresh(self):
+        with open(self.part_path, 'wb') as f:
+            f.write(b'old report')
+        with open(self.etag_path, 'w') as f:
+            f.write('"old"')
+        self.server.handle = serve_report
+
+        self.client.download_report(1, self.save_path)
+        self.assertEqual(self._read(self.save_path), REPORT)
+        self.assertEqual(self.server.requests[-1][2]['If-Range'], '"old"')
+
+    def test_cancel_ends_busy_wait(self):
+        self.server.handle = lambda handler: reply(handler, 503, b'', {'Retry-After': '30'})
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        start = time.monotonic()
+        with self.assertRaises(DownloadCancelled):
+            self.client.download_report(1, self.save_path, cancel_event=cancel)
+        self.assertLess(time.monotonic() - start, 5)
+
+
+class CacheRevalidationTests(ClientTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.cache = LocalCache(self.path('cache'))
+        self.client.username = 'operator'
+
+    def test_report_revalidated_with_etag(self):
+        self.server.handle = serve_report
+        self.client.download_report(1, self.path('first.pdf'))
+        self.assertNotIn('If-None-Match', self.server.requests[-1][2])
+
+        self.client.download_report(1, self.path('second.pdf'))
+        self.assertEqual(self.server.requests[-1][2]['If-None-Match'], ETAG)
+        with open(self.path('second.pdf'), 'rb') as f:
+            self.assertEqual(f.read(), REPORT)
+
+    def test_history_revalidated_with_etag(self):
+        def handle(handler):
+            if handler.headers.get('If-None-Match') == '"h1"':
+                return reply(handler, 304, headers={'ETag': '"h1"'})
+            reply(handler, 200, b'[{"id": 1}]', {'ETag': '"h1"', 'Content-Type': 'application/json'})
+
+        self.server.handle = handle
+        self.assertEqual(self.client.get_history(), [{'id': 1}])
+        self.assertEqual(self.client.get_history(), [{'id': 1}])
+        self.assertEqual(self.server.requests[-1][2]['If-None-Match'], '"h1"')
+        self.assertEqual(len(self.server.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
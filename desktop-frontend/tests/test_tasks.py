@@ -0,0 +1,84 @@
+import os
+import threading
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QThreadPool, QTimer  # noqa: E402
+
+from gui.tasks import TaskRunner  # noqa: E402
+
+
+class TaskRunnerTests(unittest.TestCase):
+    """Tasks with the same key run one at a time and coalesce."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        self.pool = QThreadPool()
+        self.runner = TaskRunner(pool=self.pool)
+        self.release = threading.Event()
+        self.calls = []
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.waitForDone(5000)
+
+    def _job(self, name):
+        def fn(task):
+            self.calls.append(name)
+            if name == 'first':
+                self.release.wait(5)
+            return name
+        return fn
+
+    def _wait(self, condition, timeout=5000):
+        loop = QEventLoop()
+        timer = QTimer()
+        timer.timeout.connect(lambda: condition() and loop.quit())
+        timer.start(10)
+        QTimer.singleShot(timeout, loop.quit)
+        loop.exec_()
+        timer.stop()
+        self.assertTrue(condition())
+
+    def test_queued_submissions_coalesce(self):
+        results = []
+        first = self.runner.run('history', self._job('first'), on_result=results.append)
+        self.assertIsNotNone(first)
+        self.assertIsNone(self.runner.run('history', self._job('second'), on_result=results.append))
+        self.assertIsNone(self.runner.run('history', self._job('third'), on_result=results.append))
+        self._wait(lambda: self.calls == ['first'])
+
+        self.release.set()
+        self._wait(lambda: len(results) == 2)
+        # 'second' was replaced by 'third' while 'first' ran
+        self.assertEqual(self.calls, ['first', 'third'])
+        self.assertEqual(results, ['first', 'third'])
+        self._wait(lambda: not self.runner.is_running('history'))
+
+    def test_other_keys_run_alongside(self):
+        self.runner.run('history', self._job('first'))
+        self.assertIsNotNone(self.runner.run('report', self._job('report')))
+        self._wait(lambda: sorted(self.calls) == ['first', 'report'])
+
+    def test_cancel_drops_queued_and_signals_cancelled(self):
+        cancelled = []
+        results = []
+        self.runner.run('history', self._job('first'), on_result=results.append,
+                        on_cancelled=lambda: cancelled.append(True))
+        self.runner.run('history', self._job('second'))
+        self._wait(lambda: self.calls == ['first'])
+
+        self.runner.cancel('history')
+        self.release.set()
+        self._wait(lambda: cancelled == [True])
+        self._wait(lambda: not self.runner.is_running('history'))
+        self.assertEqual(self.calls, ['first'])
+        self.assertEqual(results, [])
+
+
+if __name__ == '__main__':
+    unittest.main()